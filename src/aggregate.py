@@ -0,0 +1,134 @@
+import math
+
+
+class Aggregate(object):
+    """
+    Summary statistics of the orbits matching a query, grouped on date
+    buckets, hazard, NEO or decades of diameter and distance, computed
+    in a single pass over the orbits without keeping them.
+
+    Each group reports its number of orbits and of distinct NEOs, the
+    min, mean and max miss distance of its orbits and the min, mean and
+    max diameter (maximum estimate) of its distinct NEOs.
+    """
+
+    # Group option -> function of an orbit returning its group value.
+    # Diameters and distances are grouped on the power of ten at or
+    # below them, e.g. 0.01 for the diameters from 0.01 up to 0.1 km.
+    Groups = {
+        'day': lambda orbit: Aggregate.date_bucket(orbit.orbit_date, 'day'),
+        'month': lambda orbit: Aggregate.date_bucket(orbit.orbit_date,
+                                                     'month'),
+        'year': lambda orbit: Aggregate.date_bucket(orbit.orbit_date, 'year'),
+        'hazard': lambda orbit: orbit.neo.hazard,
+        'neo': lambda orbit: orbit.neo.name,
+        'diameter': lambda orbit: Aggregate.decade(orbit.neo.diam_max),
+        'distance': lambda orbit: Aggregate.decade(orbit.miss)
+    }
+
+    DateFormats = {
+        'day': '%Y-%m-%d',
+        'month': '%Y-%m',
+        'year': '%Y'
+    }
+
+    Metrics = ['count', 'neos', 'miss_min', 'miss_mean', 'miss_max',
+               'diameter_min', 'diameter_mean', 'diameter_max']
+
+    def __init__(self, group_by):
+        """
+        :param group_by: list of Groups options, none for a single group
+        """
+        self.group_by = list(group_by)
+        self.keys = [Aggregate.Groups[group] for group in self.group_by]
+        # Group -> [orbits, miss sum, min, max, NEOs, diameter sum, min, max]
+        self.groups = {}
+        # Group of each date met, when only grouping on date buckets, as
+        # most orbits share their date with others.
+        self.date_groups = {} if all(group in Aggregate.DateFormats
+                                     for group in self.group_by) else None
+
+    @staticmethod
+    def date_bucket(date, group):
+        """
+        :param date: datetime of a close approach
+        :param group: str date group option, day, month or year
+        :return: str representing the date bucket
+        """
+        return date.strftime(Aggregate.DateFormats[group])
+
+    @staticmethod
+    def decade(value):
+        """
+        :param value: float diameter or distance
+        :return: float power of ten at or below value, or 0.0
+        """
+        if value <= 0:
+            return 0.0
+        return 10.0 ** math.floor(math.log10(value))
+
+    def add(self, orbit):
+        """
+        Adds an orbit to its group.
+
+        :param orbit: OrbitPath matching the query
+        :return: None
+        """
+        group = self._group(orbit)
+        stats = self.groups.get(group)
+        miss = orbit.miss
+        if stats is None:
+            stats = self.groups[group] = [0, 0.0, miss, miss, set(),
+                                          0.0, math.inf, -math.inf]
+        stats[0] += 1
+        stats[1] += miss
+        if miss < stats[2]:
+            stats[2] = miss
+        if miss > stats[3]:
+            stats[3] = miss
+        neo = orbit.neo
+        if neo not in stats[4]:
+            stats[4].add(neo)
+            diameter = neo.diam_max
+            stats[5] += diameter
+            stats[6] = min(stats[6], diameter)
+            stats[7] = max(stats[7], diameter)
+        return None
+
+    def _group(self, orbit):
+        """ Get the group of an orbit, the same for the orbits of a date
+        when only grouping on date buckets. """
+        if self.date_groups is not None:
+            group = self.date_groups.get(orbit.orbit_date)
+            if group is None:
+                group = tuple(key(orbit) for key in self.keys)
+                self.date_groups[orbit.orbit_date] = group
+            return group
+        return tuple(key(orbit) for key in self.keys)
+
+    def rows(self):
+        """
+        :return: list of dicts, a row per group with its group values and
+        Metrics, in group order
+        """
+        rows = []
+        for group in sorted(self.groups):
+            (count, miss_sum, miss_min, miss_max, neos,
+             diameter_sum, diameter_min, diameter_max) = self.groups[group]
+            rows.append(Aggregate.row(
+                self.group_by, group,
+                [count, len(neos), miss_min, miss_sum / count, miss_max,
+                 diameter_min, diameter_sum / len(neos), diameter_max]))
+        return rows
+
+    @staticmethod
+    def row(group_by, group, metrics):
+        """
+        :param group_by: list of Groups options
+        :param group: tuple of the group values
+        :param metrics: list of the values of Metrics
+        :return: dict of the group and metric names to their values
+        """
+        row = dict(zip(group_by, group))
+        row.update(zip(Aggregate.Metrics, metrics))
+        return row
@@ -0,0 +1,45 @@
+"""
+Benchmark of NEODatabase.load_data ingestion throughput.
+
+Run from the src directory with: python -m benchmarks.bench_load [filename]
+By default the benchmark loads data/neo_data.csv.
+"""
+
+import argparse
+import pathlib
+import time
+
+from database import NEODatabase
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+
+
+def bench_load(filename, repeat=3):
+    """
+    Times loading a csv file into a NEODatabase.
+
+    :param filename: str representing the csv file to load
+    :param repeat: int number of loads, the fastest one is reported
+    :return: tuple of (rows, seconds) of the fastest load
+    """
+    best = None
+    for _ in range(repeat):
+        db = NEODatabase(filename=filename)
+        start = time.perf_counter()
+        db.load_data()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    rows = sum(len(neo.orbits) for neo in db.db.values())
+    return rows, best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark NEODatabase.load_data')
+    parser.add_argument('filename', nargs='?', default=f'{PROJECT_ROOT}/data/neo_data.csv',
+                        help='Name of input csv data file')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of loads to time')
+    args = parser.parse_args()
+
+    rows, seconds = bench_load(args.filename, args.repeat)
+    print(f'Loaded {rows} rows in {seconds:.3f}s: {rows / seconds:,.0f} rows/sec')
@@ -0,0 +1,47 @@
+"""
+Benchmark of the memory held by a loaded NEODatabase, measured
+with tracemalloc.
+
+Run from the src directory with: python -m benchmarks.bench_memory [filename]
+By default the benchmark loads data/neo_data.csv.
+"""
+
+import argparse
+import gc
+import pathlib
+import tracemalloc
+
+from database import NEODatabase
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
+
+
+def bench_memory(filename):
+    """
+    Measures the memory allocated by loading a csv file into a
+    NEODatabase that is still held once the load has finished.
+
+    :param filename: str representing the csv file to load
+    :return: tuple of (rows, held bytes, peak bytes)
+    """
+    gc.collect()
+    tracemalloc.start()
+    db = NEODatabase(filename=filename)
+    db.load_data()
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = sum(len(neo.orbits) for neo in db.db.values())
+    return rows, held, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark NEODatabase memory usage')
+    parser.add_argument('filename', nargs='?', default=f'{PROJECT_ROOT}/data/neo_data.csv',
+                        help='Name of input csv data file')
+    args = parser.parse_args()
+
+    rows, held, peak = bench_memory(args.filename)
+    print(f'Loaded {rows} rows: {held / 2**20:.1f} MiB held '
+          f'({held / rows:.0f} bytes/row), {peak / 2**20:.1f} MiB peak')
@@ -0,0 +1,92 @@
+"""
+Generator of synthetic Near Earth Object data, in the csv layout of
+data/neo_data.csv that NEODatabase.load_data expects.
+
+Run from the src directory with:
+python -m benchmarks.generate out.csv --neos 10000 --orbits 5 --days 365
+"""
+
+import argparse
+import csv
+import math
+import random
+from datetime import date, timedelta
+
+Header = ['id', 'neo_reference_id', 'name', 'nasa_jpl_url',
+          'absolute_magnitude_h',
+          'estimated_diameter_min_kilometers',
+          'estimated_diameter_max_kilometers',
+          'estimated_diameter_min_meters', 'estimated_diameter_max_meters',
+          'estimated_diameter_min_miles', 'estimated_diameter_max_miles',
+          'estimated_diameter_min_feet', 'estimated_diameter_max_feet',
+          'is_potentially_hazardous_asteroid',
+          'kilometers_per_second', 'kilometers_per_hour', 'miles_per_hour',
+          'close_approach_date', 'close_approach_date_full',
+          'astronomical', 'lunar', 'kilometers', 'miles', 'orbiting_body']
+
+# Fraction of potentially hazardous NEOs.
+HazardRate = 0.1
+# Kilometers per astronomical unit, lunar distance and mile.
+AU, LD, Mile = 149597870.7, 384400.0, 1.609344
+
+
+def generate(filename, neos=10000, orbits=5, days=365,
+             start=date(2020, 1, 1), seed=0):
+    """
+    Writes a csv of synthetic close approaches of neos NEOs, with orbits
+    close approaches each on average, spread evenly over days days from
+    start. Rows are written in date order, each NEO drawn at random, so a
+    NEO may approach more than once on a date. The same arguments always
+    generate the same file.
+
+    :param filename: str representing the csv file to write
+    :param neos: int number of NEOs
+    :param orbits: int average number of close approaches per NEO
+    :param days: int number of days spanned by the close approaches
+    :param start: date of the first close approach
+    :param seed: int seed of the random generator
+    :return: int number of rows written
+    """
+    rng = random.Random(seed)
+    # Diameters are log-uniform between 1m and 5km.
+    diam_min = [math.exp(rng.uniform(math.log(0.001), math.log(5.0)))
+                for _ in range(neos)]
+    hazard = [str(rng.random() < HazardRate) for _ in range(neos)]
+
+    total = neos * orbits
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(Header)
+        for day in range(days):
+            approach = (start + timedelta(days=day)).isoformat()
+            rows = []
+            for _ in range(total // days + (day < total % days)):
+                neo = rng.randrange(neos)
+                dmin = diam_min[neo]
+                dmax = dmin * 2.2
+                miss = rng.uniform(1.0e4, 8.0e7)
+                speed = rng.uniform(1.0, 40.0)
+                rows.append([
+                    2000000 + neo, 2000000 + neo, f'(2020 N{neo})',
+                    f'http://ssd.jpl.nasa.gov/sbdb.cgi?sstr={2000000 + neo}',
+                    round(rng.uniform(15.0, 32.0), 2),
+                    dmin, dmax, dmin * 1e3, dmax * 1e3,
+                    dmin / Mile, dmax / Mile, dmin * 3280.84, dmax * 3280.84,
+                    hazard[neo], speed, speed * 3600, speed * 3600 / Mile,
+                    approach, f'{approach} 00:00',
+                    miss / AU, miss / LD, miss, miss / Mile, 'Earth'])
+            writer.writerows(rows)
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic NEO data')
+    parser.add_argument('filename', help='Name of the csv data file to write')
+    parser.add_argument('--neos', type=int, default=10000, help='Number of NEOs')
+    parser.add_argument('--orbits', type=int, default=5, help='Average number of close approaches per NEO')
+    parser.add_argument('--days', type=int, default=365, help='Number of days spanned by the close approaches')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+    args = parser.parse_args()
+
+    rows = generate(args.filename, args.neos, args.orbits, args.days, seed=args.seed)
+    print(f'Wrote {rows} rows to {args.filename}')
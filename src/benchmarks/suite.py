@@ -0,0 +1,195 @@
+"""
+Benchmark suite of the load, search and write hot paths on synthetic data.
+
+For each size, a csv of that many rows is generated once with
+benchmarks.generate, then the suite times loading it, date equals and
+between queries, every combination of the filters, Path returns and
+the display, csv and ndjson writers of both NEO and Path results. A run can be saved as a baseline that later
+runs are compared against, failing when a case is slower than the
+baseline by more than the threshold.
+
+Run from the src directory with:
+python -m benchmarks.suite --sizes 10000 1000000 --save baseline.json
+python -m benchmarks.suite --sizes 10000 1000000 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from itertools import combinations
+
+from benchmarks.generate import generate
+from database import NEODatabase
+from search import Query, NEOSearcher
+from writer import OutputFormat, NEOWriter
+
+Sizes = [10000, 1000000, 10000000]
+Filters = ['diameter:>=:0.1', 'is_hazardous:=:True', 'distance:<=:10000000']
+# Shape of the generated data: the number of NEOs follows from the size.
+OrbitsPerNEO = 5
+Days = 365
+Start = date(2020, 1, 1)
+# Cases faster than this are too noisy to report as regressions.
+NoiseSeconds = 0.002
+
+
+def data_file(size, data_dir):
+    """
+    Path of the synthetic csv of size rows, generated on first use.
+
+    :param size: int number of rows
+    :param data_dir: str representing the directory of the csv files
+    :return: str
+    """
+    filename = os.path.join(data_dir, f'neo_{size}.csv')
+    if not os.path.exists(filename):
+        os.makedirs(data_dir, exist_ok=True)
+        generate(filename, neos=max(1, size // OrbitsPerNEO),
+                 orbits=OrbitsPerNEO, days=Days, start=Start)
+    return filename
+
+
+def best_time(function, repeat):
+    """
+    Times a function.
+
+    :param function: function without arguments to time
+    :param repeat: int number of runs
+    :return: tuple of (seconds of the fastest run, result of the last run)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def cases():
+    """
+    The queries of the suite.
+
+    :return: list of (case name, Query keyword arguments) tuples
+    """
+    middle = (Start + timedelta(days=Days // 2)).isoformat()
+    month_end = (Start + timedelta(days=Days // 2 + 30)).isoformat()
+    between = {'start_date': middle, 'end_date': month_end}
+
+    queries = [('equals', {'date': middle}),
+               ('between', between)]
+    for count in range(1, len(Filters) + 1):
+        for filters in combinations(Filters, count):
+            name = 'between ' + ' '.join(filters)
+            queries.append((name, dict(between, filter=list(filters))))
+    queries += [('path equals', {'date': middle, 'return_object': 'Path'}),
+                ('path between', dict(between, return_object='Path')),
+                ('path between ' + Filters[-1],
+                 dict(between, return_object='Path', filter=Filters[-1:]))]
+    return queries
+
+
+def run(size, data_dir, repeat, **options):
+    """
+    Runs the suite on the synthetic data of a size.
+
+    :param size: int number of rows
+    :param data_dir: str representing the directory of the csv files
+    :param repeat: int number of runs of each case
+    :param options: NEODatabase options, e.g. columnar=True
+    :return: dict of case name to seconds
+    """
+    filename = data_file(size, data_dir)
+    results = {}
+
+    def load():
+        db = NEODatabase(filename=filename, **options)
+        db.load_data()
+        return db
+
+    results['load'], db = best_time(load, min(repeat, 3))
+
+    searcher = NEOSearcher(db)
+    for name, kwargs in cases():
+        kwargs.setdefault('return_object', 'NEO')
+        query = Query(number=size, **kwargs).build_query()
+        results[name], _ = best_time(
+            lambda: searcher.get_objects(query), repeat)
+
+    # The writers write the NEOs, and the Paths, of the between query.
+    between = dict(cases())['between']
+    written = [
+        ('', searcher.get_objects(Query(
+            number=size, return_object='NEO', **between).build_query())),
+        ('path ', searcher.get_objects(Query(
+            number=size, return_object='Path', **between).build_query()))]
+    with tempfile.TemporaryDirectory() as out_dir:
+        for prefix, data in written:
+            for output in (OutputFormat.display, OutputFormat.csv_file,
+                           OutputFormat.ndjson):
+                # The display is written to a file rather than the terminal.
+                out = os.path.join(out_dir, prefix + output.value)
+                results[f'write {prefix}{output.value}'], _ = best_time(
+                    lambda: NEOWriter().write(format=output.value,
+                                              data=data, out=out), repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares the results of a run against a baseline run.
+
+    :param results: dict of size to dict of case name to seconds
+    :param baseline: same as results, for the baseline run
+    :param threshold: float relative slowdown reported as a regression
+    :return: list of (size, case, baseline seconds, seconds) regressions
+    """
+    regressions = []
+    for size, cases_seconds in results.items():
+        for case, seconds in cases_seconds.items():
+            before = baseline.get(size, {}).get(case)
+            if before is None:
+                continue
+            if seconds > before * (1 + threshold) and \
+                    seconds - before > NoiseSeconds:
+                regressions.append((size, case, before, seconds))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the NEO database hot paths on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=Sizes, help='Numbers of rows to benchmark')
+    parser.add_argument('--data_dir', type=str, default=os.path.join(tempfile.gettempdir(), 'neo_benchmarks'),
+                        help='Directory where the synthetic csv files are generated and reused')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of runs of each case')
+    parser.add_argument('--columnar', action='store_true', help='Benchmark the columnar backend')
+    parser.add_argument('--range_indexes', action='store_true', help='Benchmark with range indexes')
+    parser.add_argument('--save', type=str, help='Path to save the results to, as a baseline')
+    parser.add_argument('--compare', type=str, help='Path of a baseline to compare the results against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown against the baseline reported as a regression')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = run(size, args.data_dir, args.repeat, columnar=args.columnar,
+                                 range_indexes=args.range_indexes)
+        for case, seconds in results[str(size)].items():
+            print(f'{size:>10} {case:<60} {seconds * 1000:10.2f}ms')
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for size, case, before, seconds in regressions:
+            print(f'Regression at {size} rows, {case}: {before * 1000:.2f}ms -> {seconds * 1000:.2f}ms')
+        if regressions:
+            sys.exit(1)
+        print('No regression against the baseline.')
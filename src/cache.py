@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from search import DateSearchType, Filter
+
+
+class QueryCache(object):
+    """
+    Bounded cache of query results, evicting the least recently used
+    query once full.
+
+    Results are keyed on the canonical form of their Query.Selectors, so
+    that queries only differing in the order or spelling of their filters
+    or dates share their results. The cache holds the version of the data
+    its results were computed on, and is emptied when the data changes.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: int max number of query results to keep
+        """
+        self.size = size
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.results = OrderedDict()
+        # Guards the results OrderedDict, their version and the hit and
+        # miss counters, shared by the queries of concurrent threads.
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(query):
+        """
+        Canonical form of a query.
+
+        :param query: Query.Selectors object with query information
+        :return: hashable tuple
+        """
+        dates = tuple(datetime.strptime(date, '%Y-%m-%d').date()
+                      for date in query.date_search.values)
+        if query.date_search.type == DateSearchType.between and \
+                dates[0] == dates[1]:
+            dates = dates[:1]
+        filters = tuple(sorted({
+            (filt.field, filt.operation, filt.parsed_value)
+            for filt in Filter.create_filter_options(query.filters or [])}))
+        return dates, filters, query.return_object, query.number, query.sort
+
+    def get(self, key, version):
+        """
+        Gets the results of a query, if cached for this version of the data.
+
+        :param key: canonical form of the query, see QueryCache.key
+        :param version: int version of the data searched
+        :return: list of results, or None if not cached
+        """
+        with self.lock:
+            if version != self.version:
+                self.results.clear()
+                self.version = version
+            results = self.results.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self.results.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, key, version, results):
+        """
+        Caches the results of a query on a version of the data.
+
+        :param key: canonical form of the query, see QueryCache.key
+        :param version: int version of the data searched
+        :param results: list of results
+        :return: None
+        """
+        with self.lock:
+            if version != self.version:
+                return None
+            self.results[key] = results
+            self.results.move_to_end(key)
+            while len(self.results) > self.size:
+                self.results.popitem(last=False)
+        return None
+
+    def stats(self):
+        """
+        :return: dict of the cache size, hits and misses
+        """
+        return {'size': len(self.results), 'hits': self.hits,
+                'misses': self.misses}
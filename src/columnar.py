@@ -0,0 +1,297 @@
+import copy
+from aggregate import Aggregate
+from exceptions import UnsupportedFeature
+from models import OrbitPath
+from search import DateSearchType, Filter
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ColumnarStore(object):
+    """
+    Optional NumPy backed copy of a NEODatabase, storing every orbit
+    as a row of contiguous arrays sorted by close approach date.
+
+    Date searches become a binary search over the date column and
+    filters boolean masks evaluated in bulk. Only the resulting rows
+    are materialized back into NearEarthObject or OrbitPath instances.
+
+    The columns are named after the model attribute they hold, so
+    a Filter field maps directly onto its column.
+    """
+
+    # Date ordinal of 1970-01-01, day 0 of the numpy datetimes.
+    Epoch = 719163
+    # Decade group key of the values that are not positive.
+    NoDecade = -(1 << 32)
+
+    def __init__(self, db):
+        """
+        :param db: loaded NEODatabase to build the columns from
+        """
+        if np is None:
+            raise UnsupportedFeature('The columnar backend requires numpy')
+
+        self.neos = list(db.db.values())
+        # NearEarthObject -> its number, the neo column values.
+        self.neo_index = {neo: i for i, neo in enumerate(self.neos)}
+
+        # Rows in the same order as the date index postings.
+        self.orbits = [orbit for date in db.dates
+                       for orbit in db.date_index[date]]
+        rows = [(self.neo_index[orbit.neo], orbit.orbit_date.toordinal(),
+                 orbit.miss) for orbit in self.orbits]
+
+        self.neo = np.array([row[0] for row in rows], dtype=np.int64)
+        self.orbit_date = np.array([row[1] for row in rows],
+                                   dtype=np.int64)
+        self.miss = np.array([row[2] for row in rows], dtype=np.float64)
+        self.diam_min = np.array([neo.diam_min for neo in self.neos],
+                                 dtype=np.float64)[self.neo]
+        self.diam_max = np.array([neo.diam_max for neo in self.neos],
+                                 dtype=np.float64)[self.neo]
+        self.hazard = np.array([neo.hazard for neo in self.neos],
+                               dtype=bool)[self.neo]
+
+    def extended(self, orbits):
+        """
+        Copy of the store with the rows of new orbits inserted in date
+        order, as if it was built from the data they were added to,
+        without materializing the rows already stored again. The store
+        itself is left unchanged for the queries still reading it.
+
+        :param orbits: list of the OrbitPaths added to the NEODatabase,
+        in the order they were appended to the date index postings
+        :return: ColumnarStore
+        """
+        store = copy.copy(self)
+        store.neos = list(self.neos)
+        store.neo_index = dict(self.neo_index)
+        numbers = []
+        for orbit in orbits:
+            number = store.neo_index.get(orbit.neo)
+            if number is None:
+                number = store.neo_index[orbit.neo] = len(store.neos)
+                store.neos.append(orbit.neo)
+            numbers.append(number)
+
+        neo = np.array(numbers, dtype=np.int64)
+        orbit_date = np.array([orbit.orbit_date.toordinal()
+                               for orbit in orbits], dtype=np.int64)
+        # New rows go after the rows of their date, in the order added
+        order = np.argsort(orbit_date, kind='stable')
+        positions = np.searchsorted(self.orbit_date, orbit_date[order],
+                                    side='right')
+        columns = {
+            'neo': neo,
+            'orbit_date': orbit_date,
+            'miss': np.array([orbit.miss for orbit in orbits],
+                             dtype=np.float64),
+            'diam_min': np.array([orbit.neo.diam_min for orbit in orbits],
+                                 dtype=np.float64),
+            'diam_max': np.array([orbit.neo.diam_max for orbit in orbits],
+                                 dtype=np.float64),
+            'hazard': np.array([orbit.neo.hazard for orbit in orbits],
+                               dtype=bool)
+        }
+        for name, column in columns.items():
+            setattr(store, name, np.insert(getattr(self, name), positions,
+                                           column[order]))
+
+        store.orbits = []
+        previous = 0
+        for position, row in zip(positions.tolist(), order.tolist()):
+            store.orbits.extend(self.orbits[previous:position])
+            store.orbits.append(orbits[row])
+            previous = position
+        store.orbits.extend(self.orbits[previous:])
+        return store
+
+    def get_objects(self, query, filters):
+        """
+        Columnar counterpart of NEOSearcher.get_objects, returning the
+        same objects in the same order.
+
+        :param query: Query.Selectors object with query information
+        :param filters: list of Filter to apply
+        :return: Dataset of NearEarthObjects or OrbitalPaths
+        """
+        rows = self._rows(query, filters)
+        sort = query.sort
+
+        if query.return_object == OrbitPath:
+            if sort is not None:
+                rows = rows[ColumnarStore._order(
+                    getattr(self, sort.field)[rows], sort.reverse,
+                    query.number)]
+            return [self.orbits[row] for row in rows[:query.number]]
+
+        # Unique NEOs in the order of their first matching orbit
+        neo_rows = self.neo[rows]
+        _, first = np.unique(neo_rows, return_index=True)
+        neos = neo_rows[np.sort(first)]
+        if sort is not None:
+            # Closest or first (farthest or last) matching orbit of each
+            # NEO, as NEOSearcher orders them
+            best = np.full(len(self.neos), -np.inf if sort.reverse
+                           else np.inf)
+            reduce = np.maximum if sort.reverse else np.minimum
+            reduce.at(best, neo_rows, getattr(self, sort.field)[rows])
+            neos = neos[ColumnarStore._order(best[neos], sort.reverse,
+                                             query.number)]
+        return [self.neos[neo] for neo in neos[:query.number]]
+
+    def aggregate(self, query, filters, group_by):
+        """
+        Columnar counterpart of NEOSearcher.aggregate, grouping the
+        matching rows in bulk.
+
+        :param query: Query.Selectors object with query information
+        :param filters: list of Filter to apply
+        :param group_by: list of Aggregate.Groups options
+        :return: list of dicts, as NEOSearcher.aggregate
+        """
+        rows = self._rows(query, filters)
+        if not len(rows):
+            return []
+
+        if group_by:
+            keys = np.stack([self._group_keys(group, rows)
+                             for group in group_by], axis=1)
+            groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            groups = np.zeros((1, 0), dtype=np.int64)
+            inverse = np.zeros(len(rows), dtype=np.int64)
+        count = len(groups)
+
+        miss = self.miss[rows]
+        orbits = np.bincount(inverse, minlength=count)
+        miss_sum = np.bincount(inverse, weights=miss, minlength=count)
+        miss_min = np.full(count, np.inf)
+        np.minimum.at(miss_min, inverse, miss)
+        miss_max = np.full(count, -np.inf)
+        np.maximum.at(miss_max, inverse, miss)
+
+        # Distinct NEOs of each group, with the row of one of their orbits
+        _, first = np.unique(np.stack([inverse, self.neo[rows]], axis=1),
+                             axis=0, return_index=True)
+        neo_groups = inverse[first]
+        diameters = self.diam_max[rows[first]]
+        neos = np.bincount(neo_groups, minlength=count)
+        diameter_sum = np.bincount(neo_groups, weights=diameters,
+                                   minlength=count)
+        diameter_min = np.full(count, np.inf)
+        np.minimum.at(diameter_min, neo_groups, diameters)
+        diameter_max = np.full(count, -np.inf)
+        np.maximum.at(diameter_max, neo_groups, diameters)
+
+        labels = [self._group_labels(group, groups[:, i])
+                  for i, group in enumerate(group_by)]
+        results = [Aggregate.row(
+            group_by, tuple(column[i] for column in labels),
+            [int(orbits[i]), int(neos[i]), float(miss_min[i]),
+             float(miss_sum[i] / orbits[i]), float(miss_max[i]),
+             float(diameter_min[i]), float(diameter_sum[i] / neos[i]),
+             float(diameter_max[i])]) for i in range(count)]
+        return sorted(results,
+                      key=lambda row: tuple(row[group] for group in group_by))
+
+    def _group_keys(self, group, rows):
+        """ Get the int64 group keys of rows, see _group_labels. """
+        if group in ('day', 'month', 'year'):
+            dates = self.orbit_date[rows]
+            if group == 'day':
+                return dates
+            days = (dates - ColumnarStore.Epoch).astype('datetime64[D]')
+            unit = 'datetime64[M]' if group == 'month' else 'datetime64[Y]'
+            return days.astype(unit).astype(np.int64)
+        if group == 'hazard':
+            return self.hazard[rows].astype(np.int64)
+        if group == 'neo':
+            return self.neo[rows]
+        values = (self.diam_max if group == 'diameter' else self.miss)[rows]
+        # Power of ten at or below each value, NoDecade for none
+        decades = np.full(len(rows), ColumnarStore.NoDecade, dtype=np.int64)
+        positive = values > 0
+        decades[positive] = np.floor(np.log10(values[positive]))
+        return decades
+
+    def _group_labels(self, group, keys):
+        """ Get the Aggregate.Groups values of group keys. """
+        if group == 'day':
+            return [Aggregate.date_bucket(datetime.fromordinal(int(key)),
+                                          group) for key in keys]
+        if group == 'month':
+            return [Aggregate.date_bucket(
+                datetime(1970 + int(key) // 12, int(key) % 12 + 1, 1), group)
+                for key in keys]
+        if group == 'year':
+            return [Aggregate.date_bucket(datetime(1970 + int(key), 1, 1),
+                                          group) for key in keys]
+        if group == 'hazard':
+            return [bool(key) for key in keys]
+        if group == 'neo':
+            return [self.neos[key].name for key in keys]
+        return [0.0 if key == ColumnarStore.NoDecade else 10.0 ** int(key)
+                for key in keys]
+
+    def _rows(self, query, filters):
+        """ Get the rows passing the date search and filters of a query
+        :param: query:  Query.Selectors object with query information
+        :param: filters:  list of Filter to apply
+        :returns: array of rows, in date order
+        """
+        start, end = self._date_rows(query.date_search)
+        mask = np.ones(end - start, dtype=bool)
+        neo_mask = None
+        for filt in filters:
+            column = getattr(self, filt.field)
+            operation = Filter.Operators[filt.operation]
+            if filt.object == 'NearEarthObject' or \
+                    query.return_object == OrbitPath:
+                # NEO fields are copied on each row, and Path queries
+                # filter each orbit on its own fields.
+                mask &= operation(column[start:end], filt.parsed_value)
+            else:
+                # Any orbit of the NEO passing the filter will do.
+                passing = self.neo[operation(column, filt.parsed_value)]
+                counts = np.bincount(passing, minlength=len(self.neos))
+                neo_mask = counts > 0 if neo_mask is None \
+                    else neo_mask & (counts > 0)
+        if neo_mask is not None:
+            mask &= neo_mask[self.neo[start:end]]
+
+        return np.flatnonzero(mask) + start
+
+    @staticmethod
+    def _order(values, reverse, number):
+        """ Stable order of the first number values, decreasing if
+        reverse. Only the values up to the number-th one, found with a
+        partition, are sorted, keeping all of the values equal to it so
+        that ties stay in order. """
+        keys = -values if reverse else values
+        if number is None or number >= len(keys):
+            return np.argsort(keys, kind='stable')
+        last = keys[np.argpartition(keys, number - 1)[number - 1]]
+        candidates = np.flatnonzero(keys <= last)
+        order = np.argsort(keys[candidates], kind='stable')
+        return candidates[order[:number]]
+
+    def _date_rows(self, date_search):
+        """ Get the row range passing the date search
+        :param: date_search:  DateSearch namedtuple
+        :returns: (start, end) rows
+        """
+        dates = [datetime.strptime(d, '%Y-%m-%d').toordinal()
+                 for d in date_search.values]
+        if date_search.type == DateSearchType.between:
+            start_date, end_date = dates
+        else:
+            start_date = end_date = dates[0]
+        return (int(np.searchsorted(self.orbit_date, start_date, 'left')),
+                int(np.searchsorted(self.orbit_date, end_date, 'right')))
@@ -0,0 +1,422 @@
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import os
+import queue
+import struct
+import threading
+from exceptions import UnsupportedFeature
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Compression(object):
+    """
+    Compressed csv data files, detected from their magic bytes and
+    decompressed as a stream while they are parsed.
+
+    Files made of independent members, i.e. BGZF gzip blocks, xz streams
+    or zstd frames, can be split on the member boundaries found from
+    their headers without decompressing them, so that ranges of members
+    are decompressed in parallel. Other files, e.g. single member gzip
+    or bz2 files whose streams end on a bit boundary, are decompressed
+    serially, ahead of their parsing in a background thread.
+    """
+
+    Gzip = 'gzip'
+    Bz2 = 'bz2'
+    Xz = 'xz'
+    Zstd = 'zstd'
+
+    Magic = {
+        b'\x1f\x8b': Gzip,
+        b'BZh': Bz2,
+        b'\xfd7zXZ\x00': Xz,
+        b'\x28\xb5\x2f\xfd': Zstd,
+    }
+
+    # Bytes decompressed at once by the read ahead thread, and number of
+    # such blocks it queues at most.
+    BlockSize = 1 << 20
+    Depth = 4
+
+    Truncated = 'Compressed file ended before the end-of-stream marker ' \
+        'was reached'
+
+    @staticmethod
+    def detect(filename):
+        """
+        Detects the compression of a file from its first bytes.
+
+        :param filename: str representing the file
+        :return: str compression format, or None for a plain file
+        """
+        with open(filename, 'rb') as source:
+            head = source.read(6)
+        for magic, compression in Compression.Magic.items():
+            if head.startswith(magic):
+                # bzip2 magic is followed by its block size, 1 to 9
+                if compression == Compression.Bz2 and \
+                        head[3:4] not in b'123456789':
+                    continue
+                return compression
+        return None
+
+    @staticmethod
+    def open(filename, compression=None):
+        """
+        Opens a file for reading, decompressing it as it is read.
+
+        :param filename: str representing the file
+        :param compression: str compression format, detected if None
+        :return: binary file object
+        """
+        if compression is None:
+            compression = Compression.detect(filename)
+        if compression is None:
+            return open(filename, 'rb')
+        if compression == Compression.Gzip:
+            blocks = _read_blocks(gzip.open(filename, 'rb'))
+        elif compression == Compression.Bz2:
+            blocks = _read_blocks(bz2.open(filename, 'rb'))
+        elif compression == Compression.Xz:
+            blocks = _xz_blocks(filename)
+        else:
+            blocks = _zstd_blocks(filename, Compression._zstd())
+        return io.BufferedReader(_ReadAhead(blocks), Compression.BlockSize)
+
+    @staticmethod
+    def open_text(filename):
+        """
+        Opens a csv file for reading as text, decompressing it as it is
+        read.
+
+        :param filename: str representing the file
+        :return: text file object
+        """
+        compression = Compression.detect(filename)
+        if compression is None:
+            return open(filename, newline='')
+        return io.TextIOWrapper(Compression.open(filename, compression),
+                                newline='')
+
+    @staticmethod
+    def members(filename, compression):
+        """
+        Finds the byte ranges of the independent members of a compressed
+        file from their headers, without decompressing them.
+
+        :param filename: str representing the file
+        :param compression: str compression format of the file
+        :return: list of (start, end) byte offsets of the members, or None
+        if the file cannot be split in several members
+        """
+        finder = {Compression.Gzip: _gzip_members,
+                  Compression.Xz: _xz_members,
+                  Compression.Zstd: _zstd_members}.get(compression)
+        if finder is None:
+            return None
+        if compression == Compression.Zstd:
+            # Fail here rather than in each worker
+            Compression._zstd()
+        with open(filename, 'rb') as source:
+            if not os.fstat(source.fileno()).st_size:
+                return None
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) \
+                    as data:
+                try:
+                    members = finder(data)
+                except (IndexError, struct.error):
+                    # Truncated headers
+                    return None
+        return members if members and len(members) > 1 else None
+
+    @staticmethod
+    def split(members, chunks):
+        """
+        Groups contiguous members in ranges of about the same compressed
+        size.
+
+        :param members: list of (start, end) byte offsets of the members
+        :param chunks: int number of groups to split the members into
+        :return: list of lists of (start, end) byte offsets
+        """
+        total = sum(end - start for start, end in members)
+        groups = [[]]
+        size = 0
+        for member in members:
+            if groups[-1] and size >= total * len(groups) / chunks:
+                groups.append([])
+            groups[-1].append(member)
+            size += member[1] - member[0]
+        return groups
+
+    @staticmethod
+    def decompress(filename, compression, members):
+        """
+        Decompresses members of a compressed file, in a worker.
+
+        :param filename: str representing the file
+        :param compression: str compression format of the file
+        :param members: list of (start, end) byte offsets of the members
+        :return: bytes of the members decompressed, in order
+        """
+        if compression == Compression.Gzip:
+            decompress = gzip.decompress
+        elif compression == Compression.Xz:
+            decompress = lzma.decompress
+        else:
+            decompressor = Compression._zstd()
+
+            def decompress(data):
+                # Frames may not record their decompressed size
+                frame = decompressor.decompressobj()
+                block = frame.decompress(data)
+                if not frame.eof:
+                    raise EOFError(Compression.Truncated)
+                return block
+
+        parts = []
+        with open(filename, 'rb') as source:
+            for start, end in members:
+                source.seek(start)
+                parts.append(decompress(source.read(end - start)))
+        return b''.join(parts)
+
+    @staticmethod
+    def _zstd():
+        """ Get a zstd decompressor, zstd support being optional. """
+        if zstandard is None:
+            raise UnsupportedFeature(
+                'Reading zstd compressed files requires zstandard')
+        return zstandard.ZstdDecompressor()
+
+
+class _ReadAhead(io.RawIOBase):
+    """
+    Raw stream reading blocks of a decompressing file in a background
+    thread, the decompressors releasing the GIL, so that the file is
+    decompressed while the blocks read before are parsed.
+    """
+
+    def __init__(self, blocks):
+        """
+        :param blocks: generator of the decompressed blocks of the file
+        """
+        super().__init__()
+        self.source = blocks
+        self.blocks = queue.Queue(Compression.Depth)
+        self.block = memoryview(b'')
+        self.eof = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        """ Queue the blocks of the source, then b'' at its end or the
+        error reading it. """
+        try:
+            for block in self.source:
+                if not self._put(block):
+                    return
+            self._put(b'')
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        """ Queue an item unless closed meanwhile.
+        :returns: bool, whether the item was queued
+        """
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.block and not self.eof:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            self.eof = not block
+            self.block = memoryview(block)
+        size = min(len(buffer), len(self.block))
+        buffer[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.source.close()
+        super().close()
+
+
+def _read_blocks(source):
+    """ Read a decompressing file object in blocks, closing it once done. """
+    with source:
+        yield from iter(lambda: source.read(Compression.BlockSize), b'')
+
+
+def _xz_blocks(filename):
+    """ Decompress the streams of an xz file in blocks, skipping the null
+    padding allowed after each stream, which lzma.open does not. """
+    decompressor = None
+    with open(filename, 'rb') as source:
+        for data in iter(lambda: source.read(Compression.BlockSize), b''):
+            while data:
+                if decompressor is None:
+                    data = data.lstrip(b'\x00')
+                    if not data:
+                        break
+                    decompressor = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+                block = decompressor.decompress(data)
+                if block:
+                    yield block
+                data = b''
+                if decompressor.eof:
+                    data = decompressor.unused_data
+                    decompressor = None
+    if decompressor is not None:
+        raise EOFError(Compression.Truncated)
+
+
+def _zstd_blocks(filename, decompressor):
+    """ Decompress the frames of a zstd file in blocks, raising on a
+    truncated frame, which the zstandard stream reader ends on silently. """
+    frame = None
+    with open(filename, 'rb') as source:
+        for data in iter(lambda: source.read(Compression.BlockSize), b''):
+            while data:
+                if frame is None:
+                    frame = decompressor.decompressobj()
+                block = frame.decompress(data)
+                if block:
+                    yield block
+                data = b''
+                if frame.eof:
+                    data = frame.unused_data
+                    frame = None
+    if frame is not None:
+        raise EOFError(Compression.Truncated)
+
+
+def _gzip_members(data):
+    """ Byte ranges of the BGZF blocks of a gzip file, each a gzip member
+    whose header holds its size in a BC extra subfield. """
+    members = []
+    start = 0
+    while start < len(data):
+        # Deflate member with extra fields
+        if data[start:start + 4] != b'\x1f\x8b\x08\x04':
+            return None
+        xlen, = struct.unpack_from('<H', data, start + 10)
+        position = start + 12
+        size = None
+        while position + 4 <= start + 12 + xlen:
+            length, = struct.unpack_from('<H', data, position + 2)
+            if data[position:position + 2] == b'BC' and length == 2:
+                size = struct.unpack_from('<H', data, position + 4)[0] + 1
+            position += 4 + length
+        if size is None:
+            return None
+        members.append((start, start + size))
+        start += size
+    return members
+
+
+def _xz_members(data):
+    """ Byte ranges of the streams of an xz file, found from the end of
+    the file: the footer of a stream gives the size of its index, which
+    gives the size of its blocks. """
+    members = []
+    end = len(data)
+    while end > 0:
+        # Streams may be followed by null padding
+        while end >= 4 and data[end - 4:end] == b'\x00' * 4:
+            end -= 4
+        if end == 0:
+            break
+        if data[end - 2:end] != b'YZ':
+            return None
+        backward_size, = struct.unpack_from('<I', data, end - 8)
+        index = end - 12 - (backward_size + 1) * 4
+        if index < 0 or data[index] != 0:
+            return None
+        records, position = _xz_varint(data, index + 1)
+        blocks = 0
+        for _ in range(records):
+            unpadded, position = _xz_varint(data, position)
+            _, position = _xz_varint(data, position)
+            blocks += (unpadded + 3) & ~3
+        start = index - blocks - 12
+        if start < 0 or data[start:start + 6] != b'\xfd7zXZ\x00':
+            return None
+        members.append((start, end))
+        end = start
+    members.reverse()
+    return members
+
+
+def _xz_varint(data, position):
+    """ Read an xz variable length integer.
+    :returns: tuple of (int, position after it)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _zstd_members(data):
+    """ Byte ranges of the frames of a zstd file, found by walking the
+    headers of their blocks, skippable frames being left out. """
+    members = []
+    start = 0
+    while start < len(data):
+        magic, = struct.unpack_from('<I', data, start)
+        if magic & 0xfffffff0 == 0x184d2a50:
+            start += 8 + struct.unpack_from('<I', data, start + 4)[0]
+            continue
+        if magic != 0xfd2fb528:
+            return None
+        descriptor = data[start + 4]
+        single_segment = descriptor >> 5 & 1
+        # Window descriptor, dictionary id and content size fields
+        position = start + 5 + (not single_segment) + \
+            (0, 1, 2, 4)[descriptor & 3] + \
+            (single_segment, 2, 4, 8)[descriptor >> 6]
+        while True:
+            if position + 3 > len(data):
+                # Truncated frame
+                return None
+            header = int.from_bytes(data[position:position + 3], 'little')
+            last, kind, size = header & 1, header >> 1 & 3, header >> 3
+            if kind == 3:
+                return None
+            # RLE blocks hold a single byte repeated size times
+            position += 3 + (1 if kind == 1 else size)
+            if last:
+                break
+        if descriptor & 4:
+            # Content checksum
+            position += 4
+        members.append((start, position))
+        start = position
+    return members
@@ -1,5 +1,26 @@
 import csv
+import gc
+import hashlib
+import io
+import os
+import pickle
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
+import profiling
 from models import OrbitPath, NearEarthObject
+from cache import QueryCache
+from columnar import ColumnarStore
+from planner import QueryPlanner
+from sharding import ShardedExecutor
+from indexes import RangeIndex
+from lazy import RowIndex
+from compression import Compression
+from exceptions import UnsupportedFeature
 from datetime import datetime
 
 
@@ -14,19 +35,82 @@ class NEODatabase(object):
     Near Earth Object name to the NearEarthObject instance.
     """
 
-    def __init__(self, filename):
+    # Columns used from each row: id, name, minimum and maximum diameter
+    # in km, hazard, close approach date and miss distance in km.
+    Columns = itemgetter(0, 2, 5, 6, 13, 17, 21)
+
+    # Bumped whenever the layout of the snapshot state changes.
+    SnapshotVersion = 7
+    # Directory of the snapshots in the cache directory of the user.
+    SnapshotDirectory = 'neo-database'
+
+    # Bytes of decompressed rows sent at once to a worker parsing them,
+    # for compressed files that cannot be split.
+    StreamChunkSize = 1 << 22
+
+    def __init__(self, filename, columnar=False, snapshot=False,
+                 range_indexes=False, workers=1, shards=1, cache_size=0,
+                 lazy=False, object_cache=None):
         """
         :param filename: str representing the pathway of the
         filename containing the Near Earth Object data
+        :param columnar: bool, whether to also build the NumPy backed
+        ColumnarStore on load to evaluate searches in bulk
+        :param snapshot: bool, whether to cache the loaded data in a
+        binary snapshot in the cache directory of the user and reuse it on
+        later loads, see save_snapshot
+        :param range_indexes: bool, whether to also build sorted
+        RangeIndex secondary indexes on the filterable fields on load
+        :param workers: int number of processes parsing the data file in
+        parallel, 1 to parse it serially
+        :param shards: int number of processes sharing the columnar data
+        to evaluate each query in parallel, 1 to evaluate it in process
+        :param cache_size: int number of query results kept in a
+        QueryCache, 0 to search every query
+        :param lazy: bool, whether to only index the rows of the data file
+        on load, materializing the objects of the rows matching a date
+        search on demand, see RowIndex
+        :param object_cache: int number of NEOs kept materialized in lazy
+        mode, by default RowIndex.CacheSize
         """
+        if lazy and (columnar or snapshot or range_indexes or shards > 1):
+            raise UnsupportedFeature(
+                'The lazy mode cannot be combined with the columnar '
+                'backend, snapshots, range indexes or shards')
         self.filename = filename
+        self.columnar = columnar
+        self.snapshot = snapshot
+        self.range_indexes = range_indexes
+        self.workers = workers
+        self.shards = shards
+        self.columns = None
+        self.executor = None
+        self.planner = None
+        self.cache = QueryCache(cache_size) if cache_size else None
+        self.lazy = lazy
+        self.object_cache = object_cache
+        # RowIndex of the data file in lazy mode.
+        self.rows = None
+        # Incremented whenever the data changes, to invalidate the cache.
+        self.version = 0
+        # Byte offset of the data file up to which its rows are loaded,
+        # where tail resumes reading.
+        self.offset = 0
+        # Filterable field -> RangeIndex, when range_indexes is set.
+        self.indexes = None
         self.db = {}
+        # Orbit date -> list of OrbitPath postings,
+        # plus the sorted list of its keys to bisect date ranges.
+        self.date_index = {}
+        self.dates = []
 
     def load_data(self, filename=None):
         """
         Loads data from a .csv file, instantiating Near Earth Objects
         and their OrbitPaths by:
-           - Storing a dict of orbit date to list of NearEarthObject instances
+           - Storing a dict of orbit date to list of OrbitPath instances,
+             each referencing its NearEarthObject, with its dates kept
+             sorted
            - Storing a dict of the Near Earth Object name to the single
              instance of NearEarthObject
 
@@ -38,38 +122,706 @@ class NEODatabase(object):
             raise Exception('Cannot load data, no filename provided')
 
         filename = filename or self.filename
-        # Using a set to check whether a NEO is in the DB
-        # to check memebership in O(1).
-        checked_names = set()
-        db = {}
+        # Rows appended while loading are loaded again by tail, which
+        # skips them as already loaded.
+        offset = os.stat(filename).st_size
+        self.filename = filename
+        self.offset = offset
+        if self.lazy:
+            if Compression.detect(filename):
+                raise UnsupportedFeature(
+                    'The lazy mode requires an uncompressed data file')
+            if self.rows is not None:
+                # Unmap the data file of the previous load
+                self.rows.close()
+            with profiling.stage('load.scan'):
+                self.rows = RowIndex(filename, NEODatabase.Columns,
+                                     self.object_cache)
+            profiling.count('load.scan', 'rows', len(self.rows))
+            self.dates = self.rows.dates
+            self.version += 1
+            return None
+
+        if self.snapshot:
+            with profiling.stage('load.snapshot'):
+                loaded = self.load_snapshot(filename)
+            if loaded:
+                self.version += 1
+                self._start_shards()
+                return None
+
+        with profiling.stage('load.parse'):
+            if self.workers > 1:
+                db, orbits = self._load_chunks(filename)
+            else:
+                with Compression.open_text(filename) as csvfile:
+                    # Read CSV
+                    neo_data = csv.reader(csvfile, delimiter=',')
+                    next(neo_data, None)
+                    db, orbits = NEODatabase._parse_rows(neo_data)
+        profiling.count('load.parse', 'bytes', offset)
+        profiling.count('load.parse', 'rows', len(orbits))
+        profiling.count('load.parse', 'neos', len(db))
+
+        with profiling.stage('load.index'):
+            # Index the orbits under their close approach date.
+            date_index = {}
+            for orbit in orbits:
+                date_index.setdefault(orbit.orbit_date, []).append(orbit)
+
+            self.db = db
+            self.date_index = date_index
+            self.dates = sorted(date_index)
+            self.columns = ColumnarStore(self) if self.columnar else None
+            self.planner = QueryPlanner(self)
+            self.indexes = self._build_indexes() if self.range_indexes \
+                else None
+
+        if self.snapshot:
+            with profiling.stage('load.snapshot_save'):
+                self.save_snapshot(filename)
+        self.version += 1
+        self._start_shards()
+        return None
+
+    def _start_shards(self):
+        """
+        Starts the ShardedExecutor of the loaded data when shards is set,
+        which evaluates queries on the columnar store, or shares the store
+        of reloaded data with the running one.
+
+        :return: None
+        """
+        if self.shards <= 1:
+            return None
+        if self.columns is None:
+            self.columns = ColumnarStore(self)
+        if self.executor is None:
+            self.executor = ShardedExecutor(self.columns, self.shards)
+        else:
+            self.executor.update(self.columns)
+        return None
+
+    def close(self):
+        """
+        Releases the resources held by the loaded data: the workers and
+        shared memory of the ShardedExecutor and the data file mapped by
+        the RowIndex in lazy mode.
 
-        with open(filename, newline='') as csvfile:
-            # Read CSV
+        :return: None
+        """
+        if self.executor is not None:
+            self.executor.close()
+            self.executor = None
+        if self.rows is not None:
+            self.rows.close()
+        return None
+
+    def ingest(self, filename):
+        """
+        Appends the rows of a delta .csv file, with the same columns and
+        header as the data file, to the loaded data without reloading it.
+
+        :param filename: str representing the delta csv file
+        :return: int number of orbits added
+        """
+        if self.rows is not None:
+            raise UnsupportedFeature('Cannot ingest rows in lazy mode')
+        with Compression.open_text(filename) as csvfile, \
+                profiling.stage('ingest'):
             neo_data = csv.reader(csvfile, delimiter=',')
             next(neo_data, None)
-            for row in neo_data:
-                name = row[2]  # Extract name to check membership.
-                # Get the relevant elements
-                args = {'neo_id': row[0],
-                        'name': name,
-                        'diam_min': float(row[5]),
-                        'diam_max': float(row[6]),
-                        'hazard': row[13] == 'True',
-                        'orbit_date': datetime.strptime(row[17], '%Y-%m-%d'),
-                        'miss': float(row[21])}
-
-                # If this object is already in the DB
-                if name in checked_names:
-                    # Make a new Orbit Object
-                    orbit = OrbitPath(**args)
-                    # and update the orbits with the Object.
-                    db[name].update_orbits(orbit)
-
-                else:
-                    # Add the name to the set
-                    checked_names.add(name)
-                    # and create the NEO
-                    db[name] = NearEarthObject(**args)
-
-        self.db = db
+            return self._merge_rows(neo_data)
+
+    def tail(self):
+        """
+        Appends the rows written to the end of the data file since it was
+        loaded or last tailed, reading it from the byte offset reached so
+        far. Only complete lines are read: a row still being written is
+        left for the next call. A data file shorter than the offset has
+        been replaced, and is loaded again.
+
+        :return: int number of orbits added
+        """
+        if self.rows is not None:
+            raise UnsupportedFeature('Cannot tail the data file in lazy mode')
+        if Compression.detect(self.filename):
+            raise UnsupportedFeature('Cannot tail a compressed data file')
+        with open(self.filename, 'rb') as csvfile:
+            size = os.fstat(csvfile.fileno()).st_size
+            if size < self.offset:
+                self.load_data()
+                return sum(len(orbits) for orbits in self.date_index.values())
+            csvfile.seek(self.offset)
+            data = csvfile.read(size - self.offset)
+
+        data = data[:data.rfind(b'\n') + 1]
+        self.offset += len(data)
+        csvfile = io.TextIOWrapper(io.BytesIO(data), newline='')
+        with profiling.stage('ingest'):
+            return self._merge_rows(csv.reader(csvfile, delimiter=','))
+
+    def _merge_rows(self, rows):
+        """
+        Merges csv rows into the loaded data, in place: new orbits are
+        added to their NearEarthObject, to the date index and to the
+        RangeIndex secondary indexes as a full load of all rows would
+        have, while rows of an orbit already loaded, keyed on its NEO
+        name and close approach date, are skipped. The rows of the new
+        orbits are inserted into a copy of the columnar store, which
+        replaces it once complete so that queries in flight keep reading
+        a consistent store. The QueryPlanner statistics are refreshed as
+        the merged orbits grow.
+
+        :param rows: iterable of csv rows, without the header
+        :return: int number of orbits added
+        """
+        added = []
+        for row in rows:
+            if not row:
+                continue
+            (neo_id, name, diam_min, diam_max,
+             hazard, date_str, miss) = NEODatabase.Columns(row)
+            orbit_date = NEODatabase._parse_date(date_str)
+
+            neo = self.db.get(name)
+            if neo is None:
+                name = sys.intern(name)
+                neo = NearEarthObject(neo_id, name, float(diam_min),
+                                      float(diam_max), hazard == 'True')
+                self.db[name] = neo
+                if self.indexes is not None:
+                    for field in ('diam_min', 'diam_max', 'hazard'):
+                        self.indexes[field].insert(neo)
+            elif neo.approaches_between(orbit_date, orbit_date):
+                continue
+
+            postings = self.date_index.get(orbit_date)
+            if postings is None:
+                postings = self.date_index[orbit_date] = []
+                insort(self.dates, orbit_date)
+            else:
+                # Share the datetime of the date with its other orbits
+                orbit_date = postings[0].orbit_date
+
+            orbit = OrbitPath(neo, orbit_date, float(miss))
+            neo.update_orbits(orbit)
+            postings.append(orbit)
+            if self.indexes is not None:
+                self.indexes['miss'].insert(orbit)
+            added.append(orbit)
+
+        profiling.count('ingest', 'orbits', len(added))
+        if added and self.columns is not None:
+            columns = self.columns.extended(added)
+            if self.executor is not None:
+                self.executor.update(columns)
+            self.columns = columns
+        if added and self.planner is not None:
+            self.planner = self.planner.refreshed(self, len(added))
+        if added:
+            self.version += 1
+        return len(added)
+
+    @staticmethod
+    def _parse_rows(rows):
+        """
+        Instantiates the Near Earth Objects and OrbitPaths of csv rows.
+
+        :param rows: iterable of csv rows, without the header
+        :return: tuple of (dict of the Near Earth Object name to its
+        NearEarthObject, list of the OrbitPath of each row in order)
+        """
+        db = {}
+        orbits = []
+        # Close approach date string -> datetime, so that each distinct
+        # date is only parsed once and shared by all its orbits.
+        dates = {}
+
+        for row in rows:
+            # Get the relevant elements
+            (neo_id, name, diam_min, diam_max,
+             hazard, date_str, miss) = NEODatabase.Columns(row)
+
+            orbit_date = dates.get(date_str)
+            if orbit_date is None:
+                orbit_date = NEODatabase._parse_date(date_str)
+                dates[date_str] = orbit_date
+
+            neo = db.get(name)
+            # If this object is not in the DB yet, create the NEO,
+            # interning its name as it is also the key of the DB
+            if neo is None:
+                name = sys.intern(name)
+                neo = NearEarthObject(neo_id, name, float(diam_min),
+                                      float(diam_max), hazard == 'True')
+                db[name] = neo
+            # and update the orbits with the Object.
+            orbit = OrbitPath(neo, orbit_date, float(miss))
+            neo.update_orbits(orbit)
+            orbits.append(orbit)
+
+        return db, orbits
+
+    @staticmethod
+    @contextmanager
+    def _paused_gc():
+        """
+        Pauses cyclic garbage collection while instantiating loaded data:
+        it allocates millions of objects, none of them garbage, so the
+        collections only slow it down.
+        """
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            yield
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    @staticmethod
+    def _chunk_ranges(filename, chunks):
+        """
+        Splits the rows of a csv file in byte ranges starting and ending
+        on line boundaries, rows not containing quoted newlines.
+
+        :param filename: str representing the csv file
+        :param chunks: int number of ranges to split the rows into
+        :return: list of (start, end) byte offsets
+        """
+        with open(filename, 'rb') as csvfile:
+            csvfile.readline()  # Skip the header
+            bounds = [csvfile.tell()]
+            size = os.fstat(csvfile.fileno()).st_size
+            for i in range(1, chunks):
+                csvfile.seek(max(bounds[0] + (size - bounds[0]) * i // chunks,
+                                 bounds[-1]))
+                # Move on to the start of the next line
+                csvfile.readline()
+                bounds.append(csvfile.tell())
+            bounds.append(size)
+        return [(start, end) for start, end in zip(bounds, bounds[1:])
+                if end > start]
+
+    @staticmethod
+    def _parse_chunk(filename, start, end):
+        """
+        Parses the rows of a byte range of a csv file, in a worker.
+
+        The rows are returned in a compact form, quick to send back to
+        the parent process: a tuple of the NEO fields per NEO, in first
+        seen order, and per row arrays of its NEO position in that list,
+        its close approach date ordinal and its miss distance.
+
+        :param filename: str representing the csv file
+        :param start: int byte offset of the first row
+        :param end: int byte offset after the last row
+        :return: tuple of (list of (neo_id, name, diam_min, diam_max,
+        hazard) tuples, NEO positions, date ordinals, miss distances)
+        """
+        with open(filename, 'rb') as csvfile:
+            csvfile.seek(start)
+            data = csvfile.read(end - start)
+        return NEODatabase._parse_bytes(data)
+
+    @staticmethod
+    def _parse_bytes(data):
+        """
+        Parses csv rows in the compact form of _parse_chunk.
+
+        :param data: bytes of complete csv rows, without the header
+        :return: same as _parse_chunk
+        """
+        csvfile = io.TextIOWrapper(io.BytesIO(data), newline='')
+
+        neos = []
+        positions = {}
+        ordinals = {}
+        row_neo, row_date, row_miss = array('q'), array('q'), array('d')
+        for row in csv.reader(csvfile, delimiter=','):
+            (neo_id, name, diam_min, diam_max,
+             hazard, date_str, miss) = NEODatabase.Columns(row)
+
+            position = positions.get(name)
+            if position is None:
+                position = positions[name] = len(neos)
+                neos.append((neo_id, name, float(diam_min),
+                             float(diam_max), hazard == 'True'))
+
+            ordinal = ordinals.get(date_str)
+            if ordinal is None:
+                ordinal = NEODatabase._parse_date(date_str).toordinal()
+                ordinals[date_str] = ordinal
+
+            row_neo.append(position)
+            row_date.append(ordinal)
+            row_miss.append(float(miss))
+
+        return neos, row_neo, row_date, row_miss
+
+    @staticmethod
+    def _parse_members(filename, compression, members):
+        """
+        Decompresses and parses a range of members of a compressed csv
+        file, in a worker. Members do not end on line boundaries: the
+        partial lines before the first and after the last newline are
+        returned as is, to be joined to those of the adjacent ranges.
+
+        :param filename: str representing the compressed csv file
+        :param compression: str compression format of the file
+        :param members: list of (start, end) byte offsets of the members
+        :return: tuple of (bytes up to the first newline, rows parsed by
+        _parse_bytes or None without any newline, bytes after the last
+        newline)
+        """
+        data = Compression.decompress(filename, compression, members)
+        first = data.find(b'\n') + 1
+        if not first:
+            return data, None, b''
+        last = data.rfind(b'\n') + 1
+        return (data[:first], NEODatabase._parse_bytes(data[first:last]),
+                data[last:])
+
+    @staticmethod
+    def _parsed_chunks(filename, pool, chunks, window):
+        """
+        Parses the rows of a csv file, plain or compressed, in chunks on a
+        pool of worker processes. A plain file is split in byte ranges
+        and a compressed one in ranges of its members, each decompressed
+        by a worker. A compressed file that cannot be split is
+        decompressed here, its rows being sent to the workers.
+
+        :param filename: str representing the csv file
+        :param pool: ProcessPoolExecutor parsing the chunks
+        :param chunks: int number of chunks to split the file into
+        :param window: int max number of chunks parsed or waiting to be
+        consumed at once
+        :return: generator of the rows of each chunk, in the compact form
+        of _parse_chunk, in file order
+        """
+        compression = Compression.detect(filename)
+        if compression is None:
+            yield from NEODatabase._submitted(
+                pool, window,
+                ((NEODatabase._parse_chunk, filename, start, end)
+                 for start, end in NEODatabase._chunk_ranges(filename,
+                                                             chunks)))
+            return None
+
+        members = Compression.members(filename, compression)
+        if members is not None:
+            yield from NEODatabase._stitched(NEODatabase._submitted(
+                pool, window,
+                ((NEODatabase._parse_members, filename, compression, group)
+                 for group in Compression.split(members, chunks))))
+            return None
+
+        yield from NEODatabase._submitted(
+            pool, window, ((NEODatabase._parse_bytes, data)
+                           for data in NEODatabase._stream_chunks(filename)))
         return None
+
+    @staticmethod
+    def _submitted(pool, window, jobs):
+        """
+        Runs jobs on a pool, at most window at once.
+
+        :param jobs: iterable of (function, *args) tuples
+        :return: generator of the results of the jobs, in order
+        """
+        pending = deque()
+        for function, *args in jobs:
+            pending.append(pool.submit(function, *args))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    @staticmethod
+    def _stitched(results):
+        """
+        Joins the partial lines of ranges of members parsed by
+        _parse_members, the first line of the file being its header.
+
+        :param results: iterable of the results of _parse_members
+        :return: generator of the rows of each range, and of the lines
+        across ranges, in the compact form of _parse_chunk
+        """
+        header = True
+        partial = b''
+        for head, rows, tail in results:
+            partial += head
+            if rows is None:
+                continue
+            if not header:
+                yield NEODatabase._parse_bytes(partial)
+            header = False
+            yield rows
+            partial = tail
+        if partial.strip() and not header:
+            yield NEODatabase._parse_bytes(partial)
+
+    @staticmethod
+    def _stream_chunks(filename):
+        """
+        Decompresses a csv file in chunks of StreamChunkSize bytes of
+        complete rows, without the header.
+
+        :param filename: str representing the compressed csv file
+        :return: generator of bytes
+        """
+        with Compression.open(filename) as source:
+            source.readline()
+            partial = b''
+            for block in iter(lambda: source.read(
+                    NEODatabase.StreamChunkSize), b''):
+                data = partial + block
+                last = data.rfind(b'\n') + 1
+                partial = data[last:]
+                if last:
+                    yield data[:last]
+            if partial.strip():
+                yield partial
+
+    def _load_chunks(self, filename):
+        """
+        Parses a csv file in parallel: its rows are split in chunks
+        parsed by a pool of worker processes, see _parsed_chunks, then
+        instantiated in file order so that the result is the same as
+        parsing it serially. The first chunk a NEO is seen in provides
+        its id and diameters, and the orbits of the following chunks are
+        appended to it.
+
+        :param filename: str representing the csv file
+        :return: same as _parse_rows
+        """
+        # A few chunks per worker even out their parsing times.
+        chunks = self.workers * 4
+        db = {}
+        orbits = []
+        dates = {}
+        with ProcessPoolExecutor(self.workers) as pool, \
+                NEODatabase._paused_gc():
+            for neos, row_neo, row_date, row_miss in \
+                    NEODatabase._parsed_chunks(filename, pool, chunks, chunks):
+
+                chunk_neos = []
+                for neo_id, name, diam_min, diam_max, hazard in neos:
+                    neo = db.get(name)
+                    if neo is None:
+                        name = sys.intern(name)
+                        neo = NearEarthObject(neo_id, name, diam_min,
+                                              diam_max, hazard)
+                        db[name] = neo
+                    chunk_neos.append(neo)
+
+                for position, ordinal, miss in zip(row_neo, row_date,
+                                                   row_miss):
+                    orbit_date = dates.get(ordinal)
+                    if orbit_date is None:
+                        orbit_date = datetime.fromordinal(ordinal)
+                        dates[ordinal] = orbit_date
+                    neo = chunk_neos[position]
+                    orbit = OrbitPath(neo, orbit_date, miss)
+                    neo.update_orbits(orbit)
+                    orbits.append(orbit)
+        return db, orbits
+
+    def _build_indexes(self):
+        """
+        Builds the secondary indexes on the filterable fields.
+
+        :return: dict of field name to RangeIndex
+        """
+        neos = list(self.db.values())
+        orbits = [orbit for neo in neos for orbit in neo.orbits]
+        indexes = {field: RangeIndex(field, neos)
+                   for field in ('diam_min', 'diam_max', 'hazard')}
+        indexes['miss'] = RangeIndex('miss', orbits)
+        return indexes
+
+    @staticmethod
+    def _snapshot_path(filename):
+        """ Path of the snapshot of a data file, in the snapshot directory
+        of the current user rather than next to the data file, so that
+        being able to write the data directory is not enough to have a
+        snapshot unpickled. """
+        cache = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.cache')
+        name = hashlib.sha256(os.fsencode(os.path.abspath(filename)))
+        return os.path.join(cache, NEODatabase.SnapshotDirectory,
+                            f'{name.hexdigest()}.snapshot')
+
+    @staticmethod
+    def _owned(snapshot):
+        """ Check that an open snapshot belongs to the current user, and
+        that no one else can write it. """
+        if not hasattr(os, 'getuid'):
+            return True
+        stat = os.fstat(snapshot.fileno())
+        return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+    @staticmethod
+    def _source_signature(filename):
+        """
+        Signature of a data file, a snapshot of it is only valid
+        while its signature is unchanged.
+
+        :param filename: str representing the data file
+        :return: dict with the file size, mtime and content hash
+        """
+        stat = os.stat(filename)
+        return {'version': NEODatabase.SnapshotVersion,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'sha256': NEODatabase._digest(filename)}
+
+    @staticmethod
+    def _signature_matches(signature, filename):
+        """
+        Checks the signature of a snapshot against its data file: the
+        file is only hashed when its size is unchanged but its mtime
+        differs, e.g. after a copy.
+
+        :param signature: dict saved by _source_signature
+        :param filename: str representing the data file
+        :return: bool, whether the data file is unchanged
+        """
+        stat = os.stat(filename)
+        if signature.get('version') != NEODatabase.SnapshotVersion or \
+                signature['size'] != stat.st_size:
+            return False
+        if signature['mtime'] == stat.st_mtime_ns:
+            return True
+        return signature['sha256'] == NEODatabase._digest(filename)
+
+    @staticmethod
+    def _digest(filename):
+        """ sha256 hex digest of the content of a file. """
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as source:
+            for chunk in iter(lambda: source.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def save_snapshot(self, filename=None):
+        """
+        Saves the loaded data and its indexes to a binary snapshot of
+        the data file it was loaded from, in a directory of the user
+        cache only accessible by the current user, see _snapshot_path.
+
+        :param filename: str representing the data file
+        :return: bool representing if save successful or not
+        """
+        filename = filename or self.filename
+        path = NEODatabase._snapshot_path(filename)
+        state = {'db': self.db,
+                 'date_index': self.date_index,
+                 'dates': self.dates,
+                 'planner': self.planner,
+                 'indexes': self.indexes,
+                 'columns': self.columns}
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            # Write to a temporary file first so that a concurrent
+            # load never sees a partially written snapshot.
+            with open(f'{path}.{os.getpid()}.tmp', 'wb') as out:
+                pickle.dump(NEODatabase._source_signature(filename), out,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(state, out, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(out.name, path)
+        except OSError:
+            # The snapshot is only a cache, failing to write it is fine.
+            return False
+        return True
+
+    def load_snapshot(self, filename=None):
+        """
+        Loads the data and its indexes from the snapshot of a data file,
+        if there is one owned by the current user and the data file has
+        not changed since.
+
+        :param filename: str representing the data file
+        :return: bool representing if load successful or not
+        """
+        filename = filename or self.filename
+        try:
+            with open(NEODatabase._snapshot_path(filename), 'rb') as snap:
+                if not NEODatabase._owned(snap):
+                    return False
+                signature = pickle.load(snap)
+                if not NEODatabase._signature_matches(signature, filename):
+                    return False
+                with NEODatabase._paused_gc():
+                    state = pickle.load(snap)
+        except (OSError, ValueError, EOFError, KeyError, AttributeError,
+                pickle.UnpicklingError):
+            return False
+
+        self.db = state['db']
+        self.date_index = state['date_index']
+        self.dates = state['dates']
+        self.planner = state['planner']
+        if not self.range_indexes:
+            self.indexes = None
+        else:
+            self.indexes = state['indexes'] or self._build_indexes()
+        if not self.columnar:
+            self.columns = None
+        else:
+            self.columns = state['columns'] or ColumnarStore(self)
+        return True
+
+    @staticmethod
+    def _parse_date(date_str):
+        """
+        Parses a fixed format YYYY-MM-DD date without strptime.
+
+        :param date_str: str representing the date
+        :return: datetime
+        """
+        return datetime(int(date_str[0:4]), int(date_str[5:7]),
+                        int(date_str[8:10]))
+
+    def get_orbits_on(self, date):
+        """
+        Gets the orbits recorded on a given date.
+
+        :param date: datetime of the close approach
+        :return: list of OrbitPath
+        """
+        if self.rows is not None:
+            return self.rows.orbits_on(date)
+        return self.date_index.get(date, [])
+
+    def get_orbits_between(self, start_date, end_date):
+        """
+        Gets the orbits recorded between two dates, both included,
+        in date order.
+
+        :param start_date: datetime of the first close approach date
+        :param end_date: datetime of the last close approach date
+        :return: generator of OrbitPath
+        """
+        if self.rows is not None:
+            yield from self.rows.orbits_between(start_date, end_date)
+            return
+        start = bisect_left(self.dates, start_date)
+        end = bisect_right(self.dates, end_date)
+        for date in self.dates[start:end]:
+            yield from self.date_index[date]
+
+    def count_orbits_between(self, start_date, end_date):
+        """
+        Counts the orbits recorded between two dates, both included.
+
+        :param start_date: datetime of the first close approach date
+        :param end_date: datetime of the last close approach date
+        :return: int
+        """
+        if self.rows is not None:
+            return self.rows.count_between(start_date, end_date)
+        start = bisect_left(self.dates, start_date)
+        end = bisect_right(self.dates, end_date)
+        return sum(len(self.date_index[date])
+                   for date in self.dates[start:end])
@@ -0,0 +1,84 @@
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+from operator import attrgetter, itemgetter
+
+
+class RangeIndex(object):
+    """
+    Sorted secondary index over a field of NearEarthObject or OrbitPath
+    instances, answering range filters by binary search.
+
+    The index keeps the items sorted by their field value next to the
+    sorted values, so the items passing a comparison are a contiguous
+    slice found with two bisections.
+    """
+
+    def __init__(self, field, items):
+        """
+        :param field: str representing the attribute to index on
+        :param items: iterable of the instances to index
+        """
+        self.field = field
+        self.key = attrgetter(field)
+        self.items = sorted(items, key=self.key)
+        self.keys = [self.key(item) for item in self.items]
+
+    def insert(self, item):
+        """
+        Adds an instance to the index, keeping it sorted.
+
+        :param item: NearEarthObject or OrbitPath to index
+        :return: None
+        """
+        value = self.key(item)
+        position = bisect_right(self.keys, value)
+        self.keys.insert(position, value)
+        self.items.insert(position, item)
+
+    def groups(self, reverse=False):
+        """
+        Walks the instances in groups of equal field values.
+
+        :param reverse: bool, whether to walk the values in decreasing
+        order
+        :return: generator of lists of NearEarthObject or OrbitPath, by
+        increasing (decreasing) value
+        """
+        keys = reversed(self.keys) if reverse else iter(self.keys)
+        items = reversed(self.items) if reverse else iter(self.items)
+        for _, group in groupby(zip(keys, items), key=itemgetter(0)):
+            yield [item for _, item in group]
+
+    def _bounds(self, operation, value):
+        """ Slice of the items passing a comparison with value. """
+        if operation == '<=':
+            return 0, bisect_right(self.keys, value)
+        if operation == '<':
+            return 0, bisect_left(self.keys, value)
+        if operation == '>=':
+            return bisect_left(self.keys, value), len(self.keys)
+        if operation == '>':
+            return bisect_right(self.keys, value), len(self.keys)
+        return bisect_left(self.keys, value), bisect_right(self.keys, value)
+
+    def count(self, operation, value):
+        """
+        Counts the instances passing a comparison.
+
+        :param operation: str, one of Filter.Operators
+        :param value: value compared against
+        :return: int
+        """
+        start, end = self._bounds(operation, value)
+        return end - start
+
+    def find(self, operation, value):
+        """
+        Gets the instances passing a comparison.
+
+        :param operation: str, one of Filter.Operators
+        :param value: value compared against
+        :return: list of NearEarthObject or OrbitPath
+        """
+        start, end = self._bounds(operation, value)
+        return self.items[start:end]
@@ -0,0 +1,221 @@
+import csv
+import mmap
+import sys
+import threading
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from models import NearEarthObject, OrbitPath
+
+
+class LazyNearEarthObject(NearEarthObject):
+    """
+    NearEarthObject materialized on demand by a RowIndex, weakly
+    referenceable so the index finds it again while it is in use.
+    """
+    __slots__ = ('__weakref__',)
+
+
+class RowIndex(object):
+    """
+    Compact index of the rows of a csv data file, from which a lazy
+    NEODatabase materializes its objects on demand.
+
+    A single pass over the file records the byte offset and the NEO of
+    each row, in arrays, grouped by close approach date and by NEO. No
+    object is created on load: a NEO and all of its orbits are parsed
+    from its rows the first time an orbit of it matches a date search.
+
+    The NEOs last used are kept in a bounded LRU cache, and any other NEO
+    still referenced, e.g. by the results being written, is found again
+    rather than parsed twice, so each NEO has a single instance at a time.
+    The data file must not change while it is indexed.
+    """
+
+    # Number of recently used NEOs kept materialized.
+    CacheSize = 65536
+
+    def __init__(self, filename, columns, cache_size=None):
+        """
+        :param filename: str representing the csv data file
+        :param columns: itemgetter of the NEODatabase.Columns of a row
+        :param cache_size: int number of recently used NEOs kept, by
+        default CacheSize
+        """
+        self.filename = filename
+        self.columns = columns
+        self.cache_size = cache_size or RowIndex.CacheSize
+        self.cache = OrderedDict()
+        self.alive = weakref.WeakValueDictionary()
+        # Guards the LRU cache and the alive map, shared by the queries
+        # of concurrent threads.
+        self.lock = threading.Lock()
+        # Date bytes -> datetime, shared by the orbits of a date.
+        self.date_objects = {}
+
+        # Byte offset and NEO number of each row
+        self.offsets = array('q')
+        self.row_neo = array('i')
+        neos = {}
+        date_rows = {}
+        with open(filename, 'rb') as csvfile:
+            offset = len(csvfile.readline())
+            for line in csvfile:
+                if line.strip():
+                    _, name, _, _, _, date, _ = columns(RowIndex._fields(line))
+
+                    neo = neos.get(name)
+                    if neo is None:
+                        neo = neos[name] = len(neos)
+                    rows = date_rows.get(date)
+                    if rows is None:
+                        rows = date_rows[date] = array('i')
+                    rows.append(len(self.offsets))
+                    self.offsets.append(offset)
+                    self.row_neo.append(neo)
+                offset += len(line)
+
+        # Close approach date -> rows, in file order
+        self.date_rows = {self._date(date): rows
+                          for date, rows in date_rows.items()}
+        self.dates = sorted(self.date_rows)
+
+        # Rows of NEO n, in file order:
+        # neo_rows[neo_starts[n]:neo_starts[n + 1]]
+        count = len(neos)
+        self.neo_starts = array('q', bytes(8 * (count + 1)))
+        for neo in self.row_neo:
+            self.neo_starts[neo + 1] += 1
+        for neo in range(count):
+            self.neo_starts[neo + 1] += self.neo_starts[neo]
+        filled = array('q', self.neo_starts[:count])
+        self.neo_rows = array('i', bytes(4 * len(self.row_neo)))
+        for row, neo in enumerate(self.row_neo):
+            self.neo_rows[filled[neo]] = row
+            filled[neo] += 1
+
+        self.file = open(filename, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if self.offsets else b''
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        """
+        Unmaps and closes the data file, after which no NEO can be
+        materialized.
+
+        :return: None
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b''
+        self.file.close()
+
+    def neo(self, number):
+        """
+        Gets a NEO with all its orbits, materializing it if needed.
+
+        :param number: int number of the NEO in the index
+        :return: LazyNearEarthObject
+        """
+        with self.lock:
+            neo = self.alive.get(number)
+            if neo is None:
+                neo = self._materialize(number)
+                self.alive[number] = neo
+            self.cache[number] = neo
+            self.cache.move_to_end(number)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return neo
+
+    def orbit(self, row):
+        """
+        Gets the orbit of a row, materializing its NEO if needed.
+
+        :param row: int number of the row in the file
+        :return: OrbitPath
+        """
+        number = self.row_neo[row]
+        start = self.neo_starts[number]
+        neo = self.neo(number)
+        position = bisect_left(self.neo_rows, row, start,
+                               self.neo_starts[number + 1])
+        return neo.orbits[position - start]
+
+    def orbits_on(self, date):
+        """
+        Gets the orbits recorded on a given date.
+
+        :param date: datetime of the close approach
+        :return: list of OrbitPath
+        """
+        return [self.orbit(row) for row in self.date_rows.get(date, ())]
+
+    def orbits_between(self, start_date, end_date):
+        """
+        Gets the orbits recorded between two dates, both included,
+        in date order.
+
+        :param start_date: datetime of the first close approach date
+        :param end_date: datetime of the last close approach date
+        :return: generator of OrbitPath
+        """
+        start = bisect_left(self.dates, start_date)
+        end = bisect_right(self.dates, end_date)
+        for date in self.dates[start:end]:
+            for row in self.date_rows[date]:
+                yield self.orbit(row)
+
+    def count_between(self, start_date, end_date):
+        """
+        Counts the rows recorded between two dates, both included.
+
+        :return: int
+        """
+        start = bisect_left(self.dates, start_date)
+        end = bisect_right(self.dates, end_date)
+        return sum(len(self.date_rows[date]) for date in self.dates[start:end])
+
+    def _materialize(self, number):
+        """ Parse the rows of a NEO into a NEO with all of its orbits,
+        its id and diameters being those of its first row. """
+        neo = None
+        for position in range(self.neo_starts[number],
+                              self.neo_starts[number + 1]):
+            offset = self.offsets[self.neo_rows[position]]
+            end = self.data.find(b'\n', offset)
+            line = self.data[offset:end if end >= 0 else len(self.data)]
+            (neo_id, name, diam_min, diam_max,
+             hazard, date_str, miss) = self.columns(RowIndex._fields(line))
+            if neo is None:
+                neo = LazyNearEarthObject(neo_id.decode(),
+                                          sys.intern(name.decode()),
+                                          float(diam_min), float(diam_max),
+                                          hazard == b'True')
+            neo.update_orbits(OrbitPath(neo, self._date(date_str),
+                                        float(miss)))
+        return neo
+
+    @staticmethod
+    def _fields(line):
+        """ Split a csv line in its bytes fields. """
+        if b'"' in line:
+            # Quoted fields may hold commas
+            return [field.encode() for field in
+                    next(csv.reader([line.decode()]))]
+        return line.rstrip(b'\r\n').split(b',')
+
+    def _date(self, date_str):
+        """ Parse a YYYY-MM-DD bytes date, shared by the orbits of the
+        date. """
+        orbit_date = self.date_objects.get(date_str)
+        if orbit_date is None:
+            orbit_date = datetime(int(date_str[0:4]), int(date_str[5:7]),
+                                  int(date_str[8:10]))
+            self.date_objects[date_str] = orbit_date
+        return orbit_date
@@ -15,30 +15,106 @@ Search options:
 Output options: Required.
 - display: prints to stdout
 - csv_file: exports data to a csv
+- ndjson: exports data as newline-delimited JSON, one object per line
+- columnar_file: exports data as a columnar table, Parquet if pyarrow is installed, otherwise a NumPy .npz archive
+
+- serve: keeps the data loaded and answers queries over HTTP until interrupted, e.g. main.py serve --port 8000 then
+  GET http://127.0.0.1:8000/query?start_date=2020-01-01&end_date=2020-01-10&number=10&filter=diameter:>=:0.042
+  with the same options as the command line, returning newline-delimited JSON.
+  GET http://127.0.0.1:8000/stats reports the hits and misses of the query cache.
+  With --tail SECONDS, the rows appended to the csv data file are added every SECONDS without reloading it.
+
+- aggregate: writes summary statistics of the results as a csv table, to stdout by default, rather than the results,
+  e.g. main.py aggregate --start_date 2020-01-01 --end_date 2020-12-31 --group_by month hazard
+  with a row per group: the number of orbits and of distinct NEOs, the min, mean and max miss distance (km) of the
+  orbits and the min, mean and max diameter (km) of the NEOs. --group_by takes any of day, month and year buckets of
+  the close approach date, hazard, neo, and diameter or distance, grouped on powers of ten. The orbits summarized are
+  those of the results: each one matching the query for Path, every one within the dates of each matching NEO for NEO.
 
 Filters options: Optional. Input as: option:operation:value e.g. diameter:>=:0.042
 - is_hazardous:[=]:bool
-- diameter:[>=|=|<=]:float
-- distance:[>=|=|<=]:float
+- diameter:[>=|>|=|<=|<]:float, compared against the maximum diameter estimate for >= and >, the minimum otherwise
+- distance:[>=|>|=|<=|<]:float
 
 Return objects options: Optional, defaults to NEO if not specified.
 - NEO
 - Path
 
+Sort: Optional, --sort orders the results on a field before taking the first number of them, e.g. --sort miss for the
+closest approaches, --sort diameter-desc for the largest NEOs: miss (or distance), diameter or date, suffixed with
+-desc for a decreasing order. NEOs are ordered on their closest (or farthest) or first (or last) approach matching the dates, and
+on their maximum diameter estimate.
+
+Columnar: Optional, --columnar evaluates the search with the NumPy backed columnar store (requires numpy).
+
+Range indexes: Optional, --range_indexes builds sorted indexes on the diameter, hazard and distance fields so that
+selective filters, e.g. distance:<=:384400, are answered by bisection rather than by checking every date match.
+
+Snapshot: Optional, --snapshot saves the loaded data to a binary snapshot, which later runs load instead of the csv for as
+long as the csv is unchanged. Snapshots are pickles, so they are kept in $XDG_CACHE_HOME/neo-database (~/.cache by
+default), only accessible by the current user, rather than next to the csv, and snapshots not owned by the user or
+writable by others are ignored.
+
+Workers: Optional, --workers N parses the csv data file with N processes, each parsing a range of its rows.
+
+Shards: Optional, --shards N evaluates each query with N processes sharing the columnar store (requires numpy), each
+searching a range of the matching dates.
+
+Ingest: Optional, --ingest paths of delta csv files, with the same columns as the data file, whose rows are appended to
+the loaded data. Rows of an orbit already loaded, the same NEO name and close approach date, are skipped.
+
+Cache: Optional, --cache N keeps the results of the last N distinct queries, answering repeated queries, e.g. of the
+serve mode or of --queries, without searching the data again.
+
+Profile: Optional, --profile path of a JSON report of the time spent loading, searching and writing, with the rows and
+candidates of each stage, the measured selectivity of each filter and the peak memory, "-" for stderr. --profile_dump
+also dumps cProfile statistics to a path, for pstats or snakeviz. The NEO_PROFILE and NEO_PROFILE_DUMP environment
+variables set them as well. Searches are run to completion before writing when profiling, to time them apart.
+
+Lazy: Optional, --lazy only indexes the rows of the csv data file on load, creating the objects of the rows matching a
+query on demand, for short date ranges of large files. --object_cache N sets the number of NEOs kept created.
+It cannot be combined with --columnar, --snapshot, --range_indexes or --shards.
+
+Pipeline: Optional, --pipeline overlaps the parsing of the csv data file by --workers processes, the matching of its
+rows against the queries and the writing of the results, through bounded queues, only creating the objects of the NEOs
+matching the dates of a query. It cannot be combined with serve, --columnar, --snapshot, --range_indexes, --shards,
+--lazy or --ingest.
+
+Outfile: Optional, -o/--outfile path of the file to write the results to, "-" for stdout. By default display prints to
+stdout and csv_file writes to out/neo.csv or out/orbit.csv.
+
+Queries: Optional, --queries path of a file with one query per line, as JSON objects with the same options as the
+command line and an optional "outfile", e.g. {"date": "2020-01-01", "number": 10, "filter": ["diameter:>=:0.042"]}.
+All queries are run in a single pass over the data.
+
 Filename: Optional, used for specifying a filename for a csv to load data from. By default project looks for a csv in: data/neo_data.csv.
+The csv may be compressed with gzip, bzip2, xz or zstd (requires zstandard), detected from its first bytes and
+decompressed while it is parsed. With --workers, files of independent members, e.g. bgzip or multi-stream xz and zstd
+files, are decompressed in parallel. Compressed files cannot be used with --lazy or --tail.
 """
 
 import argparse
+import json
+import logging
+import os
 import pathlib
 import sys
 from datetime import datetime
 
+import profiling
 from exceptions import UnsupportedFeature
 from database import NEODatabase
+from pipeline import Pipeline
 from search import Query, NEOSearcher
+from aggregate import Aggregate
+from server import NEOServer
 from writer import OutputFormat, NEOWriter
 
 PROJECT_ROOT = pathlib.Path(__file__).parent.absolute()
+# Output option running a query server instead of a single query.
+SERVE = 'serve'
+# Output option writing summary statistics of the results instead.
+AGGREGATE = 'aggregate'
 
 
 def verify_date(datetime_str):
@@ -63,7 +139,7 @@ def verify_output_choice(choice):
     :param choice:    String representing an OutputFormat
     :return: str:     String representing an OutputFormat
     """
-    options = OutputFormat.list()
+    options = OutputFormat.list() + [SERVE, AGGREGATE]
 
     if choice not in options:
         error_message = f'Not a valid output option: "{choice}"'
@@ -72,9 +148,34 @@ def verify_output_choice(choice):
     return options[options.index(choice)]
 
 
+def load_queries(path):
+    """
+    Function that reads a batch of queries from a file with one JSON
+    object per line, holding the same options as the command line, e.g.
+    {"start_date": "2020-01-01", "end_date": "2020-01-10", "number": 10,
+     "filter": ["diameter:>=:0.042"], "outfile": "out/large.csv"}
+
+    :param path:      String representing the path of the queries file
+    :return: list:    List of (Query.Selectors, outfile or None) tuples
+    """
+    queries = []
+    with open(path) as queries_file:
+        for line in queries_file:
+            if not line.strip():
+                continue
+            options = json.loads(line)
+            for key in ('date', 'start_date', 'end_date'):
+                if key in options:
+                    verify_date(options[key])
+            options.setdefault('return_object', 'NEO')
+            outfile = options.pop('outfile', None)
+            queries.append((Query(**options).build_query(), outfile))
+    return queries
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Near Earth Objects (NEOs) Database')
-    parser.add_argument('output', choices=OutputFormat.list(), type=verify_output_choice,
+    parser.add_argument('output', choices=OutputFormat.list() + [SERVE, AGGREGATE], type=verify_output_choice,
                         help='Select option for how to output the search results.')
     parser.add_argument('-r', '--return_object', choices=['NEO', 'Path'],
                         default='NEO', type=str,
@@ -85,55 +186,165 @@ if __name__ == '__main__':
     parser.add_argument('-e', '--end_date', type=verify_date,
                         help='YYYY-MM-DD format to find NEOs up to the end date')
     parser.add_argument('-n', '--number', type=int, help='Int representing max number of NEOs to return')
-    parser.add_argument('-f', '--filename', type=str, help='Name of input csv data file')
+    parser.add_argument('--sort', choices=Query.sort_options(),
+                        help='Field to order the results on, suffixed with -desc for a decreasing order')
+    parser.add_argument('-f', '--filename', type=str, help='Name of input csv data file, optionally compressed')
+    parser.add_argument('-o', '--outfile', type=str,
+                        help='Path of the file to write the results to, "-" for stdout')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Evaluate the search in bulk with the NumPy columnar backend')
+    parser.add_argument('--range_indexes', action='store_true',
+                        help='Build sorted indexes on the filterable fields to answer selective filters by bisection')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='Cache the loaded data in a binary snapshot in the cache directory of the user')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes parsing the csv data file')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Number of processes evaluating each query on the columnar backend')
+    parser.add_argument('--ingest', nargs='+', default=[],
+                        help='Paths of delta csv files to append to the loaded data')
+    parser.add_argument('--cache', type=int, default=0,
+                        help='Number of distinct query results to cache')
+    parser.add_argument('--profile', type=str, default=os.environ.get(profiling.ReportVariable),
+                        help='Path of a JSON report of the time spent in each stage, "-" for stderr')
+    parser.add_argument('--profile_dump', type=str, default=os.environ.get(profiling.DumpVariable),
+                        help='Path to dump cProfile statistics to')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Only index the rows on load, creating the objects matching a query on demand')
+    parser.add_argument('--object_cache', type=int,
+                        help='Number of NEOs kept created in lazy mode')
+    parser.add_argument('--group_by', nargs='+', choices=list(Aggregate.Groups), default=[],
+                        help='Fields to group the results of the aggregate output on')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Overlap parsing, searching and writing, only creating the objects matching the queries')
     parser.add_argument('--filter', nargs='+', help='Select filter options with filter value: '
                                                     'is_hazardous:[=]:bool, '
-                                                    'diameter:[>=|=|<=]:float, '
-                                                    'distance:[>=|=|<=]:float.'
+                                                    'diameter:[>=|>|=|<=|<]:float, '
+                                                    'distance:[>=|>|=|<=|<]:float. '
                                                     'Input as: [option:operation:value] '
                                                     'e.g. diameter:>=:0.042')
 
+    parser.add_argument('--queries', type=str,
+                        help='Path of a file of queries to run in a single pass, one JSON object per line')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Interface the serve mode listens on')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port the serve mode listens on')
+    parser.add_argument('--tail', type=float,
+                        help='Seconds between reads of the rows appended to the data file in serve mode')
+
     args = parser.parse_args()
     var_args = vars(args)
 
+    if args.profile or args.profile_dump:
+        profiling.start(report=args.profile, dump=args.profile_dump)
+
+    # Build Queries, ahead of the load for the pipelined mode to match rows against them
+    if args.output == AGGREGATE and args.number is None:
+        # Aggregates summarize all of the results
+        var_args['number'] = 0
+    if args.output != SERVE:
+        if args.queries:
+            try:
+                queries = load_queries(args.queries)
+            except (OSError, ValueError, KeyError, argparse.ArgumentTypeError) as e:
+                print(f'Could not read queries from {args.queries}: {e}')
+                sys.exit()
+        else:
+            queries = [(Query(**var_args).build_query(), args.outfile)]
+
     # Load Data
     if args.filename:
         filename = args.filename
     else:
         filename = f'{PROJECT_ROOT}/data/neo_data.csv'
 
-    db = NEODatabase(filename=filename)
+    pipelined = var_args.pop('pipeline')
+    workers = var_args.pop('workers')
     try:
-        db.load_data()
+        if pipelined and (args.output == SERVE or args.columnar or args.snapshot or args.range_indexes
+                          or args.shards > 1 or args.lazy or args.ingest):
+            raise UnsupportedFeature('The pipelined mode cannot be combined with serve, --columnar, --snapshot, '
+                                     '--range_indexes, --shards, --lazy or --ingest')
+        db = NEODatabase(filename=filename, columnar=var_args.pop('columnar'),
+                         snapshot=var_args.pop('snapshot'),
+                         range_indexes=var_args.pop('range_indexes'),
+                         workers=workers,
+                         shards=var_args.pop('shards'),
+                         cache_size=var_args.pop('cache'),
+                         lazy=var_args.pop('lazy'),
+                         object_cache=var_args.pop('object_cache'))
+        if pipelined:
+            db = Pipeline(filename, workers=workers).load(
+                [query_selectors for query_selectors, _ in queries])
+        else:
+            db.load_data()
+        for delta in var_args.pop('ingest'):
+            db.ingest(delta)
     except FileNotFoundError as e:
         print(f'File {var_args.get("filename")} not found, please try another file name.')
         sys.exit()
+    except UnsupportedFeature as e:
+        print(f'Unsupported Feature: {e}')
+        sys.exit()
     except Exception as e:
         print(Exception)
         sys.exit()
 
-    # Build Query
-    query_selectors = Query(**var_args).build_query()
+    # Serve queries on the loaded data until interrupted
+    if args.output == SERVE:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+        try:
+            NEOServer(db, host=args.host, port=args.port, tail=args.tail).serve_forever()
+        finally:
+            db.close()
+        sys.exit()
 
     # Get Results
     try:
-        results = NEOSearcher(db).get_objects(query_selectors)
+        with profiling.stage('search'):
+            if args.output == AGGREGATE:
+                all_results = [NEOSearcher(db).aggregate(query_selectors, args.group_by)
+                               for query_selectors, _ in queries]
+            elif args.queries:
+                # Run all queries in a single pass over the data
+                all_results = NEOSearcher(db).get_objects_batch(
+                    [query_selectors for query_selectors, _ in queries])
+            else:
+                all_results = [NEOSearcher(db).iter_objects(queries[0][0])]
+            if profiling.active():
+                # Search to completion, to time the search apart from the writes
+                all_results = [list(results) for results in all_results]
+                profiling.count('search', 'results', sum(map(len, all_results)))
     except UnsupportedFeature as e:
         print('Unsupported Feature; Write unsuccessful')
         sys.exit()
 
     # Output Results
-    #try:
-    result = NEOWriter().write(
-        data=results,
-        format=args.output,
-    )
-    #except Exception as e:
-    #    print(e)
-    #    print('Write unsuccessful')
-    #    sys.exit()
+    result = True
+    for (_, outfile), results in zip(queries, all_results):
+        try:
+            with profiling.stage('write'):
+                # Pipelined writes overlap the search still running
+                if args.output == AGGREGATE:
+                    result = NEOWriter().write_aggregate(
+                        results, args.group_by, out=outfile or args.outfile) and result
+                else:
+                    write = Pipeline.write if pipelined else NEOWriter().write
+                    result = write(
+                        data=results,
+                        format=args.output,
+                        out=outfile or args.outfile,
+                    ) and result
+        except UnsupportedFeature as e:
+            print(f'Unsupported Feature: {e}; Write unsuccessful')
+            sys.exit()
+
+    db.close()
 
+    # Keep stdout clean when the results themselves are piped through it
+    status = sys.stderr if args.outfile == '-' or (args.output == AGGREGATE and not args.outfile) else sys.stdout
     if result:
-        print('Write successful.')
+        print('Write successful.', file=status)
     else:
-        print('Write unsuccessful.')
+        print('Write unsuccessful.', file=status)
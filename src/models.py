@@ -10,31 +10,107 @@ class NearEarthObject(object):
     :param dim_min: minimum diamater in km (float)
     :param dim_max: maximum diameter im km (float)
     :param hazard: whether it is potentially hazardous (bool)
+    :param first_date: date of the first orbit (datetime)
+    :param last_date: date of the last orbit (datetime)
+    :param miss_min: miss distance of the closest orbit in km (float)
+    :param miss_max: miss distance of the farthest orbit in km (float)
+
+    The first and last dates and min and max miss distances summarize
+    the orbits, kept current as they are added, so that searches can
+    rule out all the orbits of a NEO at once.
     """
 
-    def __init__(self, **kwargs):
+    # Slots instead of a per instance __dict__ keep the catalog compact.
+    __slots__ = ('neo_id', 'name', 'orbits', 'diam_min', 'diam_max',
+                 'hazard', 'first_date', 'last_date', 'miss_min',
+                 'miss_max')
+
+    def __init__(self, neo_id, name, diam_min, diam_max, hazard,
+                 orbit_date=None, miss=None, **kwargs):
         """
         Init functon for NearEarthObjects
-        :param kwargs:    dict of attributes about a given Near Earth Object,
-        only a subset of attributes used
+        :param neo_id:    identifier (str)
+        :param name:      name of the object (str)
+        :param diam_min:  minimum diameter in km (float)
+        :param diam_max:  maximum diameter in km (float)
+        :param hazard:    whether it is potentially hazardous (bool)
+        :param orbit_date: optional date of a first orbit (datetime)
+        :param miss:      optional miss distance of a first orbit (float)
+        :param kwargs:    other attributes about the Near Earth Object,
+        unused
         """
-        self.neo_id = kwargs['neo_id']
-        self.name = kwargs['name']
-        self.orbits = [OrbitPath(**kwargs), ]
-        self.orbit_dates = [kwargs['orbit_date'], ]
-        self.diam_min = kwargs['diam_min']
-        self.diam_max = kwargs['diam_max']
-        self.hazard = kwargs['hazard']
+        self.neo_id = neo_id
+        self.name = name
+        self.orbits = []
+        self.diam_min = diam_min
+        self.diam_max = diam_max
+        self.hazard = hazard
+        # Summary of the orbits, until the first one is added.
+        self.first_date = None
+        self.last_date = None
+        self.miss_min = float('inf')
+        self.miss_max = float('-inf')
+        if orbit_date is not None:
+            self.update_orbits(OrbitPath(self, orbit_date, miss))
+
+    @property
+    def orbit_dates(self):
+        """ List of the orbit dates, derived from the orbits. """
+        return [orbit.orbit_date for orbit in self.orbits]
 
     def update_orbits(self, orbit):
         """
-        Adds an orbit path information to a Near Earth Object list of orbits
+        Adds an orbit path information to a Near Earth Object list of orbits,
+        updating the summary of its orbits
 
         :param orbit: OrbitPath
         :return: None
         """
         self.orbits.append(orbit)
-        self.orbit_dates.append(orbit.orbit_date)
+        orbit_date = orbit.orbit_date
+        if self.first_date is None or orbit_date < self.first_date:
+            self.first_date = orbit_date
+        if self.last_date is None or orbit_date > self.last_date:
+            self.last_date = orbit_date
+        miss = orbit.miss
+        if miss < self.miss_min:
+            self.miss_min = miss
+        if miss > self.miss_max:
+            self.miss_max = miss
+
+    def orbits_between(self, start_date, end_date):
+        """
+        Gets the orbits between two dates, both included, only checking
+        the date of each orbit when the dates cover part of the orbits.
+
+        :param start_date: datetime of the first date
+        :param end_date: datetime of the last date
+        :return: list of OrbitPath, in the order they were added
+        """
+        if not self.orbits or self.first_date > end_date or \
+                self.last_date < start_date:
+            return []
+        if start_date <= self.first_date and self.last_date <= end_date:
+            return self.orbits
+        return [orbit for orbit in self.orbits
+                if start_date <= orbit.orbit_date <= end_date]
+
+    def approaches_between(self, start_date, end_date):
+        """
+        Checks whether any orbit is between two dates, both included,
+        see orbits_between.
+
+        :param start_date: datetime of the first date
+        :param end_date: datetime of the last date
+        :return: bool
+        """
+        if not self.orbits or self.first_date > end_date or \
+                self.last_date < start_date:
+            return False
+        if start_date <= self.first_date and self.last_date <= end_date:
+            return True
+        return any(start_date <= orbit.orbit_date <= end_date
+                   for orbit in self.orbits)
 
     def print_neo_id(self):
         return(self.neo_id)
@@ -59,19 +135,29 @@ class OrbitPath(object):
     """
     Object containing data describing a Near Earth Object orbit.
 
-    :param name: name of the object (str)
+    :param neo: the Near Earth Object of the orbit (NearEarthObject)
     :param orbit_date: close approach date (datetime)
     :param miss: miss distance in kilometers (float)
     """
 
-    def __init__(self, **kwargs):
+    __slots__ = ('neo', 'orbit_date', 'miss')
+
+    def __init__(self, neo, orbit_date, miss, **kwargs):
         """
-        :param kwargs:    dict of attributes about a given orbit,
-        only a subset of attributes used
+        :param neo:        the Near Earth Object of the orbit
+        (NearEarthObject)
+        :param orbit_date: close approach date (datetime)
+        :param miss:       miss distance in kilometers (float)
+        :param kwargs:     other attributes about the orbit, unused
         """
-        self.name = kwargs['name']
-        self.orbit_date = kwargs['orbit_date']
-        self.miss = kwargs['miss']
+        self.neo = neo
+        self.orbit_date = orbit_date
+        self.miss = miss
+
+    @property
+    def name(self):
+        """ Name of the Near Earth Object of the orbit. """
+        return self.neo.name
 
     def print_name(self):
         print(self.name)
@@ -0,0 +1,231 @@
+import os
+import queue
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import profiling
+from database import NEODatabase
+from models import NearEarthObject, OrbitPath
+from search import NEOSearcher
+from writer import NEOWriter
+
+
+class Pipeline(object):
+    """
+    One-shot export overlapping the parsing of a csv data file, the
+    matching of its rows against queries and the writing of the results,
+    connected by bounded queues.
+
+    The parse stage runs in worker processes, each parsing (and
+    decompressing) chunks of the file into compact rows. Meanwhile a
+    match thread takes the parsed ranges in file order, as they arrive,
+    and creates the objects of a NEO once one of its orbits is on the
+    dates of a query, with its earlier orbits, and of its next orbits as
+    they are parsed. The rows of the other NEOs are kept as arrays until
+    they match, if ever.
+    The objects form a NEODatabase that answers the queries as a fully
+    loaded one would. Their results are written by a writer thread as
+    they are found.
+
+    At most Depth parsed ranges wait to be matched, and Depth batches of
+    results to be written, so a slower stage holds back the previous
+    one rather than having its input pile up in memory.
+    """
+
+    # Bytes of the csv file parsed at once by a worker.
+    ChunkSize = 1 << 22
+    # Number of parsed ranges, or result batches, a stage queues at most.
+    Depth = 4
+
+    def __init__(self, filename, workers=1):
+        """
+        :param filename: str representing the csv data file
+        :param workers: int number of processes parsing the file
+        """
+        self.filename = filename
+        self.workers = max(1, workers)
+
+    def load(self, queries):
+        """
+        Parses the data file and keeps the NEOs matching the date search
+        of any of the queries.
+
+        :param queries: list of Query.Selectors objects
+        :return: NEODatabase of the NEOs with an orbit on the dates of a
+        query, which answers these queries
+        """
+        starts, ends = Pipeline._intervals(queries)
+        self.db = NEODatabase(self.filename)
+        # Number of each NEO by name, in first seen order, with its fields
+        # and its object once matched.
+        self.numbers = {}
+        self.fields = []
+        self.objects = []
+        # NEO number -> (dates, distances) arrays of the rows of a NEO not
+        # matched yet.
+        self.pending = {}
+        self.dates = {}
+        self.rows = 0
+
+        parsed = queue.Queue(self.Depth)
+        outcome = {}
+
+        def matcher():
+            try:
+                for ranges in iter(parsed.get, None):
+                    self._match(ranges, starts, ends)
+            except Exception as e:
+                outcome['error'] = e
+                # Keep taking ranges so that the parse never blocks
+                for _ in iter(parsed.get, None):
+                    pass
+
+        size = os.stat(self.filename).st_size
+        chunks = max(self.workers * self.Depth, size // self.ChunkSize)
+        thread = threading.Thread(target=matcher, name='NEOMatcher')
+        with profiling.stage('load.parse'), NEODatabase._paused_gc(), \
+                ProcessPoolExecutor(self.workers) as pool:
+            thread.start()
+            try:
+                for ranges in NEODatabase._parsed_chunks(
+                        self.filename, pool, chunks, self.Depth):
+                    if 'error' in outcome:
+                        break
+                    parsed.put(ranges)
+            finally:
+                parsed.put(None)
+                thread.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        profiling.count('load.parse', 'bytes', size)
+        profiling.count('load.parse', 'rows', self.rows)
+        profiling.count('load.parse', 'neos', len(self.fields))
+
+        db = self.db
+        with profiling.stage('load.index'):
+            db.dates = sorted(db.date_index)
+        profiling.count('load.index', 'neos', len(db.db))
+        return db
+
+    @staticmethod
+    def _intervals(queries):
+        """
+        Merges the date searches of queries into disjoint date ranges.
+
+        :param queries: list of Query.Selectors objects
+        :return: tuple of the sorted lists of the first and last date
+        ordinals, both included, of each range
+        """
+        starts, ends = [], []
+        for start, end in sorted(
+                tuple(date.toordinal() for date in
+                      NEOSearcher._date_range(query.date_search))
+                for query in queries):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    def _match(self, parsed, starts, ends):
+        """ Create the objects of the rows of a parsed range whose NEO has
+        an orbit within the date ranges, keeping the other rows. """
+        neos, row_neo, row_date, row_miss = parsed
+        numbers = []
+        for fields in neos:
+            number = self.numbers.get(fields[1])
+            if number is None:
+                number = self.numbers[fields[1]] = len(self.fields)
+                self.fields.append(fields)
+                self.objects.append(None)
+            numbers.append(number)
+
+        objects = self.objects
+        for position, ordinal, miss in zip(row_neo, row_date, row_miss):
+            number = numbers[position]
+            neo = objects[number]
+            if neo is None:
+                # Within the range starting at or before the date, if any
+                i = bisect_right(starts, ordinal) - 1
+                if i < 0 or ordinal > ends[i]:
+                    dates, misses = self.pending.setdefault(
+                        number, (array('q'), array('d')))
+                    dates.append(ordinal)
+                    misses.append(miss)
+                    continue
+                neo = self._create(number)
+            self._add_orbit(neo, ordinal, miss)
+        self.rows += len(row_neo)
+
+    def _create(self, number):
+        """ Create the object of a matched NEO, with its earlier orbits.
+
+        These are all outside the date ranges, so the orbits on the dates
+        of the queries are still indexed in file order. """
+        neo_id, name, diam_min, diam_max, hazard = self.fields[number]
+        name = sys.intern(name)
+        neo = self.objects[number] = self.db.db[name] = NearEarthObject(
+            neo_id, name, diam_min, diam_max, hazard)
+        dates, misses = self.pending.pop(number, ((), ()))
+        for ordinal, miss in zip(dates, misses):
+            self._add_orbit(neo, ordinal, miss)
+        return neo
+
+    def _add_orbit(self, neo, ordinal, miss):
+        """ Create and index an orbit of a matched NEO. """
+        orbit_date = self.dates.get(ordinal)
+        if orbit_date is None:
+            orbit_date = self.dates[ordinal] = datetime.fromordinal(ordinal)
+        orbit = OrbitPath(neo, orbit_date, miss)
+        neo.update_orbits(orbit)
+        self.db.date_index.setdefault(orbit_date, []).append(orbit)
+
+    @staticmethod
+    def write(data, **kwargs):
+        """
+        Writes results with a NEOWriter running in a writer thread, fed
+        batches of results through a bounded queue as they are found.
+
+        :param data: iterable of NearEarthObjects or OrbitPaths
+        :param kwargs: arguments of NEOWriter.write, e.g. format and out
+        :return: bool representing if write successful or not
+        """
+        batches = queue.Queue(Pipeline.Depth)
+        outcome = {}
+
+        def consume():
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                yield from batch
+
+        def writer():
+            batched = consume()
+            try:
+                outcome['result'] = NEOWriter().write(data=batched, **kwargs)
+            except Exception as e:
+                outcome['error'] = e
+            # Keep taking batches so that the search never blocks
+            for _ in batched:
+                pass
+
+        thread = threading.Thread(target=writer, name='NEOWriter')
+        thread.start()
+        try:
+            results = iter(data)
+            for batch in iter(lambda: list(islice(results, NEOWriter.BatchSize)),
+                              []):
+                batches.put(batch)
+        finally:
+            batches.put(None)
+            thread.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
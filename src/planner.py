@@ -0,0 +1,143 @@
+from bisect import bisect_left, bisect_right
+from search import Filter
+
+
+class ColumnStats(object):
+    """
+    Cheap statistics of a column of values, collected at load time:
+    a sorted sample of at most SampleSize values, evenly strided over
+    the column, used to estimate the fraction of values passing a
+    comparison.
+    """
+
+    SampleSize = 4096
+
+    def __init__(self, values):
+        """
+        :param values: list of the values of the column
+        """
+        self.count = len(values)
+        stride = max(1, self.count // ColumnStats.SampleSize)
+        self.sample = sorted(values[::stride])
+
+    def selectivity(self, operation, value):
+        """
+        Estimates the fraction of values passing a comparison.
+
+        :param operation: str, one of Filter.Operators
+        :param value: value compared against
+        :return: float between 0 and 1
+        """
+        if not self.sample:
+            return 0.0
+        size = len(self.sample)
+        if operation == '<=':
+            passing = bisect_right(self.sample, value)
+        elif operation == '<':
+            passing = bisect_left(self.sample, value)
+        elif operation == '>=':
+            passing = size - bisect_left(self.sample, value)
+        elif operation == '>':
+            passing = size - bisect_right(self.sample, value)
+        else:
+            passing = bisect_right(self.sample, value) - \
+                bisect_left(self.sample, value)
+        return passing / size
+
+
+class QueryPlanner(object):
+    """
+    Object ordering the filters of a query so that the most selective
+    and cheapest ones run first, short-circuiting the rest.
+
+    Each filter is ranked by cost / (1 - selectivity), its cost being
+    the number of comparisons it makes per NEO: one for the NEO fields
+    and for the inequalities on orbit fields, decided by the summary of
+    the orbits of the NEO, and otherwise the average number of orbits
+    per NEO.
+
+    The statistics are collected again once the orbits merged into the
+    database since they were collected make more than RefreshRatio of
+    them, so that rows ingested or tailed are accounted for without
+    scanning the whole database on each merge.
+    """
+
+    # Fraction of orbits added to the database, past which the statistics
+    # are collected again.
+    RefreshRatio = 0.1
+
+    def __init__(self, db):
+        """
+        :param db: loaded NEODatabase
+        """
+        neos = list(db.db.values())
+        orbits = sum(len(neo.orbits) for neo in neos)
+        self.orbits = orbits
+        self.added = 0
+        self.orbits_per_neo = orbits / len(neos) if neos else 0.0
+        self.stats = {
+            'diam_min': ColumnStats([neo.diam_min for neo in neos]),
+            'diam_max': ColumnStats([neo.diam_max for neo in neos]),
+            'hazard': ColumnStats([neo.hazard for neo in neos]),
+            'miss': ColumnStats([orbit.miss for neo in neos
+                                 for orbit in neo.orbits]),
+            'miss_min': ColumnStats([neo.miss_min for neo in neos
+                                     if neo.orbits]),
+            'miss_max': ColumnStats([neo.miss_max for neo in neos
+                                     if neo.orbits]),
+        }
+
+    def refreshed(self, db, added):
+        """
+        Accounts for orbits merged into a database.
+
+        :param db: NEODatabase the orbits were merged into
+        :param added: int number of orbits added
+        :return: QueryPlanner of the database, a new one if the
+        statistics of this one are outdated
+        """
+        self.added += added
+        if self.added > self.orbits * QueryPlanner.RefreshRatio:
+            return QueryPlanner(db)
+        return self
+
+    def selectivity(self, filt):
+        """
+        Estimates the fraction of NEOs passing a filter.
+
+        :param filt: Filter
+        :return: float between 0 and 1
+        """
+        stats = self.stats.get(filt.field)
+        if stats is None:
+            return 1.0
+        passing = stats.selectivity(filt.operation, filt.parsed_value)
+        if filt.object == 'NearEarthObject':
+            return passing
+        bound = Filter.SummaryBounds.get(filt.operation)
+        summary = self.stats.get(f'{filt.field}_{bound}')
+        if summary is not None:
+            # A NEO passes if its closest or farthest orbit does.
+            return summary.selectivity(filt.operation, filt.parsed_value)
+        # A NEO passes if any of its orbits does.
+        return 1 - (1 - passing) ** max(self.orbits_per_neo, 1)
+
+    def cost(self, filt):
+        """ Number of comparisons a filter makes per NEO. """
+        if filt.object == 'NearEarthObject' or \
+                filt.operation in Filter.SummaryBounds:
+            return 1.0
+        return max(self.orbits_per_neo, 1)
+
+    def order(self, filters):
+        """
+        Orders filters by increasing rank.
+
+        :param filters: list of Filter
+        :return: list of Filter, in the order to apply them
+        """
+        def rank(filt):
+            rejected = 1 - self.selectivity(filt)
+            return self.cost(filt) / rejected if rejected else float('inf')
+
+        return sorted(filters, key=rank)
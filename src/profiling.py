@@ -0,0 +1,212 @@
+"""
+Opt-in instrumentation of the load, search and write pipeline stages.
+
+Disabled by default, when it costs a single check per stage. Once enabled,
+with main.py --profile or the NEO_PROFILE environment variable, a Profile
+records the time spent in each stage, the rows and candidates they handle,
+the measured selectivity of each filter and the peak memory, reported as
+JSON.
+"""
+
+import atexit
+import cProfile
+import json
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Environment variables enabling the report and the cProfile dump.
+ReportVariable = 'NEO_PROFILE'
+DumpVariable = 'NEO_PROFILE_DUMP'
+
+_profile = None
+
+
+class Profile(object):
+    """
+    Timings and counters of the pipeline stages of a run.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Stage name -> dict of its seconds, calls and counters.
+        self.stages = OrderedDict()
+        # Filter description -> [filters evaluated, passed, estimated
+        # selectivity].
+        self.filters = OrderedDict()
+
+    def _stage(self, name):
+        """ Get the record of a stage, adding it on first use. """
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = {'seconds': 0.0, 'calls': 0}
+        return record
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a run of a stage.
+
+        :param name: str representing the stage, e.g. load.parse
+        """
+        record = self._stage(name)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] += time.perf_counter() - start
+            record['calls'] += 1
+
+    def count(self, stage, counter, value=1):
+        """
+        Adds to a counter of a stage.
+
+        :param stage: str representing the stage
+        :param counter: str representing the counter, e.g. rows
+        :param value: int to add
+        :return: None
+        """
+        record = self._stage(stage)
+        record[counter] = record.get(counter, 0) + value
+
+    def counted(self, stage, counter, iterable):
+        """
+        Counts the items of an iterable as they are consumed.
+
+        :return: generator of the items of iterable
+        """
+        record = self._stage(stage)
+        record.setdefault(counter, 0)
+        for item in iterable:
+            record[counter] += 1
+            yield item
+
+    def instrument_filter(self, filt, estimate=None):
+        """
+        Wraps the predicates of a Filter so that they count how many
+        objects they evaluate and pass.
+
+        :param filt: Filter to instrument
+        :param estimate: float selectivity estimated by the planner
+        :return: None
+        """
+        name = f'{filt.field}:{filt.operation}:{filt.value}'
+        record = self.filters.setdefault(name, [0, 0, estimate])
+
+        def counting(predicate):
+            def counted(item):
+                record[0] += 1
+                passed = predicate(item)
+                record[1] += bool(passed)
+                return passed
+            return counted
+
+        filt.predicate = counting(filt.predicate)
+        orbit_predicate = filt.orbit_predicate
+        filt.orbit_predicate = lambda: counting(orbit_predicate())
+
+    def report(self):
+        """
+        :return: dict of the stages, filters, peak memory and total time
+        """
+        filters = OrderedDict()
+        for name, (evaluated, passed, estimate) in self.filters.items():
+            filters[name] = {
+                'evaluated': evaluated,
+                'passed': passed,
+                'selectivity': passed / evaluated if evaluated else None,
+                'estimated_selectivity': estimate}
+        return {'total_seconds': time.perf_counter() - self.started,
+                'stages': self.stages,
+                'filters': filters,
+                'peak_memory_kb': Profile._peak_memory_kb()}
+
+    def save(self, path):
+        """
+        Writes the report as JSON.
+
+        :param path: str representing the report file, "-" for stderr
+        :return: None
+        """
+        report = json.dumps(self.report(), indent=2)
+        if path == '-':
+            print(report, file=sys.stderr)
+            return None
+        with open(path, 'w') as report_file:
+            report_file.write(report + '\n')
+        return None
+
+    @staticmethod
+    def _peak_memory_kb():
+        """ Peak resident memory of the process, if known. """
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS, in kilobytes elsewhere.
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def enable():
+    """
+    Starts recording a new Profile.
+
+    :return: Profile
+    """
+    global _profile
+    _profile = Profile()
+    return _profile
+
+
+def start(report=None, dump=None):
+    """
+    Enables profiling until the process exits, when the report is saved
+    and the cProfile statistics are dumped.
+
+    :param report: str representing the JSON report file, "-" for stderr
+    :param dump: str representing the cProfile statistics file, or None
+    :return: None
+    """
+    profile = enable()
+    if report:
+        atexit.register(profile.save, report)
+    if dump:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def dump_stats():
+            profiler.disable()
+            profiler.dump_stats(dump)
+
+        atexit.register(dump_stats)
+    return None
+
+
+def active():
+    """
+    :return: the Profile being recorded, or None if disabled
+    """
+    return _profile
+
+
+def stage(name):
+    """
+    Times a stage if profiling is enabled.
+
+    :param name: str representing the stage
+    :return: context manager
+    """
+    if _profile is None:
+        return nullcontext()
+    return _profile.stage(name)
+
+
+def count(stage, counter, value=1):
+    """ Adds to a counter of a stage if profiling is enabled. """
+    if _profile is not None:
+        _profile.count(stage, counter, value)
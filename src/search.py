@@ -1,10 +1,16 @@
 from collections import namedtuple
 from enum import Enum
 import operator as op
+from operator import attrgetter
 from exceptions import UnsupportedFeature
 from models import NearEarthObject, OrbitPath
 from datetime import datetime
 from collections import defaultdict
+from itertools import islice
+import heapq
+from bisect import bisect_left, bisect_right
+import profiling
+from aggregate import Aggregate
 
 
 class DateSearchType(Enum):
@@ -30,10 +36,25 @@ class Query(object):
     """
 
     Selectors = namedtuple('Selectors', ['date_search', 'number',
-                                         'filters', 'return_object'])
+                                         'filters', 'return_object', 'sort'],
+                           defaults=[None])
     DateSearch = namedtuple('DateSearch', ['type', 'values'])
+    Sort = namedtuple('Sort', ['field', 'reverse'])
     ReturnObjects = {'NEO': NearEarthObject, 'Path': OrbitPath}
 
+    # Sort option -> field of the results ordered on, suffixed with
+    # Descending to order them in decreasing order. A NEO is ordered on
+    # the closest (or, decreasing, farthest) and first (or last) of its
+    # orbits matching the date search, and on its maximum diameter
+    # estimate.
+    SortFields = {
+        'miss': 'miss',
+        'distance': 'miss',
+        'diameter': 'diam_max',
+        'date': 'orbit_date'
+    }
+    Descending = '-desc'
+
     def __init__(self, **kwargs):
         """
         :param kwargs: dict of search query parameters to determine
@@ -60,6 +81,25 @@ class Query(object):
         else:
             self.filters = []
 
+        if 'sort' in keys:
+            option = kwargs['sort']
+            reverse = option.endswith(Query.Descending)
+            if reverse:
+                option = option[:-len(Query.Descending)]
+            self.sort = Query.Sort(field=Query.SortFields[option],
+                                   reverse=reverse)
+        else:
+            self.sort = None
+
+    @staticmethod
+    def sort_options():
+        """
+        :return: list of the supported sort options, increasing then
+        decreasing
+        """
+        return list(Query.SortFields) + [f'{option}{Query.Descending}'
+                                         for option in Query.SortFields]
+
     def build_query(self):
         """
         Transforms the provided query options, set upon initialization,
@@ -72,7 +112,8 @@ class Query(object):
         return Query.Selectors(date_search=self.date_search,
                                return_object=self.return_object,
                                number=self.number,
-                               filters=self.filters)
+                               filters=self.filters,
+                               sort=self.sort)
 
 
 class Filter(object):
@@ -92,12 +133,34 @@ class Filter(object):
         '>=': op.ge,
         '<=': op.le,
         '=': op.eq,
-        '>': op.ge,
-        '<': op.le
+        '>': op.gt,
+        '<': op.lt
+    }
+
+    # Operator -> the NearEarthObject summary of an orbit field, min or
+    # max, deciding on its own whether any orbit of a NEO passes.
+    SummaryBounds = {
+        '>=': 'max',
+        '>': 'max',
+        '<=': 'min',
+        '<': 'min'
+    }
+
+    # Diameter field compared by each operator, see _parse_filter.
+    DiameterBounds = {
+        '>=': 'diam_max',
+        '>': 'diam_max',
+        '=': 'diam_min',
+        '<=': 'diam_min',
+        '<': 'diam_min'
     }
 
     def __init__(self, field, object, operation, value):
         """
+        The filter is compiled on creation: its value is parsed to the
+        type of its field and its operation looked up once, so that
+        filtering each NEO is a single call of Filter.predicate.
+
         :param field:  str representing field to filter on
         :param field:  str representing object to filter on
         :param operation: str representing filter operation to perform
@@ -107,6 +170,8 @@ class Filter(object):
         self.object = object
         self.operation = operation
         self.value = value
+        self.parsed_value = self.parse_value()
+        self.predicate = self._compile()
 
     @staticmethod
     def _parse_filter(filter_str):
@@ -122,9 +187,10 @@ class Filter(object):
         Otherwise, the minimum diameter estimate.
         """
         field, oper, value = filter_str.split(':')
-        return Filter(Filter.Options[field][1],
-                      Filter.Options[field][0],
-                      oper, value)
+        object, attribute = Filter.Options[field]
+        if field == 'diameter':
+            attribute = Filter.DiameterBounds[oper]
+        return Filter(attribute, object, oper, value)
 
     @staticmethod
     def create_filter_options(filter_options):
@@ -146,27 +212,127 @@ class Filter(object):
         :param results: List of Near Earth Object results
         :return: filtered list of Near Earth Object results
         """
-        return list(filter(self._filter_p, results))
+        return list(filter(self.predicate, results))
+
+    def parse_value(self):
+        """
+        Converts the value from a string to the type of the field,
+        bool for hazard and float otherwise
 
-    def _filter_p(self, neo):
-        # Converting the value from a string to something usable,
-        # either int or bool
-        try:
-            value = float(self.value)
-        except Exception:
-            value = self.value == 'True'
+        :return: float or bool value to filter for
+        """
+        if self.field == 'hazard':
+            return self.value in ('True', 'true', '1')
+        return float(self.value)
 
-        # Getting the operation to perform
+    def _compile(self):
+        """
+        Builds the predicate of the filter.
+
+        :return: function of a NEO returning whether it passes the filter
+        """
         operation = Filter.Operators[self.operation]
+        value = self.parsed_value
+        get = attrgetter(self.field)
 
         # If the filter applies to a NEO object:
         if self.object == 'NearEarthObject':
-            return operation(getattr(neo, self.field), value)
-        # If the filter applies to a OrbitPath object:
-        else:
-            # See if any of the orbit paths can work
-            return any(operation(getattr(orbit, self.field), value)
-                       for orbit in neo.orbits)
+            return lambda neo: operation(get(neo), value)
+        # If the filter applies to a OrbitPath object, see if any of the
+        # orbit paths can work: the closest or farthest one tells for an
+        # inequality, and a value outside their range rules them all out.
+        bound = Filter.SummaryBounds.get(self.operation)
+        if bound is not None:
+            get_bound = attrgetter(f'{self.field}_{bound}')
+            return lambda neo: operation(get_bound(neo), value)
+        get_min = attrgetter(f'{self.field}_min')
+        get_max = attrgetter(f'{self.field}_max')
+        return lambda neo: get_min(neo) <= value <= get_max(neo) and \
+            any(operation(get(orbit), value) for orbit in neo.orbits)
+
+    def orbit_predicate(self):
+        """
+        Builds the predicate of a filter on an OrbitPath object, applied
+        to a single orbit rather than to any orbit of a NEO.
+
+        :return: function of an orbit returning whether it passes
+        """
+        operation = Filter.Operators[self.operation]
+        value = self.parsed_value
+        get = attrgetter(self.field)
+        return lambda orbit: operation(get(orbit), value)
+
+    @staticmethod
+    def split(filters):
+        """
+        Splits filters between those on NEO fields and those on orbit
+        fields, keeping their order.
+
+        :param filters: list of Filter
+        :return: tuple of (NEO filters, orbit filters) lists
+        """
+        return ([filt for filt in filters
+                 if filt.object == 'NearEarthObject'],
+                [filt for filt in filters
+                 if filt.object != 'NearEarthObject'])
+
+
+class BatchQuery(object):
+    """
+    Object holding the state of a query within a batch search sweep.
+    """
+
+    def __init__(self, query, start_date, end_date, filters):
+        """
+        :param query: Query.Selectors object with query information
+        :param start_date: datetime of the first date of the query
+        :param end_date: datetime of the last date of the query
+        :param filters: list of (dict of NEO to filter verdict, shared by
+        the queries with the same filter, Filter) tuples
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+        self.filters = filters
+        self.number = query.number
+        self.paths = query.return_object == OrbitPath
+        if self.paths:
+            # Path queries filter each orbit on its own fields.
+            self.orbit_predicates = [
+                filt.orbit_predicate() for _, filt in filters
+                if filt.object != 'NearEarthObject']
+            self.filters = [(verdicts, filt) for verdicts, filt in filters
+                            if filt.object == 'NearEarthObject']
+        self.results = []
+        self.seen = set()
+
+    def done(self):
+        """ Whether the query has found its number of objects. """
+        return self.number is not None and len(self.results) >= self.number
+
+    def passes(self, neo):
+        """ Check whether a NEO passes all the filters of the query. """
+        for verdicts, filt in self.filters:
+            verdict = verdicts.get(neo)
+            if verdict is None:
+                verdict = verdicts[neo] = filt.predicate(neo)
+            if not verdict:
+                return False
+        return True
+
+    def add(self, orbit):
+        """ Adds an orbit matching the query date to the results if it
+        passes the filters, or its NEO for NEO queries. """
+        if self.done():
+            return
+        neo = orbit.neo
+        if self.paths:
+            if all(p(orbit) for p in self.orbit_predicates) and \
+                    self.passes(neo):
+                self.results.append(orbit)
+        elif neo not in self.seen:
+            self.seen.add(neo)
+            if self.passes(neo):
+                self.results.append(neo)
 
 
 class NEOSearcher(object):
@@ -176,6 +342,11 @@ class NEOSearcher(object):
     query specifications, determines how to perform the search.
     """
 
+    # A range index drives a search when it has IndexCost times fewer
+    # candidates than there are date matches, as each candidate then
+    # needs its orbits dated and ordered.
+    IndexCost = 4
+
     def __init__(self, db):
         """
         :param db: NEODatabase holding the NearEarthObject instances
@@ -189,51 +360,464 @@ class NEOSearcher(object):
         QueryBuilder (query) calls the appropriate instance search function,
         then appliess any filters, with distance as the last filter.
 
-        Once any filters provided are applied, return the number of
-        requested objects in the query.return_object specified.
+        Date matching and filters run as a single lazy pass which stops
+        as soon as the number of requested objects has been found, and
+        the results are returned in the query.return_object specified.
 
         :param query: Query.Selectors object with query information
         :return: Dataset of NearEarthObjects or OrbitalPaths
         """
+        return list(self.iter_objects(query))
+
+    def iter_objects(self, query):
+        """
+        Lazy counterpart of get_objects, yielding the results as they are
+        found so that they can be streamed to the NEOWriter.
+
+        When the database has a QueryCache, the results are collected
+        and cached instead, and a query already cached is not searched.
+
+        :param query: Query.Selectors object with query information
+        :return: iterator of NearEarthObjects or OrbitalPaths
+        """
+        cache = self.db.cache
+        if cache is None:
+            return self._search(query)
+
+        key = cache.key(query)
+        version = self.db.version
+        results = cache.get(key, version)
+        if results is None:
+            results = list(self._search(query))
+            cache.put(key, version, results)
+        return iter(results)
+
+    def _search(self, query):
+        """ Search the database for a query, see iter_objects. """
+        filters = self._plan(Filter.create_filter_options(query.filters))
+
+        # Evaluate the query in bulk across the shards, if any, or if
+        # the columnar backend is loaded
+        if self.db.executor is not None:
+            return iter(self.db.executor.get_objects(query, filters))
+        if self.db.columns is not None:
+            return iter(self.db.columns.get_objects(query, filters))
+
+        # Walk the range index of the sort field, when worth it
+        if query.sort is not None:
+            results = self._index_order(query, filters)
+            if results is not None:
+                return iter(results)
+
+        # Lazily get the orbits with required dates, narrowed down to
+        # the candidates of a range index when one is selective enough
+        matches = self._index_matches(query, filters)
+        if matches is None:
+            matches = self._date_matches(query.date_search)
+        profile = profiling.active()
+        if profile is not None:
+            matches = profile.counted('search', 'candidates', matches)
+
+        if query.sort is not None:
+            return iter(NEOSearcher._top(query, filters, matches))
 
-        filters = Filter.create_filter_options(query.filters)
+        if query.return_object == OrbitPath:
+            return NEOSearcher._get_orbits(matches, filters, query.number)
 
-        # Get results of NEOs with required dates
-        results = [neo for neo in self.db.db.values()
-                   if NEOSearcher._date_match(neo.orbit_dates,
-                                              query.date_search)]
+        # Unique NEOs in the order of their first matching orbit
+        results = NEOSearcher._unique_neos(matches)
         # Apply filters
-        for filt in filters:
-            results = filt.apply(results)
+        results = (neo for neo in results
+                   if NEOSearcher._passes_filters(neo, filters))
+
+        return islice(results, query.number)
+
+    def get_objects_batch(self, queries):
+        """
+        Batch search interface running many queries in a single sweep
+        over the date index, instead of one pass per query.
+
+        Only the dates within any query are visited, in order, each
+        orbit being checked against the queries whose date range is
+        active. A filter shared by several queries is evaluated once
+        per NEO, and a query leaves the sweep once it has found its
+        number of objects.
+
+        Queries already in the QueryCache of the database, if any, are
+        not searched.
+
+        :param queries: list of Query.Selectors objects
+        :return: list with the results of each query, as get_objects
+        """
+        cache = self.db.cache
+        if cache is None:
+            return self._search_batch(queries)
+
+        keys = [cache.key(query) for query in queries]
+        version = self.db.version
+        results = [cache.get(key, version) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        found = self._search_batch([queries[i] for i in missing])
+        for i, result in zip(missing, found):
+            cache.put(keys[i], version, result)
+            results[i] = result
+        return [list(result) for result in results]
+
+    def _search_batch(self, queries):
+        """ Search the database for a batch of queries, see
+        get_objects_batch. """
+        if self.db.columns is not None:
+            return [list(self._search(query)) for query in queries]
+
+        # Sorted queries need all of their matches, they are searched on
+        # their own rather than leaving the sweep early.
+        ordered = {i for i, query in enumerate(queries)
+                   if query.sort is not None}
+        if ordered:
+            swept = iter(self._search_batch(
+                [query for i, query in enumerate(queries)
+                 if i not in ordered]))
+            return [list(self._search(query)) if i in ordered
+                    else next(swept) for i, query in enumerate(queries)]
+
+        # (field, operation, value) -> NEO -> whether the NEO passes.
+        verdicts = {}
+        sweep = []
+        for query in queries:
+            start_date, end_date = NEOSearcher._date_range(query.date_search)
+            filters = [(verdicts.setdefault(
+                (filt.field, filt.operation, filt.parsed_value), {}), filt)
+                       for filt in self._plan(
+                           Filter.create_filter_options(query.filters))]
+            sweep.append(BatchQuery(query, start_date, end_date, filters))
+
+        pending = sorted((q for q in sweep if not q.done()),
+                         key=lambda q: q.start_date)
+        active = []
+        activated = 0
+        for date in self._batch_dates(pending):
+            # Activate the queries starting on or before the date
+            while activated < len(pending) and \
+                    pending[activated].start_date <= date:
+                active.append(pending[activated])
+                activated += 1
+            active = [q for q in active if q.end_date >= date and not q.done()]
+            if not active:
+                continue
+            for orbit in self.db.get_orbits_on(date):
+                for q in active:
+                    q.add(orbit)
+
+        return [q.results for q in sweep]
+
+    def aggregate(self, query, group_by):
+        """
+        Aggregate search interface summarizing the orbits matching a
+        query in groups, see Aggregate, rather than returning them.
+
+        The orbits are matched on the date search and filters as the
+        results of the query: for a Path query each orbit passing the
+        filters, otherwise every orbit matching the date search of each
+        NEO passing them. The number and sort of the query are ignored.
+
+        :param query: Query.Selectors object with query information
+        :param group_by: list of Aggregate.Groups options, none for a
+        single group
+        :return: list of dicts, a row per group with its group values and
+        Aggregate.Metrics, in group order
+        """
+        filters = self._plan(Filter.create_filter_options(query.filters))
+        if self.db.columns is not None:
+            return self.db.columns.aggregate(query, filters, group_by)
+
+        matches = self._index_matches(query, filters)
+        if matches is None:
+            matches = self._date_matches(query.date_search)
+        profile = profiling.active()
+        if profile is not None:
+            matches = profile.counted('search', 'candidates', matches)
 
         if query.return_object == OrbitPath:
-            return NEOSearcher._get_orbits(results, query.date_search)
+            orbits = NEOSearcher._get_orbits(matches, filters, None)
+        else:
+            orbits = NEOSearcher._neo_orbits(matches, filters)
+        aggregate = Aggregate(group_by)
+        for orbit in orbits:
+            aggregate.add(orbit)
+        return aggregate.rows()
+
+    def _batch_dates(self, queries):
+        """ Yield the indexed dates within any of the queries, sorted by
+        start date, in order and merging overlapping query date ranges. """
+        last = None
+        for q in queries:
+            start = bisect_left(self.db.dates, q.start_date)
+            if last is not None:
+                start = max(start, last)
+            end = bisect_right(self.db.dates, q.end_date)
+            for i in range(start, end):
+                yield self.db.dates[i]
+            last = max(end, last or 0)
+
+    def _plan(self, filters):
+        """ Order filters with the query planner of the database, if any.
+        :param: filters:  list of Filter
+        :returns: list of Filter, in the order to apply them
+        """
+        planner = self.db.planner
+        if planner is not None:
+            filters = planner.order(filters)
+        profile = profiling.active()
+        if profile is not None:
+            for filt in filters:
+                profile.instrument_filter(
+                    filt, planner.selectivity(filt) if planner else None)
+        return filters
+
+    def _index_matches(self, query, filters):
+        """ Get the orbits with required dates that can pass the most
+        selective filter, using its range index, if it is worth it
+        :param: query:  Query.Selectors object with query information
+        :param: filters:  list of Filter
+        :returns: iterable of OrbitPath in date order, or None to scan
+        the date matches instead
+        """
+        if self.db.indexes is None:
+            return None
 
-        return results[:query.number]
+        best = None
+        for filt in filters:
+            index = self.db.indexes.get(filt.field)
+            if index is None:
+                continue
+            count = index.count(filt.operation, filt.parsed_value)
+            if best is None or count < best[0]:
+                best = (count, index, filt)
+        if best is None:
+            return None
+
+        count, index, filt = best
+        start_date, end_date = NEOSearcher._date_range(query.date_search)
+        if count * NEOSearcher.IndexCost >= \
+                self.db.count_orbits_between(start_date, end_date):
+            return None
+
+        candidates = index.find(filt.operation, filt.parsed_value)
+        if filt.object == 'NearEarthObject':
+            neos = candidates
+        elif query.return_object != OrbitPath:
+            # A NEO passes if any of its orbits, on any date, does.
+            neos = dict.fromkeys(orbit.neo for orbit in candidates)
+        else:
+            neos = None
+
+        if neos is None:
+            orbits = (orbit for orbit in candidates
+                      if start_date <= orbit.orbit_date <= end_date)
+        else:
+            orbits = (orbit for neo in neos
+                      for orbit in neo.orbits_between(start_date, end_date))
+        return self._in_date_order(orbits)
+
+    def _index_order(self, query, filters):
+        """ Get the results of a sorted query by walking the range index
+        of its sort field in order, when there is one and the results are
+        expected within the first IndexCost-th of the date matches walked.
+
+        NEOs are ordered on the distance of their closest matching orbit,
+        so walking the orbits by distance meets each NEO on its closest
+        one first.
+        :param: query:  Query.Selectors object with a sort
+        :param: filters:  list of Filter
+        :returns: list of results, or None to select them from the date
+        matches instead
+        """
+        field, reverse = query.sort
+        path = query.return_object == OrbitPath
+        if self.db.indexes is None or query.number is None or \
+                field not in ('miss', 'diam_max') or \
+                (path and field != 'miss'):
+            return None
+
+        index = self.db.indexes[field]
+        start_date, end_date = NEOSearcher._date_range(query.date_search)
+        matches = self.db.count_orbits_between(start_date, end_date)
+        if not matches:
+            return []
+        # Items walked to find number results spread over the index, its
+        # orbits or NEOs
+        walked = query.number * len(index.keys) / matches
+        if walked * NEOSearcher.IndexCost >= matches:
+            return None
+
+        # Results equal on the sort field are put in the order of the
+        # date index, as a full sort of the date matches would keep them
+        groups = index.groups(reverse)
+        if field == 'miss':
+            groups = ([orbit for orbit in group
+                       if start_date <= orbit.orbit_date <= end_date]
+                      for group in groups)
+            if path:
+                orbits = (orbit for group in groups
+                          for orbit in self._in_date_order(group))
+                return list(NEOSearcher._get_orbits(orbits, filters,
+                                                    query.number))
+            seen = set()
+            groups = ([neo for neo in NEOSearcher._unique_neos(group)
+                       if neo not in seen and not seen.add(neo)]
+                      for group in groups)
+        else:
+            groups = ([neo for neo in group
+                       if neo.approaches_between(start_date, end_date)]
+                      for group in groups)
+        results = (neo for group in groups
+                   for neo in self._in_first_seen_order(group, start_date,
+                                                        end_date))
+        return list(islice((neo for neo in results
+                            if NEOSearcher._passes_filters(neo, filters)),
+                           query.number))
 
     @staticmethod
-    def _date_match(orbit_dates, date_search):
-        """ Check if any date in a list of dates passes the date search
-        :param: orbit_dates:  list of dates as string
+    def _top(query, filters, matches):
+        """ Select the number first results of the date matches in the
+        sort order of the query, with a heap of number results rather
+        than sorting them all. Results equal on the sort field keep the
+        order of the date index.
+        :param: query:  Query.Selectors object with a sort
+        :param: filters:  list of Filter
+        :param: matches:  iterable of the OrbitPath matching the date search
+        :returns: list of results
+        """
+        field, reverse = query.sort
+        get = attrgetter(field)
+        if query.return_object == OrbitPath:
+            results = NEOSearcher._get_orbits(matches, filters, None)
+            key = get if field != 'diam_max' else \
+                (lambda orbit: orbit.neo.diam_max)
+        elif field == 'diam_max':
+            results = (neo for neo in NEOSearcher._unique_neos(matches)
+                       if NEOSearcher._passes_filters(neo, filters))
+            key = get
+        else:
+            # Closest or first (farthest or last) matching orbit of each
+            # NEO, in the order of their first matching orbit
+            best = {}
+            pick = max if reverse else min
+            for orbit in matches:
+                value = get(orbit)
+                current = best.get(orbit.neo)
+                best[orbit.neo] = value if current is None \
+                    else pick(current, value)
+            results = (neo for neo in best
+                       if NEOSearcher._passes_filters(neo, filters))
+            key = best.__getitem__
+
+        if query.number is None:
+            return sorted(results, key=key, reverse=reverse)
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(query.number, results, key=key)
+
+    def _in_first_seen_order(self, neos, start_date, end_date):
+        """ Order NEOs on their first orbit between two dates, in the
+        order of the date index. """
+        if len(neos) < 2:
+            return neos
+        first = {min(neo.orbits_between(start_date, end_date),
+                     key=attrgetter('orbit_date')): neo for neo in neos}
+        return [first[orbit] for orbit in self._in_date_order(first)]
+
+    def _in_date_order(self, orbits):
+        """ Yield orbits in the order of the date index. """
+        by_date = {}
+        for orbit in orbits:
+            by_date.setdefault(orbit.orbit_date, []).append(orbit)
+        for date in sorted(by_date):
+            group = by_date[date]
+            if len(group) > 1:
+                group = set(group)
+                group = [orbit for orbit in self.db.date_index[date]
+                         if orbit in group]
+            yield from group
+
+    def _date_matches(self, date_search):
+        """ Get the orbits passing the date search from the date index
         :param: date_search:  DateSearch namedtuple
-        :returns: Bool
+        :returns: iterable of OrbitPath
+        """
+        start_date, end_date = NEOSearcher._date_range(date_search)
+        if date_search.type == DateSearchType.between:
+            return self.db.get_orbits_between(start_date, end_date)
+        else:
+            return self.db.get_orbits_on(start_date)
+
+    @staticmethod
+    def _date_range(date_search):
+        """ Get the first and last dates, both included, of a date search
+        :param: date_search:  DateSearch namedtuple
+        :returns: tuple of (start_date, end_date) datetimes
         """
-        str_format = '%Y-%m-%d'
         # For between returns list of datetimes [start_date, end_date]
         # For equal simply [date]
-        dates = list(map(lambda d: datetime.strptime(d, str_format),
-                         date_search.values))
+        dates = [NEOSearcher._parse_date(d) for d in date_search.values]
         if date_search.type == DateSearchType.between:
-            # Check whether any date of the object is bwtween
-            # the desired dates.
-            return any(date >= dates[0] and date <= dates[1] for
-                       date in orbit_dates)
-        else:
-            # Check whether any date of the object is the desired date
-            return any(date == dates[0] for date in orbit_dates)
+            return dates[0], dates[1]
+        return dates[0], dates[0]
+
+    @staticmethod
+    def _parse_date(date_str):
+        """ Parse a query date string as the datetime used by the index. """
+        return datetime.strptime(date_str, '%Y-%m-%d')
+
+    @staticmethod
+    def _unique_neos(matches):
+        """ Yield each NEO of the date matches once, in order. """
+        seen = set()
+        for orbit in matches:
+            neo = orbit.neo
+            if neo not in seen:
+                seen.add(neo)
+                yield neo
+
+    @staticmethod
+    def _passes_filters(neo, filters):
+        """ Check whether a NEO passes all the filters. """
+        return all(filt.predicate(neo) for filt in filters)
+
+    @staticmethod
+    def _neo_orbits(matches, filters):
+        """ Yield the orbits with the required date of the NEOs passing
+        the filters, each NEO being filtered once. """
+        passed = {}
+        for orbit in matches:
+            neo = orbit.neo
+            verdict = passed.get(neo)
+            if verdict is None:
+                verdict = passed[neo] = NEOSearcher._passes_filters(
+                    neo, filters)
+            if verdict:
+                yield orbit
 
     @staticmethod
-    def _get_orbits(results, date_search):
-        """ For all NEOs, get the orbit with the required date. """
-        return [orbit for neo in results for orbit in neo.orbits
-                if NEOSearcher._date_match([orbit.orbit_date], date_search)]
+    def _get_orbits(matches, filters, number):
+        """ Get the orbits with the required date passing the filters, up
+        to number orbits, in a single pass.
+
+        Filters on orbit fields are applied to each orbit itself, and
+        filters on NEO fields to its NEO, only once per NEO however many
+        of its orbits match. """
+        neo_filters, orbit_filters = Filter.split(filters)
+        orbit_predicates = [filt.orbit_predicate() for filt in orbit_filters]
+        passed = {}
+
+        def orbits():
+            for orbit in matches:
+                if not all(p(orbit) for p in orbit_predicates):
+                    continue
+                neo = orbit.neo
+                if neo not in passed:
+                    passed[neo] = NEOSearcher._passes_filters(
+                        neo, neo_filters)
+                if passed[neo]:
+                    yield orbit
+
+        return islice(orbits(), number)
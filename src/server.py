@@ -0,0 +1,209 @@
+"""
+Long running query server keeping a loaded NEODatabase resident.
+
+Queries are answered over HTTP with the same options as main.py, e.g.
+GET /query?start_date=2020-01-01&end_date=2020-01-10&number=10&filter=diameter:>=:0.042
+and the results are returned as newline-delimited JSON. GET /stats
+reports the hit and miss counters of the query cache, if any.
+
+Given a tail interval, the rows appended to the data file meanwhile are
+added to the resident database every interval, without reloading it.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from exceptions import UnsupportedFeature
+from search import Filter, Query, NEOSearcher
+from writer import OutputFormat, NEOWriter
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(Exception):
+    """
+    Exception for a query request that cannot be answered
+    """
+
+
+class NEOServer(object):
+    """
+    Object serving NEOSearcher queries on a resident NEODatabase over
+    HTTP, built on asyncio and the standard library only.
+
+    Requests are handled concurrently: searches run in the default
+    executor so slow queries never block accepting and reading others.
+    """
+
+    def __init__(self, db, host='127.0.0.1', port=8000, tail=None):
+        """
+        :param db: loaded NEODatabase to answer the queries on
+        :param host: str representing the interface to listen on
+        :param port: int representing the port to listen on, or 0 for
+        any free port, set to the port bound once listening
+        :param tail: float seconds between reads of the rows appended
+        to the data file, or None to serve the data as loaded
+        """
+        self.db = db
+        self.host = host
+        self.port = port
+        self.tail = tail
+        self.loop = None
+        self.server = None
+        # Set once the server is listening, see shutdown.
+        self.ready = threading.Event()
+
+    def serve_forever(self):
+        """ Runs the server until interrupted. """
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+
+    def shutdown(self):
+        """ Stops a server running in another thread, once listening. """
+        self.ready.wait()
+        self.loop.call_soon_threadsafe(self.server.close)
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, self.host,
+                                            self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.loop = asyncio.get_running_loop()
+        self.server = server
+        self.ready.set()
+        logger.info('Serving NEO queries on http://%s:%s/query',
+                    self.host, self.port)
+        if self.tail:
+            asyncio.create_task(self._tail_forever())
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                # Unless closed by shutdown
+                if server.is_serving():
+                    raise
+
+    async def _tail_forever(self):
+        """ Adds the rows appended to the data file every tail seconds. """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.tail)
+            try:
+                added = await loop.run_in_executor(None, self.db.tail)
+            except Exception:
+                logger.exception('Failed to tail %s', self.db.filename)
+                continue
+            if added:
+                logger.info('Added %s orbits from %s', added, self.db.filename)
+
+    async def _handle(self, reader, writer):
+        """ Answers a single HTTP request. """
+        start = time.perf_counter()
+        target = ''
+        status, body = 500, ''
+        try:
+            request_line = await reader.readline()
+            # Skip the headers, queries have no body.
+            while (await reader.readline()).strip():
+                pass
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            if method != 'GET':
+                raise BadRequest(f'Unsupported method {method}')
+            url = urlsplit(target)
+            if url.path == '/stats':
+                status, body = 200, self._stats()
+            elif url.path != '/query':
+                status, body = 404, NEOServer._error(f'No such path {url.path}')
+            else:
+                query = NEOServer._parse_query(url.query)
+                body = await asyncio.get_running_loop().run_in_executor(
+                    None, self._search, query)
+                status = 200
+        except (BadRequest, UnsupportedFeature, ValueError) as e:
+            status, body = 400, NEOServer._error(str(e))
+        except Exception:
+            logger.exception('Failed to answer %s', target)
+            status, body = 500, NEOServer._error('Internal error')
+        finally:
+            await NEOServer._respond(writer, status, body)
+            logger.info('%s %s %.2fms', status, target,
+                        (time.perf_counter() - start) * 1000)
+
+    def _search(self, query):
+        """ Runs a query and formats its results as NDJSON. """
+        out = io.StringIO()
+        NEOWriter().write(format=OutputFormat.ndjson.value,
+                          data=NEOSearcher(self.db).iter_objects(query),
+                          out=out)
+        return out.getvalue()
+
+    def _stats(self):
+        """ Reports the hit and miss counters of the query cache. """
+        cache = self.db.cache
+        return json.dumps({'cache': cache.stats() if cache else None}) + '\n'
+
+    @staticmethod
+    def _parse_query(query_string):
+        """
+        Parses the query string parameters into Query.Selectors.
+
+        :param query_string: str with the same options as main.py
+        :return: Query.Selectors
+        """
+        params = parse_qs(query_string)
+        options = {key: values[-1] for key, values in params.items()
+                   if key in ('date', 'start_date', 'end_date')}
+        if not options.get('date') and not (
+                options.get('start_date') and options.get('end_date')):
+            raise BadRequest('A date or a start_date and end_date are required')
+        for date in options.values():
+            time.strptime(date, '%Y-%m-%d')
+
+        return_object = params.get('return_object', ['NEO'])[-1]
+        if return_object not in Query.ReturnObjects:
+            raise BadRequest(f'Not a valid return_object: {return_object}')
+        if 'number' not in params:
+            raise BadRequest('A number is required')
+
+        sort = params.get('sort', [None])[-1]
+        if sort is not None and sort not in Query.sort_options():
+            raise BadRequest(f'Not a valid sort: {sort}')
+
+        filters = params.get('filter')
+        try:
+            Filter.create_filter_options(filters or [])
+        except (KeyError, ValueError):
+            raise BadRequest(f'Not valid filters: {filters}')
+
+        return Query(number=int(params['number'][-1]),
+                     return_object=return_object,
+                     filter=filters,
+                     sort=sort,
+                     **options).build_query()
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}) + '\n'
+
+    @staticmethod
+    async def _respond(writer, status, body):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                   500: 'Internal Server Error'}
+        body = body.encode()
+        content_type = 'application/x-ndjson' if status == 200 \
+            else 'application/json'
+        head = (f'HTTP/1.1 {status} {reasons[status]}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n')
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+        finally:
+            writer.close()
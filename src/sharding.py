@@ -0,0 +1,324 @@
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, wait
+from exceptions import UnsupportedFeature
+from models import OrbitPath
+from search import Filter
+
+try:
+    import numpy as np
+    from multiprocessing import shared_memory
+except ImportError:
+    np = None
+
+# Columns of the ColumnarStore mapped from shared memory in a worker,
+# the blocks they are mapped from and their specs, set by _attach.
+_columns = {}
+_blocks = []
+_specs = {}
+
+
+class ShardedExecutor(object):
+    """
+    Runs the searches of a ColumnarStore across a pool of worker
+    processes, each evaluating a shard of the rows a query selects.
+
+    The columns are copied once into shared memory blocks that the
+    workers map, so a query only sends them its filters and row ranges,
+    and only gets the matching row or NEO numbers back. The results are
+    materialized from the store in the parent.
+
+    The date ordered rows of a query are sharded in contiguous ranges,
+    so the results of the shards merged in order are those of a single
+    pass over the rows.
+
+    An updated store is shared in new blocks that replace the previous
+    ones for the following queries, while the queries in flight keep
+    using the previous blocks, freed once the last of them completes.
+    The pool of workers is kept, each worker mapping the new blocks on
+    its next task.
+    """
+
+    Columns = ('neo', 'orbit_date', 'miss', 'diam_min', 'diam_max', 'hazard')
+
+    # Queries selecting fewer rows per shard than this are evaluated in
+    # the parent, as handing them to the workers would cost more.
+    MinShardRows = 65536
+
+    def __init__(self, store, shards):
+        """
+        :param store: ColumnarStore to share with the workers
+        :param shards: int number of worker processes
+        """
+        if np is None:
+            raise UnsupportedFeature('Sharded queries require numpy')
+
+        self.shards = shards
+        # Guards the shared columns in use and the count of their users.
+        self.lock = threading.Lock()
+        self.shared = _SharedColumns(store)
+        # Shared columns not freed yet, freed on shutdown otherwise.
+        self.live = {self.shared}
+        self.pool = ProcessPoolExecutor(shards)
+        self._release = weakref.finalize(self, ShardedExecutor._shutdown,
+                                         self.pool, self.live)
+
+    @property
+    def store(self):
+        """ ColumnarStore the following queries are evaluated on. """
+        return self.shared.store
+
+    def update(self, store):
+        """
+        Shares an updated store with the workers, for the following
+        queries.
+
+        :param store: ColumnarStore to share with the workers
+        :return: None
+        """
+        shared = _SharedColumns(store)
+        with self.lock:
+            previous, self.shared = self.shared, shared
+            self.live.add(shared)
+            previous.retired = True
+            unused = not previous.users
+        if unused:
+            self._free(previous)
+        return None
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory blocks.
+
+        :return: None
+        """
+        self._release()
+
+    @staticmethod
+    def _shutdown(pool, live):
+        """ Stop the pool of workers, then free the blocks they map. """
+        pool.shutdown()
+        for shared in list(live):
+            shared.free()
+        live.clear()
+
+    def _free(self, shared):
+        """ Free shared columns no longer in use. """
+        with self.lock:
+            if shared not in self.live:
+                return
+            self.live.discard(shared)
+        shared.free()
+
+    def get_objects(self, query, filters):
+        """
+        Sharded counterpart of ColumnarStore.get_objects, returning the
+        same objects in the same order.
+
+        :param query: Query.Selectors object with query information
+        :param filters: list of Filter to apply
+        :return: Dataset of NearEarthObjects or OrbitalPaths
+        """
+        with self.lock:
+            shared = self.shared
+            shared.users += 1
+        futures = []
+        try:
+            return self._get_objects(shared, query, filters, futures)
+        finally:
+            # Blocks are only freed once the tasks mapping them are done
+            wait([future for future in futures if not future.cancel()])
+            with self.lock:
+                shared.users -= 1
+                unused = shared.retired and not shared.users
+            if unused:
+                self._free(shared)
+
+    def _get_objects(self, shared, query, filters, futures):
+        """ Evaluate a query on shared columns, adding the tasks
+        submitted to futures. """
+        store = shared.store
+        start, end = store._date_rows(query.date_search)
+        # Sorted queries need all of their matches, ordered in process.
+        if end - start < self.MinShardRows * 2 or query.sort is not None:
+            return store.get_objects(query, filters)
+
+        path = query.return_object == OrbitPath
+        row_filters = []
+        any_filters = []
+        for filt in filters:
+            spec = (filt.field, filt.operation, filt.parsed_value)
+            if filt.object == 'NearEarthObject' or path:
+                row_filters.append(spec)
+            else:
+                any_filters.append(spec)
+
+        neo_mask = None
+        if any_filters:
+            # Any orbit of the NEO passing each filter will do, among
+            # all of its orbits rather than only those of the query.
+            any_futures = [self.pool.submit(_shard_any_orbit, shared.specs,
+                                            shard_start, shard_end,
+                                            any_filters, len(store.neos))
+                           for shard_start, shard_end in self._split(
+                               0, len(store.neo))]
+            futures.extend(any_futures)
+            passing = np.logical_or.reduce(
+                [future.result() for future in any_futures])
+            neo_mask = passing.all(axis=0)
+
+        row_futures = [self.pool.submit(_shard_rows, shared.specs,
+                                        shard_start, shard_end,
+                                        row_filters, neo_mask, path,
+                                        query.number)
+                       for shard_start, shard_end in self._split(start, end)]
+        futures.extend(row_futures)
+
+        if path:
+            rows = []
+            found = 0
+            for future in row_futures:
+                if query.number is not None and found >= query.number:
+                    future.cancel()
+                    continue
+                shard_rows = future.result()
+                rows.append(shard_rows)
+                found += len(shard_rows)
+            rows = np.concatenate(rows)[:query.number]
+            return [store.orbits[row] for row in rows]
+
+        # Unique NEOs in the order of their first matching orbit, over
+        # the first NEOs of each shard in order: a NEO among the first
+        # number overall is among the first number of the shard it is
+        # first seen in.
+        neo_rows = []
+        found = set()
+        for future in row_futures:
+            if query.number is not None and len(found) >= query.number:
+                future.cancel()
+                continue
+            shard_neos = future.result()
+            neo_rows.append(shard_neos)
+            found.update(shard_neos.tolist())
+        neo_rows = np.concatenate(neo_rows)
+        _, first = np.unique(neo_rows, return_index=True)
+        neo_rows = neo_rows[np.sort(first)]
+        return [store.neos[neo] for neo in neo_rows[:query.number]]
+
+    def _split(self, start, end):
+        """ Split rows start to end in a contiguous range per shard.
+        :returns: list of (start, end) rows
+        """
+        bounds = np.linspace(start, end, self.shards + 1).astype(np.int64)
+        return [(int(shard_start), int(shard_end))
+                for shard_start, shard_end in zip(bounds, bounds[1:])
+                if shard_end > shard_start]
+
+
+class _SharedColumns(object):
+    """
+    Copy of the columns of a ColumnarStore in shared memory blocks, with
+    the number of queries using it.
+    """
+
+    def __init__(self, store):
+        """
+        :param store: ColumnarStore to copy the columns of
+        """
+        self.store = store
+        self.users = 0
+        self.retired = False
+        self.blocks = []
+        self.specs = {}
+        for name in ShardedExecutor.Columns:
+            column = getattr(store, name)
+            block = shared_memory.SharedMemory(create=True,
+                                               size=max(column.nbytes, 1))
+            np.ndarray(column.shape, column.dtype, block.buf)[:] = column
+            self.blocks.append(block)
+            self.specs[name] = (block.name, column.shape, column.dtype.str)
+
+    def free(self):
+        """ Unlink the blocks, the workers mapping them until they map
+        others. """
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def _attach(specs):
+    """
+    Maps the columns of a worker from their shared memory blocks, unless
+    already mapped, unmapping the blocks of previous columns.
+
+    :param specs: dict of column name to (block name, shape, dtype)
+    :return: None
+    """
+    if specs == _specs:
+        return None
+    blocks = []
+    columns = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        columns[name] = np.ndarray(shape, dtype, block.buf)
+    _columns.clear()
+    for block in _blocks:
+        block.close()
+    _blocks[:] = blocks
+    _columns.update(columns)
+    _specs.clear()
+    _specs.update(specs)
+    return None
+
+
+def _shard_mask(start, end, filters):
+    """ Mask of the rows start to end passing all filters. """
+    mask = np.ones(end - start, dtype=bool)
+    for field, operation, value in filters:
+        mask &= Filter.Operators[operation](_columns[field][start:end], value)
+    return mask
+
+
+def _shard_any_orbit(specs, start, end, filters, neo_count):
+    """
+    Finds the NEOs with an orbit passing each filter among rows start to end.
+
+    :param specs: dict of the shared columns, see _attach
+    :return: bool array of shape (filters, NEOs)
+    """
+    _attach(specs)
+    neo = _columns['neo'][start:end]
+    passing = np.zeros((len(filters), neo_count), dtype=bool)
+    for i, filt in enumerate(filters):
+        passing[i, neo[_shard_mask(start, end, [filt])]] = True
+    return passing
+
+
+def _shard_rows(specs, start, end, filters, neo_mask, path, number):
+    """
+    Evaluates a query on rows start to end.
+
+    :param specs: dict of the shared columns, see _attach
+    :param filters: list of (field, operation, value) filters on each row
+    :param neo_mask: bool array of the NEOs passing the filters on any
+    of their orbits, or None
+    :param path: bool, whether the query returns OrbitPaths
+    :param number: int max number of results, or None
+    :return: array of the first number matching rows for an OrbitPath
+    query, otherwise of the first number matching NEOs in order of their
+    first row
+    """
+    _attach(specs)
+    mask = _shard_mask(start, end, filters)
+    neo = _columns['neo'][start:end]
+    if neo_mask is not None:
+        mask &= neo_mask[neo]
+
+    if path:
+        return np.flatnonzero(mask)[:number] + start
+
+    neo_rows = neo[mask]
+    _, first = np.unique(neo_rows, return_index=True)
+    return neo_rows[np.sort(first)[:number]]
@@ -0,0 +1,72 @@
+"""
+Small csv data files written by the tests, in the layout of
+data/neo_data.csv that NEODatabase.load_data expects.
+"""
+
+import csv
+import zlib
+
+from benchmarks.generate import Header
+
+
+def approach(name, date, miss, diam_min=0.1, diam_max=0.2, hazard=False,
+             neo_id=None):
+    """
+    Builds the csv row of a close approach.
+
+    :param name: str name of the NEO
+    :param date: str close approach date, as YYYY-MM-DD
+    :param miss: float miss distance in kilometers
+    :param diam_min: float min estimated diameter in kilometers
+    :param diam_max: float max estimated diameter in kilometers
+    :param hazard: bool, whether the NEO is potentially hazardous
+    :param neo_id: str id of the NEO, derived from its name by default
+    :return: list of the Header fields
+    """
+    row = dict.fromkeys(Header, '0')
+    row.update({
+        'id': neo_id or str(zlib.crc32(name.encode())),
+        'name': name,
+        'estimated_diameter_min_kilometers': str(diam_min),
+        'estimated_diameter_max_kilometers': str(diam_max),
+        'is_potentially_hazardous_asteroid': str(hazard),
+        'close_approach_date': date,
+        'close_approach_date_full': f'{date} 00:00',
+        'kilometers': str(miss),
+        'orbiting_body': 'Earth'
+    })
+    return [row[field] for field in Header]
+
+
+def write_rows(filename, rows):
+    """
+    Writes a csv data file of close approaches.
+
+    :param filename: str representing the csv file to write
+    :param rows: iterable of rows built by approach
+    :return: None
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(Header)
+        writer.writerows(rows)
+
+
+def split_file(filename, head, tail, rows):
+    """
+    Splits a csv data file in two, each with its header: the first rows
+    in head and the others in tail.
+
+    :param filename: str representing the csv file to split
+    :param head: str representing the csv file of the first rows
+    :param tail: str representing the csv file of the other rows
+    :param rows: int number of rows in head
+    :return: None
+    """
+    with open(filename, newline='') as csvfile:
+        lines = csvfile.readlines()
+    with open(head, 'w', newline='') as first:
+        first.writelines(lines[:rows + 1])
+    with open(tail, 'w', newline='') as other:
+        other.writelines(lines[:1] + lines[rows + 1:])
+
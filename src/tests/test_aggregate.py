@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from aggregate import Aggregate
+from benchmarks.generate import generate
+from columnar import np
+from database import NEODatabase
+from models import OrbitPath
+from search import Filter, Query, NEOSearcher
+
+
+def expected_rows(db, query, group_by):
+    """
+    Aggregates the orbits matching a query with a plain reduction over
+    every NEO and its orbits, as NEOSearcher.aggregate should.
+
+    :param db: loaded NEODatabase
+    :param query: Query.Selectors object
+    :param group_by: list of Aggregate.Groups options
+    :return: list of dicts, as NEOSearcher.aggregate
+    """
+    start, end = [datetime.strptime(date, '%Y-%m-%d')
+                  for date in query.date_search.values]
+    filters = Filter.create_filter_options(query.filters)
+    groups = {}
+    for neo in db.db.values():
+        if query.return_object != OrbitPath and \
+                not all(filt.predicate(neo) for filt in filters):
+            continue
+        for orbit in neo.orbits:
+            if not start <= orbit.orbit_date <= end:
+                continue
+            if query.return_object == OrbitPath and not all(
+                    filt.predicate(neo) if filt.object == 'NearEarthObject'
+                    else filt.orbit_predicate()(orbit) for filt in filters):
+                continue
+            group = tuple(Aggregate.Groups[field](orbit)
+                          for field in group_by)
+            groups.setdefault(group, []).append(orbit)
+
+    rows = []
+    for group, orbits in sorted(groups.items()):
+        misses = [orbit.miss for orbit in orbits]
+        diameters = [neo.diam_max for neo in {orbit.neo for orbit in orbits}]
+        rows.append(Aggregate.row(group_by, group, [
+            len(orbits), len(diameters),
+            min(misses), sum(misses) / len(misses), max(misses),
+            min(diameters), sum(diameters) / len(diameters), max(diameters)]))
+    return rows
+
+
+class TestAggregate(unittest.TestCase):
+    """
+    Aggregates of the orbits matching a query report, per group, the
+    counts and the min, mean and max distances and diameters a plain
+    reduction over the NEOs of the database finds, on every backend.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_file = os.path.join(cls.directory.name, 'neo_data.csv')
+        generate(cls.data_file, neos=300, orbits=6, days=120)
+        cls.reference = NEODatabase(filename=cls.data_file)
+        cls.reference.load_data()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def queries(self):
+        for return_object in Query.ReturnObjects:
+            for filters in (None, ['is_hazardous:=:True'],
+                            ['diameter:>=:0.1', 'distance:<:40000000']):
+                for group_by in ([], ['day'], ['month'], ['year'],
+                                 ['hazard'], ['neo'], ['month', 'hazard'],
+                                 ['diameter'], ['distance']):
+                    query = Query(start_date=self.reference.dates[10]
+                                  .strftime('%Y-%m-%d'),
+                                  end_date=self.reference.dates[80]
+                                  .strftime('%Y-%m-%d'),
+                                  number=1, return_object=return_object,
+                                  filter=filters).build_query()
+                    yield query, group_by
+
+    def assertAggregates(self, db):
+        db.load_data()
+        for query, group_by in self.queries():
+            with self.subTest(query=query, group_by=group_by):
+                rows = NEOSearcher(db).aggregate(query, group_by)
+                expected = expected_rows(self.reference, query, group_by)
+                self.assertTrue(expected)
+                self.assertEqual([[row[field] for field in group_by]
+                                  for row in rows],
+                                 [[row[field] for field in group_by]
+                                  for row in expected])
+                for row, reference in zip(rows, expected):
+                    for metric in Aggregate.Metrics:
+                        self.assertAlmostEqual(row[metric],
+                                               reference[metric], 6, metric)
+
+    def test_serial_aggregates(self):
+        self.assertAggregates(NEODatabase(filename=self.data_file))
+
+    def test_range_index_aggregates(self):
+        self.assertAggregates(NEODatabase(filename=self.data_file,
+                                          range_indexes=True))
+
+    @unittest.skipIf(np is None, 'The columnar backend requires numpy')
+    def test_columnar_aggregates(self):
+        self.assertAggregates(NEODatabase(filename=self.data_file,
+                                          columnar=True))
+
+    def test_no_matches(self):
+        query = Query(date='1900-01-01', number=1,
+                      return_object='NEO').build_query()
+        self.assertEqual(NEOSearcher(self.reference).aggregate(
+            query, ['month']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from benchmarks.generate import generate
+from database import NEODatabase
+from search import Query, NEOSearcher
+from sharding import np
+from writer import NEOWriter
+
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent
+
+
+def result_keys(results):
+    """ Comparable form of NEO or OrbitPath results, in order. """
+    return [(result.name, getattr(result, 'orbit_date', None),
+             getattr(result, 'miss', None)) for result in results]
+
+
+class TestBatch(unittest.TestCase):
+    """
+    A batch of queries, NEO and Path ones searched in a single sweep over
+    the dates, gives each query the results get_objects gives it alone.
+    """
+
+    # Overlapping dates, shared filters, a number reached early or never,
+    # sorted queries and queries without results.
+    Queries = [
+        dict(date='2020-01-15', number=10 ** 6, return_object='NEO'),
+        dict(date='2020-01-15', number=10 ** 6, return_object='Path'),
+        dict(start_date='2020-01-10', end_date='2020-02-10', number=25,
+             return_object='NEO', filter=['distance:<:20000000']),
+        dict(start_date='2020-01-10', end_date='2020-02-10', number=25,
+             return_object='Path', filter=['distance:<:20000000']),
+        dict(start_date='2020-01-01', end_date='2020-03-01', number=10 ** 6,
+             return_object='Path',
+             filter=['distance:<:20000000', 'is_hazardous:=:False']),
+        dict(start_date='2020-01-20', end_date='2020-01-25', number=10 ** 6,
+             return_object='NEO',
+             filter=['is_hazardous:=:False', 'diameter:>=:0.1']),
+        dict(start_date='2020-01-01', end_date='2020-02-28', number=5,
+             return_object='Path', filter=['distance:>=:40000000']),
+        dict(start_date='2020-02-01', end_date='2020-02-15', number=8,
+             return_object='NEO', sort='distance-desc'),
+        dict(start_date='2020-01-05', end_date='2020-01-30', number=8,
+             return_object='Path', sort='miss'),
+        dict(date='2021-01-01', number=10, return_object='Path'),
+        dict(start_date='2020-01-01', end_date='2020-03-01', number=10,
+             return_object='NEO', filter=['diameter:>:1000']),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_file = os.path.join(cls.directory.name, 'neo_data.csv')
+        generate(cls.data_file, neos=300, orbits=6, days=60)
+        cls.queries = [Query(**options).build_query()
+                       for options in cls.Queries]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def assertBatchMatches(self, db):
+        db.load_data()
+        searcher = NEOSearcher(db)
+        expected = [result_keys(searcher.get_objects(query))
+                    for query in self.queries]
+        self.assertTrue(all(expected[:-2]))
+        self.assertEqual(expected[-2:], [[], []])
+
+        results = searcher.get_objects_batch(self.queries)
+        self.assertEqual(len(results), len(self.queries))
+        for options, keys, batch in zip(self.Queries, expected, results):
+            self.assertEqual(result_keys(batch), keys, options)
+
+        # In any order, and with a query repeated
+        queries = self.queries[::-1] + self.queries[:1]
+        self.assertEqual(
+            [result_keys(batch)
+             for batch in searcher.get_objects_batch(queries)],
+            expected[::-1] + expected[:1])
+
+    def test_batch_matches_get_objects(self):
+        self.assertBatchMatches(NEODatabase(filename=self.data_file))
+
+    def test_batch_matches_get_objects_with_range_indexes(self):
+        self.assertBatchMatches(NEODatabase(filename=self.data_file,
+                                            range_indexes=True))
+
+    @unittest.skipIf(np is None, 'The columnar backend requires numpy')
+    def test_batch_matches_get_objects_with_columnar(self):
+        self.assertBatchMatches(NEODatabase(filename=self.data_file,
+                                            columnar=True))
+
+    def test_batch_matches_get_objects_with_cache(self):
+        # Some of the queries are answered from the cache of get_objects
+        self.assertBatchMatches(NEODatabase(filename=self.data_file,
+                                            cache_size=4))
+
+    def test_cli_queries(self):
+        outfiles = [os.path.join(self.directory.name, f'query{i}.ndjson')
+                    for i in range(len(self.Queries))]
+        queries_file = os.path.join(self.directory.name, 'queries.jsonl')
+        with open(queries_file, 'w') as out:
+            for options, outfile in zip(self.Queries, outfiles):
+                out.write(json.dumps(dict(options, outfile=outfile)) + '\n')
+        subprocess.run(
+            [sys.executable, 'main.py', 'ndjson', '-f', self.data_file,
+             '--queries', queries_file],
+            cwd=PROJECT_ROOT, stdout=subprocess.PIPE, check=True)
+
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+        searcher = NEOSearcher(db)
+        for options, query, outfile in zip(self.Queries, self.queries,
+                                           outfiles):
+            expected = io.StringIO()
+            NEOWriter().write('ndjson', searcher.get_objects(query),
+                              out=expected)
+            with open(outfile) as written:
+                self.assertEqual(written.read(), expected.getvalue(),
+                                 options)
+
+
+if __name__ == '__main__':
+    unittest.main()
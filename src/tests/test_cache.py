@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+
+from cache import QueryCache
+from database import NEODatabase
+from search import Query, NEOSearcher
+from tests.fixtures import approach, write_rows
+
+
+def query(date='2020-01-01', filters=None, return_object='NEO'):
+    return Query(date=date, number=10, return_object=return_object,
+                 filter=filters).build_query()
+
+
+class TestQueryCache(unittest.TestCase):
+    """
+    Repeated queries are answered from the cache, queries only differing
+    in the order of their filters share their results, changes of the
+    data invalidate them and the least recently used query is evicted
+    once the cache is full.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        self.delta_file = os.path.join(self.directory.name, 'delta.csv')
+        write_rows(self.data_file, [
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 2000.0, 0.2, 0.5, hazard=True),
+            approach('(C)', '2020-01-02', 3000.0, 0.3, 0.6),
+            approach('(D)', '2020-01-03', 4000.0, 0.4, 0.7),
+        ])
+        write_rows(self.delta_file, [
+            approach('(E)', '2020-01-01', 500.0, 0.5, 0.8),
+        ])
+        self.db = NEODatabase(filename=self.data_file, cache_size=2)
+        self.db.load_data()
+        self.searcher = NEOSearcher(self.db)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def names(self, query):
+        return [result.name for result in self.searcher.get_objects(query)]
+
+    def test_repeated_query_is_a_hit(self):
+        cache = self.db.cache
+        first = self.searcher.get_objects(query())
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        second = self.searcher.get_objects(query())
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(second, first)
+        self.assertEqual([neo.name for neo in second], ['(A)', '(B)'])
+
+    def test_equivalent_queries_share_results(self):
+        cache = self.db.cache
+        self.names(query(filters=['diameter:>:0.1', 'is_hazardous:=:True']))
+        self.assertEqual(
+            self.names(query(filters=['is_hazardous:=:True',
+                                      'diameter:>:0.1'])), ['(B)'])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(QueryCache.key(query()),
+                         QueryCache.key(Query(
+                             start_date='2020-01-01', end_date='2020-01-01',
+                             number=10, return_object='NEO').build_query()))
+
+    def test_ingest_invalidates_results(self):
+        cache = self.db.cache
+        self.assertEqual(self.names(query()), ['(A)', '(B)'])
+        version = self.db.version
+
+        self.assertEqual(self.db.ingest(self.delta_file), 1)
+        self.assertGreater(self.db.version, version)
+        self.assertEqual(self.names(query()), ['(A)', '(B)', '(E)'])
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        # An ingest adding nothing keeps the results
+        self.assertEqual(self.db.ingest(self.delta_file), 0)
+        self.assertEqual(self.names(query()), ['(A)', '(B)', '(E)'])
+        self.assertEqual(cache.hits, 1)
+
+    def test_results_of_older_data_are_not_cached(self):
+        cache = QueryCache(2)
+        key = QueryCache.key(query())
+        cache.put(key, 1, ['old'])
+        self.assertIsNone(cache.get(key, 2))
+        cache.put(key, 1, ['old'])
+        self.assertIsNone(cache.get(key, 2))
+        self.assertEqual(cache.stats(), {'size': 0, 'hits': 0, 'misses': 2})
+
+    def test_least_recently_used_query_is_evicted(self):
+        cache = self.db.cache
+        first, second, third = (query('2020-01-01'), query('2020-01-02'),
+                                query('2020-01-03'))
+        self.names(first)
+        self.names(second)
+        # Using the first query makes the second the least recently used
+        self.names(first)
+        self.names(third)
+        self.assertEqual(len(cache.results), cache.size)
+        self.assertEqual(list(cache.results),
+                         [QueryCache.key(first), QueryCache.key(third)])
+
+        hits = cache.hits
+        self.assertEqual(self.names(second), ['(C)'])
+        self.assertEqual(cache.hits, hits)
+        self.assertEqual(self.names(third), ['(D)'])
+        self.assertEqual(cache.hits, hits + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
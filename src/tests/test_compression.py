@@ -0,0 +1,202 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import struct
+import tempfile
+import threading
+import unittest
+import zlib
+
+from benchmarks.generate import generate
+from compression import Compression, _ReadAhead, zstandard
+from database import NEODatabase
+
+
+def bgzf(data, size):
+    """ BGZF gzip file of data, a gzip member with its size in a BC extra
+    subfield per size bytes. """
+    members = []
+    for start in range(0, len(data), size):
+        block = data[start:start + size]
+        deflate = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = deflate.compress(block) + deflate.flush()
+        members.append(
+            b'\x1f\x8b\x08\x04' + bytes(4) + b'\x00\xff' +
+            struct.pack('<H2sHH', 6, b'BC', 2, len(compressed) + 25) +
+            compressed + struct.pack('<II', zlib.crc32(block), len(block)))
+    return b''.join(members)
+
+
+def xz(data, size):
+    """ xz file of data, a stream per size bytes followed by padding. """
+    return b''.join(lzma.compress(data[start:start + size]) + bytes(4)
+                    for start in range(0, len(data), size))
+
+
+def zstd(data, size):
+    """ zstd file of data, a frame with a checksum, as the zstd command
+    writes them, per size bytes. """
+    compressor = zstandard.ZstdCompressor(write_checksum=True)
+    return b''.join(compressor.compress(data[start:start + size])
+                    for start in range(0, len(data), size))
+
+
+def orbit_keys(db):
+    """ Orbits of each NEO, by name. """
+    return {name: (neo.neo_id, neo.diam_min, neo.diam_max, neo.hazard,
+                   [(orbit.orbit_date, orbit.miss) for orbit in neo.orbits])
+            for name, neo in db.db.items()}
+
+
+class TestCompressedLoad(unittest.TestCase):
+    """
+    Compressed data files load the same data as the plain file, their
+    independent members being decompressed and parsed in parallel, and
+    truncated or corrupt files fail to load.
+    """
+
+    # Bytes of data per member, splitting rows across members.
+    MemberSize = 5000
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = self.path('neo_data.csv')
+        generate(self.data_file, neos=200, orbits=5, days=60)
+        with open(self.data_file, 'rb') as csvfile:
+            self.data = csvfile.read()
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+        self.expected = orbit_keys(db)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write(self, name, data):
+        with open(self.path(name), 'wb') as compressed:
+            compressed.write(data)
+        return self.path(name)
+
+    def assertLoads(self, filename, compression, members):
+        self.assertEqual(Compression.detect(filename), compression)
+        found = Compression.members(filename, compression)
+        self.assertEqual(found is not None and len(found) > 1, members)
+        with Compression.open(filename) as source:
+            self.assertEqual(source.read(), self.data)
+        for workers in (1, 3):
+            db = NEODatabase(filename=filename, workers=workers)
+            db.load_data()
+            self.assertEqual(orbit_keys(db), self.expected, workers)
+
+    def assertFailsToLoad(self, filename, errors):
+        for workers in (1, 3):
+            with self.assertRaises(errors):
+                NEODatabase(filename=filename, workers=workers).load_data()
+
+    def formats(self):
+        formats = [('bgzf.csv.gz', Compression.Gzip, bgzf),
+                   ('streams.csv.xz', Compression.Xz, xz)]
+        if zstandard is not None:
+            formats.append(('frames.csv.zst', Compression.Zstd, zstd))
+        return formats
+
+    def test_bgzf_members_load_in_parallel(self):
+        self.assertLoads(self.write('bgzf.csv.gz',
+                                    bgzf(self.data, self.MemberSize)),
+                         Compression.Gzip, True)
+
+    def test_xz_streams_load_in_parallel(self):
+        self.assertLoads(self.write('streams.csv.xz',
+                                    xz(self.data, self.MemberSize)),
+                         Compression.Xz, True)
+
+    @unittest.skipIf(zstandard is None, 'zstd support requires zstandard')
+    def test_zstd_frames_load_in_parallel(self):
+        self.assertLoads(self.write('frames.csv.zst',
+                                    zstd(self.data, self.MemberSize)),
+                         Compression.Zstd, True)
+
+    def test_single_member_files_load_serially(self):
+        self.assertLoads(self.write('single.csv.gz', gzip.compress(self.data)),
+                         Compression.Gzip, False)
+        self.assertLoads(self.write('single.csv.bz2', bz2.compress(self.data)),
+                         Compression.Bz2, False)
+
+    def test_truncated_files_fail_to_load(self):
+        for name, _, compress in self.formats():
+            data = compress(self.data, self.MemberSize)
+            filename = self.write(name, data[:len(data) * 2 // 3])
+            with self.subTest(name):
+                self.assertFailsToLoad(filename, EOFError)
+
+    def test_corrupt_files_fail_to_load(self):
+        errors = {Compression.Gzip: zlib.error,
+                  Compression.Xz: lzma.LZMAError}
+        if zstandard is not None:
+            errors[Compression.Zstd] = zstandard.ZstdError
+        for name, compression, compress in self.formats():
+            data = bytearray(compress(self.data, self.MemberSize))
+            middle = len(data) // 2
+            data[middle:middle + 64] = bytes(b ^ 0x55 for b in
+                                             data[middle:middle + 64])
+            filename = self.write(name, bytes(data))
+            with self.subTest(name):
+                self.assertFailsToLoad(filename, errors[compression])
+
+
+class TestReadAhead(unittest.TestCase):
+    """
+    The read ahead thread hands the decompressed blocks over in order,
+    raises the errors of the decompression to the reader and stops when
+    the stream is closed early.
+    """
+
+    def setUp(self):
+        self.block_size = Compression.BlockSize
+        self.depth = Compression.Depth
+        Compression.BlockSize = 16
+        Compression.Depth = 2
+
+    def tearDown(self):
+        Compression.BlockSize = self.block_size
+        Compression.Depth = self.depth
+
+    def test_blocks_are_read_in_order(self):
+        blocks = [bytes([i]) * (i + 1) for i in range(50)]
+        with io.BufferedReader(_ReadAhead(block for block in blocks), 7) \
+                as stream:
+            self.assertEqual(stream.read(), b''.join(blocks))
+            self.assertEqual(stream.read(), b'')
+
+    def test_errors_are_raised_to_the_reader(self):
+        def blocks():
+            yield b'a,b\n'
+            raise EOFError(Compression.Truncated)
+
+        with io.BufferedReader(_ReadAhead(blocks())) as stream:
+            with self.assertRaises(EOFError):
+                stream.read()
+
+    def test_close_stops_the_thread(self):
+        closed = threading.Event()
+
+        def blocks():
+            try:
+                while True:
+                    yield b'x' * 16
+            finally:
+                closed.set()
+
+        stream = _ReadAhead(blocks())
+        self.assertEqual(len(io.BufferedReader(stream, 16).read(64)), 64)
+        stream.close()
+        self.assertFalse(stream.thread.is_alive())
+        self.assertTrue(closed.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
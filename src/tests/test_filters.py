@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+from columnar import np
+from database import NEODatabase
+from search import Filter, Query, NEOSearcher
+from tests.fixtures import approach, write_rows
+
+
+class TestFilters(unittest.TestCase):
+    """
+    Filter operators compare strictly for > and <, diameter filters
+    compare the maximum diameter estimate for >= and > and the minimum
+    one otherwise, and distance filters on NEOs pass them when any of
+    their orbits passes.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        write_rows(self.data_file, [
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 2000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-02', 3000.0, 0.1, 0.3),
+            approach('(C)', '2020-01-02', 2000.0, 0.3, 0.6),
+        ])
+        self.dbs = [NEODatabase(filename=self.data_file),
+                    NEODatabase(filename=self.data_file, range_indexes=True)]
+        if np is not None:
+            self.dbs.append(NEODatabase(filename=self.data_file,
+                                        columnar=True))
+        for db in self.dbs:
+            db.load_data()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def search(self, filters, return_object='NEO'):
+        """ Names (and distances of paths) of the results of a query
+        over both dates, the same on every backend. """
+        query = Query(number=10, start_date='2020-01-01',
+                      end_date='2020-01-02', return_object=return_object,
+                      filter=filters).build_query()
+        results = []
+        for db in self.dbs:
+            results.append([(result.name, getattr(result, 'miss', None))
+                            for result in NEOSearcher(db).get_objects(query)])
+            self.assertEqual(results[-1], results[0], (db, filters))
+        return [name if miss is None else (name, miss)
+                for name, miss in results[0]]
+
+    def test_diameter_bounds(self):
+        self.assertEqual(
+            {operation: Filter._parse_filter(f'diameter:{operation}:1').field
+             for operation in Filter.Operators},
+            {'>=': 'diam_max', '>': 'diam_max', '=': 'diam_min',
+             '<=': 'diam_min', '<': 'diam_min'})
+
+    def test_diameter_greater_compares_max_estimate(self):
+        # (A) is 0.1 to 0.3 km, (B) 0.2 to 0.5 km and (C) 0.3 to 0.6 km
+        self.assertEqual(self.search(['diameter:>=:0.3']),
+                         ['(A)', '(B)', '(C)'])
+        self.assertEqual(self.search(['diameter:>:0.3']), ['(B)', '(C)'])
+        self.assertEqual(self.search(['diameter:>:0.29']),
+                         ['(A)', '(B)', '(C)'])
+
+    def test_diameter_smaller_compares_min_estimate(self):
+        self.assertEqual(self.search(['diameter:<=:0.2']), ['(A)', '(B)'])
+        self.assertEqual(self.search(['diameter:<:0.2']), ['(A)'])
+        self.assertEqual(self.search(['diameter:=:0.2']), ['(B)'])
+        self.assertEqual(self.search(['diameter:=:0.5']), [])
+
+    def test_distance_strict_bounds_on_paths(self):
+        self.assertEqual(self.search(['distance:>=:2000'], 'Path'),
+                         [('(B)', 2000.0), ('(A)', 3000.0),
+                          ('(C)', 2000.0)])
+        self.assertEqual(self.search(['distance:>:2000'], 'Path'),
+                         [('(A)', 3000.0)])
+        self.assertEqual(self.search(['distance:<=:2000'], 'Path'),
+                         [('(A)', 1000.0), ('(B)', 2000.0),
+                          ('(C)', 2000.0)])
+        self.assertEqual(self.search(['distance:<:2000'], 'Path'),
+                         [('(A)', 1000.0)])
+
+    def test_distance_bounds_on_any_orbit_of_neos(self):
+        # (A) passes on its farthest orbit for > and closest one for <
+        self.assertEqual(self.search(['distance:>:2000']), ['(A)'])
+        self.assertEqual(self.search(['distance:>=:3000']), ['(A)'])
+        self.assertEqual(self.search(['distance:>:3000']), [])
+        self.assertEqual(self.search(['distance:<:2000']), ['(A)'])
+        self.assertEqual(self.search(['distance:<=:1000']), ['(A)'])
+        self.assertEqual(self.search(['distance:<:1000']), [])
+        self.assertEqual(self.search(['distance:=:3000']), ['(A)'])
+        self.assertEqual(self.search(['distance:=:1500']), [])
+
+    def test_hazard(self):
+        self.assertEqual(self.search(['is_hazardous:=:True']), ['(B)'])
+        self.assertEqual(self.search(['is_hazardous:=:False',
+                                      'diameter:>:0.3']), ['(C)'])
+
+
+if __name__ == '__main__':
+    unittest.main()
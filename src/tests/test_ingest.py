@@ -0,0 +1,251 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from benchmarks.generate import generate
+from database import NEODatabase
+from planner import QueryPlanner
+from search import Query, NEOSearcher
+from sharding import ShardedExecutor, np
+from tests.fixtures import approach, split_file, write_rows
+
+
+def orbit_keys(db):
+    """ (name, date, miss) of the orbits of each NEO, by name. """
+    return {name: [(orbit.orbit_date, orbit.miss) for orbit in neo.orbits]
+            for name, neo in db.db.items()}
+
+
+def result_keys(results):
+    """ Comparable form of NEO or OrbitPath results, in order. """
+    return [(result.name, getattr(result, 'orbit_date', None),
+             getattr(result, 'miss', None)) for result in results]
+
+
+class TestIngest(unittest.TestCase):
+    """
+    Rows ingested from delta files, or tailed from the data file, are
+    added once to the loaded data and seen by every index and backend as
+    if the data was loaded at once.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        self.delta_file = os.path.join(self.directory.name, 'delta.csv')
+
+        write_rows(self.data_file, [
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 2000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-03', 3000.0, 0.1, 0.3),
+        ])
+        # Overlaps the data file on the orbit of (A) on 2020-01-03
+        write_rows(self.delta_file, [
+            approach('(A)', '2020-01-03', 3000.0, 0.1, 0.3),
+            approach('(A)', '2020-01-02', 500.0, 0.1, 0.3),
+            approach('(C)', '2020-01-02', 4000.0, 1.5, 2.5),
+        ])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ingest_overlapping_file_adds_no_duplicates(self):
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+
+        self.assertEqual(db.ingest(self.delta_file), 2)
+        self.assertEqual(db.ingest(self.delta_file), 0)
+
+        self.assertEqual(sorted(db.db), ['(A)', '(B)', '(C)'])
+        self.assertEqual(len(db.db['(A)'].orbits), 3)
+        self.assertEqual(sum(len(orbits) for orbits in
+                             db.date_index.values()), 5)
+        self.assertEqual(db.dates, sorted(db.date_index))
+
+    def test_tail_adds_appended_rows_once(self):
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+
+        with open(self.delta_file, newline='') as delta:
+            rows = delta.readlines()[1:]
+        # A row still being written is left for the next call
+        with open(self.data_file, 'a', newline='') as csvfile:
+            csvfile.writelines(rows[:2])
+            csvfile.write(rows[2][:10])
+        self.assertEqual(db.tail(), 1)
+
+        with open(self.data_file, 'a', newline='') as csvfile:
+            csvfile.write(rows[2][10:])
+        self.assertEqual(db.tail(), 1)
+        self.assertEqual(db.tail(), 0)
+        self.assertEqual(sorted(db.db), ['(A)', '(B)', '(C)'])
+        self.assertEqual(len(db.db['(A)'].orbits), 3)
+
+    def test_indexes_see_ingested_rows(self):
+        db = NEODatabase(filename=self.data_file, range_indexes=True)
+        db.load_data()
+        db.ingest(self.delta_file)
+
+        names = [orbit.neo.name for orbit in
+                 db.get_orbits_on(datetime(2020, 1, 2))]
+        self.assertEqual(names, ['(A)', '(C)'])
+        self.assertEqual(db.count_orbits_between(
+            datetime(2020, 1, 1), datetime(2020, 1, 3)), 5)
+
+        self.assertEqual([neo.name for neo in
+                          db.indexes['diam_max'].find('>=', 1.0)], ['(C)'])
+        self.assertEqual([orbit.miss for orbit in
+                          db.indexes['miss'].find('<', 1000.0)], [500.0])
+        self.assertEqual([neo.name for neo in
+                          db.indexes['hazard'].find('=', True)], ['(B)'])
+
+        query = Query(number=10, start_date='2020-01-01',
+                      end_date='2020-01-03', return_object='Path',
+                      filter=['distance:<:1500']).build_query()
+        self.assertEqual(result_keys(NEOSearcher(db).get_objects(query)), [
+            ('(A)', datetime(2020, 1, 1), 1000.0),
+            ('(A)', datetime(2020, 1, 2), 500.0)])
+
+    def test_planner_statistics_follow_ingested_rows(self):
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+        planner = db.planner
+        self.assertEqual(planner.stats['diam_max'].sample, [0.3, 0.5])
+
+        db.ingest(self.delta_file)
+        self.assertIsNot(db.planner, planner)
+        self.assertEqual(db.planner.stats['diam_max'].sample,
+                         [0.3, 0.5, 2.5])
+        self.assertEqual(db.planner.stats['miss'].count, 5)
+        self.assertEqual(db.planner.stats['miss_min'].sample,
+                         [500.0, 2000.0, 4000.0])
+        self.assertEqual(db.planner.orbits_per_neo, 5 / 3)
+
+    def test_planner_is_refreshed_past_refresh_ratio(self):
+        self.assertEqual(QueryPlanner.RefreshRatio, 0.1)
+        generate(self.data_file, neos=100, orbits=10, days=30)
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+        planner = db.planner
+        self.assertEqual(planner.orbits, 1000)
+
+        # Refreshed once more than 10% of the 1000 orbits are added
+        write_rows(self.delta_file, [
+            approach(f'(New {i})', '2020-01-01', 1000.0) for i in range(50)])
+        self.assertEqual(db.ingest(self.delta_file), 50)
+        self.assertIs(db.planner, planner)
+        write_rows(self.delta_file, [
+            approach(f'(New {i})', '2020-01-02', 1000.0)
+            for i in range(51)])
+        self.assertEqual(db.ingest(self.delta_file), 51)
+        self.assertIsNot(db.planner, planner)
+        self.assertEqual(db.planner.orbits, 1101)
+        self.assertEqual(db.planner.added, 0)
+        self.assertEqual(db.planner.stats['diam_min'].count, 151)
+
+
+@unittest.skipIf(np is None, 'The columnar backend requires numpy')
+class TestIngestBackends(unittest.TestCase):
+    """
+    The columnar and sharded backends of a database that rows were
+    ingested into give the same results as a serial search.
+    """
+
+    Queries = [
+        dict(start_date='2020-01-01', end_date='2020-03-31', number=10 ** 6,
+             return_object='Path', filter=['distance:>=:40000000']),
+        dict(start_date='2020-01-01', end_date='2020-03-31', number=50,
+             return_object='Path', filter=['diameter:>:0.5']),
+        dict(start_date='2020-01-10', end_date='2020-02-20', number=10 ** 6,
+             return_object='NEO', filter=['distance:<:20000000']),
+        dict(start_date='2020-01-01', end_date='2020-03-31', number=20,
+             return_object='NEO',
+             filter=['is_hazardous:=:True', 'diameter:>=:0.1']),
+        dict(date='2020-02-01', number=10 ** 6, return_object='NEO'),
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        data_file = os.path.join(self.directory.name, 'generated.csv')
+        rest_file = os.path.join(self.directory.name, 'rest.csv')
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        self.delta_files = [
+            os.path.join(self.directory.name, f'delta{i}.csv')
+            for i in range(2)]
+        generate(data_file, neos=300, orbits=8, days=90)
+        split_file(data_file, self.data_file, rest_file, 1200)
+        split_file(rest_file, *self.delta_files, 600)
+
+        self.min_shard_rows = ShardedExecutor.MinShardRows
+        ShardedExecutor.MinShardRows = 10
+
+    def tearDown(self):
+        ShardedExecutor.MinShardRows = self.min_shard_rows
+        self.directory.cleanup()
+
+    def assertSameResults(self, expected, db):
+        self.assertEqual(orbit_keys(db), orbit_keys(expected))
+        for options in self.Queries:
+            query = Query(**options).build_query()
+            self.assertEqual(
+                result_keys(NEOSearcher(db).get_objects(query)),
+                result_keys(NEOSearcher(expected).get_objects(query)),
+                options)
+
+    def assertIngestsMatchSerial(self, db):
+        serial = NEODatabase(filename=self.data_file)
+        serial.load_data()
+        db.load_data()
+        for delta_file in self.delta_files:
+            self.assertEqual(db.ingest(delta_file),
+                             serial.ingest(delta_file))
+            self.assertSameResults(serial, db)
+
+    def test_columnar_matches_serial_after_ingest(self):
+        db = NEODatabase(filename=self.data_file, columnar=True)
+        self.assertIngestsMatchSerial(db)
+        self.assertEqual(len(db.columns.orbits), len(db.columns.neo))
+        self.assertEqual(list(db.columns.orbit_date),
+                         sorted(db.columns.orbit_date))
+
+    def test_sharded_matches_serial_after_ingest(self):
+        db = NEODatabase(filename=self.data_file, shards=2)
+        try:
+            self.assertIngestsMatchSerial(db)
+            self.assertEqual(len(db.executor.live), 1)
+        finally:
+            db.close()
+
+    def test_sharded_queries_run_during_ingest(self):
+        db = NEODatabase(filename=self.data_file, shards=2)
+        db.load_data()
+        query = Query(**self.Queries[0]).build_query()
+        errors = []
+        done = threading.Event()
+
+        def search():
+            while not done.is_set():
+                try:
+                    NEOSearcher(db).get_objects(query)
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        threads = [threading.Thread(target=search) for _ in range(2)]
+        try:
+            for thread in threads:
+                thread.start()
+            for delta_file in self.delta_files:
+                db.ingest(delta_file)
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+            db.close()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
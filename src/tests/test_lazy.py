@@ -0,0 +1,118 @@
+import gc
+import gzip
+import os
+import tempfile
+import unittest
+import weakref
+
+from benchmarks.generate import generate
+from database import NEODatabase
+from exceptions import UnsupportedFeature
+from search import Query, NEOSearcher
+
+
+def result_keys(results):
+    """ Comparable form of NEO or OrbitPath results, in order, with all
+    of the orbits of the NEOs. """
+    return [(result.name, getattr(result, 'orbit_date', None),
+             getattr(result, 'miss', None),
+             [(orbit.orbit_date, orbit.miss)
+              for orbit in getattr(result, 'orbits', [])])
+            for result in results]
+
+
+class TestLazy(unittest.TestCase):
+    """
+    A lazy database, materializing its objects from the rows of the data
+    file on demand, answers queries as an eagerly loaded one, with a
+    single instance of each NEO while it is in use.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_file = os.path.join(cls.directory.name, 'neo_data.csv')
+        generate(cls.data_file, neos=200, orbits=5, days=60)
+        cls.eager = NEODatabase(filename=cls.data_file)
+        cls.eager.load_data()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.db = NEODatabase(filename=self.data_file, lazy=True,
+                              object_cache=8)
+        self.db.load_data()
+        self.addCleanup(self.db.close)
+
+    def date(self, day):
+        return self.eager.dates[day].strftime('%Y-%m-%d')
+
+    def test_results_match_eager_load(self):
+        for return_object in Query.ReturnObjects:
+            for options in (
+                    dict(date=self.date(30), number=10 ** 6),
+                    dict(start_date=self.date(5), end_date=self.date(25),
+                         number=40, filter=['diameter:>=:0.1']),
+                    dict(start_date=self.date(0), end_date=self.date(59),
+                         number=10 ** 6, filter=['distance:<:20000000',
+                                                 'is_hazardous:=:False']),
+                    dict(start_date=self.date(10), end_date=self.date(20),
+                         number=15, sort='distance-desc')):
+                query = Query(return_object=return_object,
+                              **options).build_query()
+                expected = NEOSearcher(self.eager).get_objects(query)
+                self.assertTrue(expected)
+                self.assertEqual(
+                    result_keys(NEOSearcher(self.db).get_objects(query)),
+                    result_keys(expected), query)
+        self.assertEqual(self.db.dates, self.eager.dates)
+        self.assertEqual(len(self.db.rows.cache), 8)
+
+    def test_neo_in_use_is_a_single_instance(self):
+        rows = self.db.rows
+        neo = rows.neo(0)
+        self.assertIs(rows.neo(0), neo)
+        # Evicted from the cache, but still referenced here
+        for number in range(1, 20):
+            rows.neo(number)
+        self.assertNotIn(0, rows.cache)
+        self.assertIs(rows.neo(0), neo)
+        self.assertIs(rows.orbit(rows.neo_rows[rows.neo_starts[0]]).neo, neo)
+
+        # Once neither cached nor referenced, it is parsed again
+        name, reference = neo.name, weakref.ref(neo)
+        del neo
+        for number in range(1, 20):
+            rows.neo(number)
+        gc.collect()
+        self.assertIsNone(reference())
+        self.assertEqual(rows.neo(0).name, name)
+
+    def test_reload_and_close_release_the_data_file(self):
+        rows = self.db.rows
+        self.db.load_data()
+        self.assertIsNot(self.db.rows, rows)
+        self.assertTrue(rows.file.closed)
+        self.assertEqual(rows.data, b'')
+
+        rows = self.db.rows
+        self.db.close()
+        self.assertTrue(rows.file.closed)
+
+    def test_compressed_file_is_unsupported(self):
+        compressed = os.path.join(self.directory.name, 'neo_data.csv.gz')
+        with open(self.data_file, 'rb') as csvfile, \
+                gzip.open(compressed, 'wb') as gzfile:
+            gzfile.write(csvfile.read())
+        with self.assertRaises(UnsupportedFeature):
+            NEODatabase(filename=compressed, lazy=True).load_data()
+
+    def test_ingest_is_unsupported(self):
+        with self.assertRaises(UnsupportedFeature):
+            self.db.ingest(self.data_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from database import NEODatabase
+from lazy import LazyNearEarthObject
+from models import NearEarthObject, OrbitPath
+from tests.fixtures import approach, write_rows
+
+
+def day(number):
+    """ Date of a day of January 2020, the day before it being 0. """
+    return datetime(2019, 12, 31) + timedelta(days=number)
+
+
+class TestOrbitSummaries(unittest.TestCase):
+    """
+    The first and last dates and the closest and farthest miss distances
+    of a NEO summarize its orbits as they are added, and date searches on
+    its orbits include both of their dates.
+    """
+
+    def setUp(self):
+        self.neo = NearEarthObject('1', '(A)', 0.1, 0.3, False)
+        for number, miss in ((3, 3000.0), (1, 1000.0), (5, 500.0),
+                             (3, 4000.0)):
+            self.neo.update_orbits(OrbitPath(self.neo, day(number), miss))
+
+    def dates(self, orbits):
+        return [orbit.orbit_date.day for orbit in orbits]
+
+    def test_summaries(self):
+        self.assertEqual((self.neo.first_date, self.neo.last_date),
+                         (datetime(2020, 1, 1), datetime(2020, 1, 5)))
+        self.assertEqual((self.neo.miss_min, self.neo.miss_max),
+                         (500.0, 4000.0))
+
+    def test_summaries_without_orbits(self):
+        neo = NearEarthObject('2', '(B)', 0.1, 0.3, False)
+        self.assertIsNone(neo.first_date)
+        self.assertIsNone(neo.last_date)
+        self.assertEqual(neo.orbits_between(datetime(2020, 1, 1),
+                                            datetime(2020, 12, 31)), [])
+        self.assertFalse(neo.approaches_between(datetime(2020, 1, 1),
+                                                datetime(2020, 12, 31)))
+
+        neo = NearEarthObject('2', '(B)', 0.1, 0.3, False,
+                              orbit_date=datetime(2020, 1, 2), miss=100.0)
+        self.assertEqual((neo.first_date, neo.last_date, neo.miss_min,
+                          neo.miss_max),
+                         (datetime(2020, 1, 2), datetime(2020, 1, 2),
+                          100.0, 100.0))
+
+    def test_dates_are_included(self):
+        for (start, end), days in (
+                # Exactly the first or the last date
+                ((1, 1), [1]),
+                ((5, 5), [5]),
+                # Exactly all of the dates, and more
+                ((1, 5), [3, 1, 5, 3]),
+                ((0, 6), [3, 1, 5, 3]),
+                # Part of the dates, bounded by an orbit or not
+                ((3, 5), [3, 5, 3]),
+                ((2, 4), [3, 3]),
+                ((1, 3), [3, 1, 3]),
+                # Within the summary, but no orbit on the dates
+                ((2, 2), []),
+                ((4, 4), []),
+                # Before the first or after the last date
+                ((0, 0), []),
+                ((6, 9), [])):
+            start_date, end_date = day(start), day(end)
+            orbits = self.neo.orbits_between(start_date, end_date)
+            self.assertEqual(self.dates(orbits), days, (start, end))
+            self.assertEqual(self.neo.approaches_between(start_date,
+                                                         end_date),
+                             bool(days), (start, end))
+
+    def test_summaries_after_ingest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, 'neo_data.csv')
+            delta_file = os.path.join(directory, 'delta.csv')
+            write_rows(data_file, [
+                approach('(A)', '2020-01-02', 2000.0),
+                approach('(A)', '2020-01-04', 3000.0),
+            ])
+            write_rows(delta_file, [
+                # Duplicate of a loaded orbit, skipped
+                approach('(A)', '2020-01-04', 3000.0),
+                approach('(A)', '2020-01-01', 2500.0),
+                approach('(A)', '2020-01-06', 100.0),
+                approach('(A)', '2020-01-03', 9000.0),
+            ])
+            db = NEODatabase(filename=data_file)
+            db.load_data()
+            neo = db.db['(A)']
+            self.assertFalse(neo.approaches_between(datetime(2020, 1, 5),
+                                                    datetime(2020, 1, 6)))
+
+            self.assertEqual(db.ingest(delta_file), 3)
+        self.assertEqual((neo.first_date, neo.last_date),
+                         (datetime(2020, 1, 1), datetime(2020, 1, 6)))
+        self.assertEqual((neo.miss_min, neo.miss_max), (100.0, 9000.0))
+        self.assertEqual(
+            self.dates(neo.orbits_between(datetime(2020, 1, 5),
+                                          datetime(2020, 1, 6))), [6])
+        self.assertEqual(
+            self.dates(neo.orbits_between(datetime(2020, 1, 1),
+                                          datetime(2020, 1, 6))),
+            [2, 4, 1, 6, 3])
+
+
+
+class TestSlots(unittest.TestCase):
+    """
+    NEOs and orbits are slotted, without a per instance __dict__, and an
+    orbit takes its name from its NEO.
+    """
+
+    def test_slots(self):
+        self.assertEqual(NearEarthObject.__slots__, (
+            'neo_id', 'name', 'orbits', 'diam_min', 'diam_max', 'hazard',
+            'first_date', 'last_date', 'miss_min', 'miss_max'))
+        self.assertEqual(OrbitPath.__slots__, ('neo', 'orbit_date', 'miss'))
+        self.assertEqual(LazyNearEarthObject.__slots__, ('__weakref__',))
+
+        neo = NearEarthObject('1', '(A)', 0.1, 0.3, False,
+                              orbit_date=day(1), miss=1000.0)
+        lazy = LazyNearEarthObject('2', '(B)', 0.1, 0.3, False)
+        for obj in (neo, neo.orbits[0], lazy):
+            self.assertFalse(hasattr(obj, '__dict__'), obj)
+            with self.assertRaises(AttributeError):
+                obj.magnitude = 1.0
+
+    def test_orbit_name(self):
+        neo = NearEarthObject('1', '(A)', 0.1, 0.3, False)
+        orbit = OrbitPath(neo, day(1), 1000.0)
+        self.assertEqual(orbit.name, '(A)')
+        neo.name = '(A) renamed'
+        self.assertEqual(orbit.name, '(A) renamed')
+        with self.assertRaises(AttributeError):
+            orbit.name = '(B)'
+
+    def test_extra_fields_are_unused(self):
+        neo = NearEarthObject('1', '(A)', 0.1, 0.3, False, magnitude=20.0)
+        orbit = OrbitPath(neo, day(1), 1000.0, velocity=10.0)
+        self.assertFalse(hasattr(neo, 'magnitude'))
+        self.assertFalse(hasattr(orbit, 'velocity'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import pathlib
 import unittest
+from datetime import datetime
 
 from database import NEODatabase
 from search import Query, NEOSearcher
@@ -38,6 +39,20 @@ class TestNEOSearchUseCases(unittest.TestCase):
         self.start_date = '2020-01-01'
         self.end_date = '2020-01-10'
 
+    def expected_neos_on_date(self, neo_filter, distance=None):
+        """
+        Unique NEOs of the start date passing a filter, up to 10, found
+        by walking all of the NEOs. Diameter filters with > compare the
+        maximum diameter estimate, and distance filters pass a NEO if any
+        of its orbits is strictly farther.
+        """
+        date = datetime.strptime(self.start_date, '%Y-%m-%d')
+        neos = [neo for neo in self.db.db.values()
+                if neo_filter(neo) and date in neo.orbit_dates and
+                (distance is None or
+                 any(orbit.miss > distance for orbit in neo.orbits))]
+        return min(len(neos), 10)
+
     def test_find_unique_number_neos_on_date(self):
         self.db.load_data()
         query_selectors = Query(number=10, date=self.start_date, return_object='NEO').build_query()
@@ -66,11 +81,12 @@ class TestNEOSearchUseCases(unittest.TestCase):
         ).build_query()
         results = NEOSearcher(self.db).get_objects(query_selectors)
 
-        # Confirm 4 results and 4 unique results
-        self.assertEqual(len(results), 4)
-        neo_ids = list(filter(lambda neo: neo.diam_min > 0.042, results))
+        # Confirm the NEOs larger than 0.042 km, and as many unique results
+        expected = self.expected_neos_on_date(lambda neo: neo.diam_max > 0.042)
+        self.assertEqual(len(results), expected)
+        self.assertTrue(all(neo.diam_max > 0.042 for neo in results))
         neo_ids = set(map(lambda neo: neo.name, results))
-        self.assertEqual(len(neo_ids), 4)
+        self.assertEqual(len(neo_ids), expected)
 
     def test_find_unique_number_between_dates_with_diameter(self):
         self.db.load_data()
@@ -82,8 +98,7 @@ class TestNEOSearchUseCases(unittest.TestCase):
 
         # Confirm 10 results and 10 unique results
         self.assertEqual(len(results), 10)
-        neo_ids = list(filter(lambda neo: neo.diam_min > 0.042, results))
-        diameter = set(map(lambda neo: neo.diam_min, results))
+        self.assertTrue(all(neo.diam_max > 0.042 for neo in results))
         neo_ids = set(map(lambda neo: neo.name, results))
         self.assertEqual(len(neo_ids), 10)
 
@@ -94,13 +109,15 @@ class TestNEOSearchUseCases(unittest.TestCase):
         ).build_query()
         results = NEOSearcher(self.db).get_objects(query_selectors)
 
-        # Confirm 0 results and 0 unique results
-        self.assertEqual(len(results), 0)
-        neo_ids = list(filter(
-            lambda neo: neo.diam_min > 0.042 and neo.hazard, results
-        ))
+        # Confirm the hazardous NEOs larger than 0.042 km, and as many
+        # unique results
+        expected = self.expected_neos_on_date(
+            lambda neo: neo.diam_max > 0.042 and neo.hazard)
+        self.assertEqual(len(results), expected)
+        self.assertTrue(all(neo.diam_max > 0.042 and neo.hazard
+                            for neo in results))
         neo_ids = set(map(lambda neo: neo.name, results))
-        self.assertEqual(len(neo_ids), 0)
+        self.assertEqual(len(neo_ids), expected)
 
     def test_find_unique_number_between_dates_with_diameter_and_hazardous(self):
         self.db.load_data()
@@ -112,9 +129,8 @@ class TestNEOSearchUseCases(unittest.TestCase):
 
         # Confirm 10 results and 10 unique results
         self.assertEqual(len(results), 10)
-        neo_ids = list(filter(
-            lambda neo: neo.diam_min > 0.042 and neo.hazard, results)
-        )
+        self.assertTrue(all(neo.diam_max > 0.042 and neo.hazard
+                            for neo in results))
         neo_ids = set(map(lambda neo: neo.name, results))
         self.assertEqual(len(neo_ids), 10)
 
@@ -126,13 +142,13 @@ class TestNEOSearchUseCases(unittest.TestCase):
         ).build_query()
         results = NEOSearcher(self.db).get_objects(query_selectors)
 
-        # Confirm 0 results and 0 unique results
-        self.assertEqual(len(results), 0)
-        neo_ids = list(filter(
-            lambda neo: neo.diam_min > 0.042 and neo.hazard, results
-        ))
+        # Confirm the hazardous NEOs larger than 0.042 km with an orbit
+        # farther than 234989 km, and as many unique results
+        expected = self.expected_neos_on_date(
+            lambda neo: neo.diam_max > 0.042 and neo.hazard, distance=234989)
+        self.assertEqual(len(results), expected)
         neo_ids = set(map(lambda neo: neo.name, results))
-        self.assertEqual(len(neo_ids), 0)
+        self.assertEqual(len(neo_ids), expected)
 
     def test_find_unique_number_between_dates_with_diameter_and_hazardous_and_distance(self):
         self.db.load_data()
@@ -148,8 +164,9 @@ class TestNEOSearchUseCases(unittest.TestCase):
 
         # Filter NEOs by NEO attributes
         neo_ids = list(filter(
-            lambda neo: neo.diam_min > 0.042 and neo.hazard, results)
+            lambda neo: neo.diam_max > 0.042 and neo.hazard, results)
         )
+        self.assertEqual(len(neo_ids), 10)
 
         # Filter to NEO Orbit Paths with Matching Distance
         all_orbits = []
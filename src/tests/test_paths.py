@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+from database import NEODatabase
+from search import Query, NEOSearcher
+from sharding import ShardedExecutor, np
+from tests.fixtures import approach, write_rows
+
+
+def result_keys(results):
+    """ Comparable form of NEO or OrbitPath results, in order. """
+    return [(result.name, getattr(result, 'orbit_date', None),
+             getattr(result, 'miss', None)) for result in results]
+
+
+class TestPathSemantics(unittest.TestCase):
+    """
+    Path queries return the orbits within the dates that pass the
+    distance filters themselves, not every orbit of a NEO with any
+    passing one, and the orbits of the NEOs passing the NEO filters,
+    on every backend and in batches.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        # (A) and (B) approach several times, on both sides of 4000 km
+        # and before the searched dates
+        write_rows(self.data_file, [
+            approach('(A)', '2019-12-31', 8000.0, 0.1, 0.3),
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 6000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-02', 5000.0, 0.1, 0.3),
+            approach('(C)', '2020-01-02', 2000.0, 0.3, 0.6),
+            approach('(B)', '2020-01-03', 3000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-03', 9000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-04', 7000.0, 0.2, 0.5, hazard=True),
+        ])
+        self.min_shard_rows = ShardedExecutor.MinShardRows
+        ShardedExecutor.MinShardRows = 2
+
+        self.dbs = [NEODatabase(filename=self.data_file),
+                    NEODatabase(filename=self.data_file, range_indexes=True)]
+        if np is not None:
+            self.dbs += [NEODatabase(filename=self.data_file, columnar=True),
+                         NEODatabase(filename=self.data_file, shards=2)]
+        for db in self.dbs:
+            db.load_data()
+
+    def tearDown(self):
+        for db in self.dbs:
+            db.close()
+        ShardedExecutor.MinShardRows = self.min_shard_rows
+        self.directory.cleanup()
+
+    def search(self, filters, return_object='Path', number=10):
+        """ Results of a query over 2020-01-01 to 2020-01-03, the same on
+        every backend and in a batch with other queries. """
+        query = Query(number=number, start_date='2020-01-01',
+                      end_date='2020-01-03', return_object=return_object,
+                      filter=filters).build_query()
+        other = Query(number=10, date='2020-01-04',
+                      return_object=return_object).build_query()
+        results = []
+        for db in self.dbs:
+            searcher = NEOSearcher(db)
+            results.append(result_keys(searcher.get_objects(query)))
+            self.assertEqual(results[-1], results[0], (db, filters))
+            self.assertEqual(
+                result_keys(searcher.get_objects_batch([other, query])[1]),
+                results[0], (db, filters))
+        return [(name, date.day, miss) if date else name
+                for name, date, miss in results[0]]
+
+    def test_only_passing_orbits_are_returned(self):
+        self.assertEqual(self.search(['distance:>:4000']), [
+            ('(B)', 1, 6000.0), ('(A)', 2, 5000.0), ('(A)', 3, 9000.0)])
+        self.assertEqual(self.search(['distance:<=:3000']), [
+            ('(A)', 1, 1000.0), ('(C)', 2, 2000.0), ('(B)', 3, 3000.0)])
+
+    def test_orbits_outside_dates_are_not_returned(self):
+        # (A) on 2019-12-31 and (B) on 2020-01-04 pass, out of the dates
+        self.assertEqual(self.search(['distance:>=:7000']),
+                         [('(A)', 3, 9000.0)])
+
+    def test_neo_filters_apply_to_every_orbit(self):
+        self.assertEqual(self.search(['is_hazardous:=:True']), [
+            ('(B)', 1, 6000.0), ('(B)', 3, 3000.0)])
+        self.assertEqual(self.search(['is_hazardous:=:False',
+                                      'distance:>:4000']), [
+            ('(A)', 2, 5000.0), ('(A)', 3, 9000.0)])
+        self.assertEqual(self.search(['diameter:<:0.2',
+                                      'distance:<:4000']),
+                         [('(A)', 1, 1000.0)])
+
+    def test_number_counts_passing_orbits(self):
+        self.assertEqual(self.search(['distance:>:4000'], number=2), [
+            ('(B)', 1, 6000.0), ('(A)', 2, 5000.0)])
+
+    def test_neo_results_pass_on_any_orbit(self):
+        # NEOs pass on any orbit and are returned once, unlike paths
+        self.assertEqual(self.search(['distance:>:4000'], 'NEO'),
+                         ['(A)', '(B)'])
+        self.assertEqual(self.search(['distance:>:8000'], 'NEO'), ['(A)'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.generate import generate
+from database import NEODatabase
+from pipeline import Pipeline
+from search import Query, NEOSearcher
+from tests.fixtures import approach, write_rows
+
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent
+
+
+def result_keys(results):
+    """ Comparable form of NEO or OrbitPath results, in order, with all
+    of the orbits of the NEOs. """
+    return [(result.name, getattr(result, 'orbit_date', None),
+             getattr(result, 'miss', None),
+             [(orbit.orbit_date, orbit.miss)
+              for orbit in getattr(result, 'orbits', [])])
+            for result in results]
+
+
+class TestPipeline(unittest.TestCase):
+    """
+    The NEODatabase loaded by the pipeline, with the NEOs matching the
+    dates of the queries only, answers them as a fully loaded database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_file = os.path.join(cls.directory.name, 'neo_data.csv')
+        generate(cls.data_file, neos=300, orbits=6, days=90)
+        cls.reference = NEODatabase(filename=cls.data_file)
+        cls.reference.load_data()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def date(self, day):
+        return self.reference.dates[day].strftime('%Y-%m-%d')
+
+    def assertSameResults(self, queries, workers=2):
+        db = Pipeline(self.data_file, workers=workers).load(queries)
+        for query in queries:
+            expected = NEOSearcher(self.reference).get_objects(query)
+            self.assertTrue(expected)
+            self.assertEqual(result_keys(NEOSearcher(db).get_objects(query)),
+                             result_keys(expected), query)
+        return db
+
+    def test_single_date(self):
+        for return_object in Query.ReturnObjects:
+            db = self.assertSameResults([Query(
+                date=self.date(40), number=10 ** 6,
+                return_object=return_object).build_query()])
+            self.assertLess(len(db.db), len(self.reference.db))
+
+    def test_date_range(self):
+        self.assertSameResults([Query(
+            start_date=self.date(20), end_date=self.date(30), number=50,
+            return_object='NEO',
+            filter=['diameter:>=:0.1']).build_query()], workers=1)
+        self.assertSameResults([Query(
+            start_date=self.date(20), end_date=self.date(30), number=10 ** 6,
+            return_object='Path', filter=['distance:<:30000000'],
+            sort='distance').build_query()])
+
+    def test_several_queries(self):
+        # Overlapping, adjacent and disjoint date ranges
+        self.assertSameResults([
+            Query(start_date=self.date(10), end_date=self.date(20),
+                  number=10 ** 6, return_object='Path').build_query(),
+            Query(start_date=self.date(15), end_date=self.date(25),
+                  number=30, return_object='NEO',
+                  filter=['is_hazardous:=:True']).build_query(),
+            Query(date=self.date(26), number=10 ** 6,
+                  return_object='NEO').build_query(),
+            Query(start_date=self.date(60), end_date=self.date(62),
+                  number=10 ** 6, return_object='NEO',
+                  sort='diameter-desc').build_query()])
+
+    def test_intervals(self):
+        queries = [Query(start_date=start, end_date=end, number=1,
+                         return_object='NEO').build_query()
+                   for start, end in [('2020-01-05', '2020-01-08'),
+                                      ('2020-01-01', '2020-01-03'),
+                                      ('2020-01-04', '2020-01-04'),
+                                      ('2020-01-07', '2020-01-09'),
+                                      ('2020-01-20', '2020-01-21')]]
+        starts, ends = Pipeline._intervals(queries)
+        self.assertEqual([(start - starts[0], end - starts[0])
+                          for start, end in zip(starts, ends)],
+                         [(0, 8), (19, 20)])
+
+    def test_neos_matched_after_earlier_orbits(self):
+        data_file = os.path.join(self.directory.name, 'late.csv')
+        write_rows(data_file, [
+            approach('(A)', '2020-01-01', 1000.0),
+            approach('(B)', '2020-01-01', 2000.0),
+            approach('(A)', '2020-01-05', 3000.0),
+            approach('(C)', '2020-01-05', 4000.0),
+            approach('(A)', '2020-01-09', 5000.0),
+        ])
+        query = Query(date='2020-01-05', number=10,
+                      return_object='NEO').build_query()
+        db = Pipeline(data_file).load([query])
+        self.assertEqual(sorted(db.db), ['(A)', '(C)'])
+        self.assertEqual([orbit.miss for orbit in db.db['(A)'].orbits],
+                         [1000.0, 3000.0, 5000.0])
+        self.assertEqual([neo.name for neo in
+                          NEOSearcher(db).get_objects(query)],
+                         ['(A)', '(C)'])
+
+    def test_match_errors_are_raised(self):
+        query = Query(date=self.date(40), number=10,
+                      return_object='NEO').build_query()
+        with mock.patch.object(Pipeline, '_match',
+                               side_effect=ValueError('Bad range')):
+            with self.assertRaises(ValueError):
+                Pipeline(self.data_file, workers=2).load([query])
+
+    def test_cli_pipeline_matches_load(self):
+        def run(*options):
+            return subprocess.run(
+                [sys.executable, 'main.py', 'ndjson', '-f', self.data_file,
+                 '-s', self.date(5), '-e', self.date(15), '-n', '40',
+                 '-o', '-', *options],
+                cwd=PROJECT_ROOT, stdout=subprocess.PIPE, check=True,
+                universal_newlines=True).stdout
+
+        output = run()
+        self.assertEqual(len(output.splitlines()), 40)
+        self.assertEqual(run('--pipeline', '--workers', '2'), output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import profiling
+from database import NEODatabase
+from search import Filter, Query, NEOSearcher
+from tests.fixtures import approach, write_rows
+
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent
+
+# Runs main.py, then tells whether profiling was active on exit, after
+# the report is saved.
+RUN_MAIN = '''
+import atexit, runpy, sys
+sys.path.insert(0, '.')
+import profiling
+atexit.register(lambda: print('active:', profiling.active() is not None))
+sys.argv = ['main.py'] + sys.argv[1:]
+runpy.run_path('main.py', run_name='__main__')
+'''
+
+
+class TestProfile(unittest.TestCase):
+    """
+    A Profile records the time, calls and counters of each stage and the
+    measured selectivity of the filters it instruments.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        write_rows(self.data_file, [
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 2000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-02', 3000.0, 0.1, 0.3),
+            approach('(C)', '2020-01-02', 2000.0, 0.3, 0.6),
+        ])
+        # Profiling is global, restore it as it was
+        restore = mock.patch.object(profiling, '_profile', None)
+        restore.start()
+        self.addCleanup(restore.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_stages_and_counters(self):
+        profile = profiling.enable()
+        for _ in range(2):
+            with profiling.stage('load.parse'):
+                profiling.count('load.parse', 'rows', 3)
+        self.assertEqual(list(profile.counted('search', 'candidates',
+                                              'abc')), ['a', 'b', 'c'])
+
+        report = json.loads(json.dumps(profile.report()))
+        self.assertEqual(set(report), {'total_seconds', 'stages', 'filters',
+                                       'peak_memory_kb'})
+        self.assertEqual(list(report['stages']), ['load.parse', 'search'])
+        parse = report['stages']['load.parse']
+        self.assertEqual((parse['calls'], parse['rows']), (2, 6))
+        self.assertGreaterEqual(parse['seconds'], 0)
+        self.assertEqual(report['stages']['search'],
+                         {'seconds': 0.0, 'calls': 0, 'candidates': 3})
+
+    def test_instrumented_filter_counts(self):
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+        profile = profiling.enable()
+
+        hazard, distance = Filter.create_filter_options(
+            ['is_hazardous:=:False', 'distance:>:1500'])
+        profile.instrument_filter(hazard, 0.5)
+        profile.instrument_filter(distance)
+        neos = list(db.db.values())
+        self.assertEqual([neo.name for neo in hazard.apply(neos)],
+                         ['(A)', '(C)'])
+        orbits = [orbit for neo in neos for orbit in neo.orbits]
+        passes = distance.orbit_predicate()
+        self.assertEqual([orbit.miss for orbit in orbits if passes(orbit)],
+                         [3000.0, 2000.0, 2000.0])
+
+        filters = profile.report()['filters']
+        self.assertEqual(filters['hazard:=:False'], {
+            'evaluated': 3, 'passed': 2, 'selectivity': 2 / 3,
+            'estimated_selectivity': 0.5})
+        self.assertEqual(filters['miss:>:1500'], {
+            'evaluated': 4, 'passed': 3, 'selectivity': 0.75,
+            'estimated_selectivity': None})
+
+    def test_search_reports_candidates_and_filters(self):
+        db = NEODatabase(filename=self.data_file)
+        db.load_data()
+        profile = profiling.enable()
+        query = Query(start_date='2020-01-01', end_date='2020-01-02',
+                      number=10, return_object='Path',
+                      filter=['is_hazardous:=:False']).build_query()
+        self.assertEqual(len(NEOSearcher(db).get_objects(query)), 3)
+
+        report = profile.report()
+        self.assertEqual(report['stages']['search']['candidates'], 4)
+        # Evaluated once per NEO
+        self.assertEqual(report['filters']['hazard:=:False']['evaluated'], 3)
+
+    def test_disabled_profiling_records_nothing(self):
+        self.assertIsNone(profiling.active())
+        with profiling.stage('load.parse') as record:
+            self.assertIsNone(record)
+        profiling.count('load.parse', 'rows')
+        self.assertIsNone(profiling.active())
+
+
+class TestProfileToggles(unittest.TestCase):
+    """
+    main.py profiles a run and saves its report when given --profile or
+    the NEO_PROFILE variable, and only then.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        self.report = os.path.join(self.directory.name, 'profile.json')
+        write_rows(self.data_file, [
+            approach('(A)', '2020-01-01', 1000.0),
+            approach('(B)', '2020-01-01', 2000.0),
+        ])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_main(self, *options, **environ):
+        env = {key: value for key, value in os.environ.items()
+               if key not in (profiling.ReportVariable,
+                              profiling.DumpVariable)}
+        env.update(environ)
+        return subprocess.run(
+            [sys.executable, '-c', RUN_MAIN, 'ndjson', '-f', self.data_file,
+             '-d', '2020-01-01', '-n', '10', '-o', os.devnull, *options],
+            cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, check=True,
+            universal_newlines=True).stdout
+
+    def assertReported(self):
+        with open(self.report) as report_file:
+            stages = json.load(report_file)['stages']
+        self.assertIn('load.parse', stages)
+        self.assertEqual(stages['search']['results'], 2)
+        self.assertEqual(stages['write']['calls'], 1)
+
+    def test_profile_option(self):
+        self.assertIn('active: True',
+                      self.run_main('--profile', self.report))
+        self.assertReported()
+
+    def test_profile_variable(self):
+        self.assertIn('active: True', self.run_main(
+            **{profiling.ReportVariable: self.report}))
+        self.assertReported()
+
+    def test_inactive_by_default(self):
+        self.assertIn('active: False', self.run_main())
+        self.assertFalse(os.path.exists(self.report))
+
+
+if __name__ == '__main__':
+    unittest.main()
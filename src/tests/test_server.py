@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from database import NEODatabase
+from search import Query, NEOSearcher
+from server import NEOServer
+from tests.fixtures import approach, write_rows
+
+
+class TestServer(unittest.TestCase):
+    """
+    The query server answers with the results NEOSearcher finds for the
+    same query, as NDJSON, and rejects invalid queries with a 400.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        data_file = os.path.join(cls.directory.name, 'neo_data.csv')
+        write_rows(data_file, [
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 2000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-02', 3000.0, 0.1, 0.3),
+            approach('(C)', '2020-01-02', 500.0, 0.3, 0.6),
+            approach('(B)', '2020-01-03', 4000.0, 0.2, 0.5, hazard=True),
+        ])
+        cls.db = NEODatabase(filename=data_file, cache_size=4)
+        cls.db.load_data()
+
+        cls.server = NEOServer(cls.db, port=0)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+        cls.server.ready.wait()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.thread.join()
+        cls.db.close()
+        cls.directory.cleanup()
+
+    def get(self, path, **params):
+        """ Status and JSON documents of the response to a request. """
+        url = f'http://{self.server.host}:{self.server.port}{path}'
+        if params:
+            url += '?' + urlencode(params, doseq=True)
+        try:
+            with urlopen(url) as response:
+                status, body = response.status, response.read()
+        except HTTPError as e:
+            status, body = e.code, e.read()
+        return status, [json.loads(line) for line in body.splitlines()]
+
+    def expected(self, **params):
+        """ JSON documents of the results NEOSearcher finds. """
+        query = Query(**params).build_query()
+        results = NEOSearcher(self.db).get_objects(query)
+        if params.get('return_object') == 'Path':
+            return [{'name': orbit.name,
+                     'date': orbit.orbit_date.strftime('%Y-%m-%d'),
+                     'miss_distance_km': orbit.miss} for orbit in results]
+        return [{'id': neo.neo_id,
+                 'name': neo.name,
+                 'diameter_min_km': neo.diam_min,
+                 'diameter_max_km': neo.diam_max,
+                 'is_hazardous': neo.hazard,
+                 'orbits': [{'date': orbit.orbit_date.strftime('%Y-%m-%d'),
+                             'miss_distance_km': orbit.miss}
+                            for orbit in neo.orbits]} for neo in results]
+
+    def test_neo_query_matches_searcher(self):
+        params = {'start_date': '2020-01-01', 'end_date': '2020-01-03',
+                  'number': 10, 'return_object': 'NEO',
+                  'filter': ['diameter:>=:0.3']}
+        status, neos = self.get('/query', **params)
+        self.assertEqual(status, 200)
+        self.assertEqual(neos, self.expected(**params))
+        self.assertEqual([neo['name'] for neo in neos], ['(A)', '(B)', '(C)'])
+
+    def test_path_query_matches_searcher(self):
+        params = {'start_date': '2020-01-01', 'end_date': '2020-01-03',
+                  'number': 3, 'return_object': 'Path',
+                  'filter': ['distance:>=:1000', 'is_hazardous:=:True'],
+                  'sort': 'distance-desc'}
+        status, orbits = self.get('/query', **params)
+        self.assertEqual(status, 200)
+        self.assertEqual(orbits, self.expected(**params))
+        self.assertEqual([(orbit['name'], orbit['miss_distance_km'])
+                          for orbit in orbits],
+                         [('(B)', 4000.0), ('(B)', 2000.0)])
+
+    def test_no_results(self):
+        self.assertEqual(self.get('/query', date='2021-01-01', number=10),
+                         (200, []))
+
+    def test_bad_params_are_bad_requests(self):
+        for params in ({'number': 10},
+                       {'start_date': '2020-01-01', 'number': 10},
+                       {'date': '2020-13-01', 'number': 10},
+                       {'date': '2020-01-01'},
+                       {'date': '2020-01-01', 'number': 'ten'},
+                       {'date': '2020-01-01', 'number': 10,
+                        'return_object': 'Comet'},
+                       {'date': '2020-01-01', 'number': 10,
+                        'sort': '-diameter'},
+                       {'date': '2020-01-01', 'number': 10,
+                        'filter': 'mass:>:1'},
+                       {'date': '2020-01-01', 'number': 10,
+                        'filter': 'diameter:>:big'},
+                       {'date': '2020-01-01', 'number': 10,
+                        'filter': 'diameter:~:1'}):
+            with self.subTest(params):
+                status, body = self.get('/query', **params)
+                self.assertEqual(status, 400)
+                self.assertIn('error', body[0])
+
+    def test_unknown_path_is_not_found(self):
+        self.assertEqual(self.get('/neos')[0], 404)
+
+    def test_stats_report_cache_counters(self):
+        status, stats = self.get('/stats')
+        self.assertEqual(status, 200)
+        self.assertEqual(set(stats[0]['cache']), {'size', 'hits', 'misses'})
+
+
+if __name__ == '__main__':
+    unittest.main()
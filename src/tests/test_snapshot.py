@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from database import NEODatabase
+from tests.fixtures import approach, write_rows
+
+
+def orbit_keys(db):
+    """ Orbits of each NEO, by name, and the orbits of each date. """
+    return ({name: (neo.neo_id, neo.diam_min, neo.diam_max, neo.hazard,
+                    [(orbit.orbit_date, orbit.miss) for orbit in neo.orbits])
+             for name, neo in db.db.items()},
+            [(date, [orbit.neo.name for orbit in db.date_index[date]])
+             for date in db.dates])
+
+
+class TestSnapshot(unittest.TestCase):
+    """
+    Snapshots are kept in the cache directory of the user, only loaded
+    when owned by the user and while the data file is unchanged, and
+    load the same data as parsing the data file.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.directory.name, 'cache')
+        environ = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.cache})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        self.rows = [
+            approach('(A)', '2020-01-01', 1000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 2000.0, 0.2, 0.5, hazard=True),
+            approach('(A)', '2020-01-03', 3000.0, 0.1, 0.3),
+        ]
+        write_rows(self.data_file, self.rows)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, **kwargs):
+        """ Load the data file with snapshots, noting if the snapshot was
+        used. """
+        db = NEODatabase(filename=self.data_file, snapshot=True, **kwargs)
+        with mock.patch.object(NEODatabase, '_parse_rows',
+                               wraps=NEODatabase._parse_rows) as parse:
+            db.load_data()
+        db.parsed = parse.called
+        return db
+
+    def test_snapshot_is_kept_in_user_cache(self):
+        self.load()
+        path = NEODatabase._snapshot_path(self.data_file)
+        self.assertTrue(path.startswith(self.cache))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         ['cache', 'neo_data.csv'])
+        if hasattr(os, 'getuid'):
+            self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777,
+                             0o700)
+
+    def test_snapshot_matches_fresh_parse(self):
+        parsed = self.load(range_indexes=True)
+        loaded = self.load(range_indexes=True)
+        self.assertTrue(parsed.parsed)
+        self.assertFalse(loaded.parsed)
+        self.assertEqual(orbit_keys(loaded), orbit_keys(parsed))
+        self.assertEqual([neo.name for neo in
+                          loaded.indexes['diam_max'].find('>', 0.3)], ['(B)'])
+
+    def test_snapshot_is_invalidated_when_data_changes(self):
+        self.load()
+        write_rows(self.data_file, self.rows +
+                   [approach('(C)', '2020-01-02', 500.0)])
+        db = self.load()
+        self.assertTrue(db.parsed)
+        self.assertEqual(sorted(db.db), ['(A)', '(B)', '(C)'])
+
+    def test_same_size_change_is_found_by_hash(self):
+        self.load()
+        stat = os.stat(self.data_file)
+        # Same size, different content and mtime
+        self.rows[0] = approach('(A)', '2020-01-01', 9000.0, 0.1, 0.3)
+        write_rows(self.data_file, self.rows)
+        self.assertEqual(os.stat(self.data_file).st_size, stat.st_size)
+        os.utime(self.data_file, ns=(stat.st_atime_ns,
+                                     stat.st_mtime_ns + 10 ** 9))
+        db = self.load()
+        self.assertTrue(db.parsed)
+        self.assertEqual(db.db['(A)'].orbits[0].miss, 9000.0)
+
+    def test_data_file_is_only_hashed_when_mtime_changes(self):
+        self.load()
+        with mock.patch.object(NEODatabase, '_digest',
+                               wraps=NEODatabase._digest) as digest:
+            self.assertFalse(self.load().parsed)
+            self.assertFalse(digest.called)
+
+            # Touched but unchanged
+            stat = os.stat(self.data_file)
+            os.utime(self.data_file, ns=(stat.st_atime_ns,
+                                         stat.st_mtime_ns + 10 ** 9))
+            self.assertFalse(self.load().parsed)
+            self.assertTrue(digest.called)
+
+    @unittest.skipIf(not hasattr(os, 'getuid'), 'Requires POSIX owners')
+    def test_snapshot_writable_by_others_is_ignored(self):
+        self.load()
+        os.chmod(NEODatabase._snapshot_path(self.data_file), 0o666)
+        self.assertTrue(self.load().parsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
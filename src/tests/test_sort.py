@@ -0,0 +1,148 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+from columnar import np
+from database import NEODatabase
+from models import OrbitPath
+from search import Filter, Query, NEOSearcher
+from tests.fixtures import approach, write_rows
+
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent
+
+
+def expected_results(db, query):
+    """
+    Sorts all of the results of a query, as the first number of them
+    selected with a heap should be ordered.
+
+    :param db: loaded NEODatabase
+    :param query: Query.Selectors object with a sort
+    :return: list of NearEarthObjects or OrbitPaths
+    """
+    start, end = [datetime.strptime(date, '%Y-%m-%d')
+                  for date in query.date_search.values]
+    filters = Filter.create_filter_options(query.filters)
+    field, reverse = query.sort
+    # Matching orbits in the order of the date index
+    orbits = [orbit for date in db.dates if start <= date <= end
+              for orbit in db.date_index[date]]
+
+    if query.return_object == OrbitPath:
+        results = [orbit for orbit in orbits if all(
+            filt.predicate(orbit.neo) if filt.object == 'NearEarthObject'
+            else filt.orbit_predicate()(orbit) for filt in filters)]
+        value = (lambda orbit: orbit.neo.diam_max) if field == 'diam_max' \
+            else (lambda orbit: getattr(orbit, field))
+    else:
+        # NEOs in the order of their first matching orbit, on their
+        # closest or first (farthest or last) matching orbit
+        best = {}
+        for orbit in orbits:
+            values = best.setdefault(orbit.neo, [])
+            values.append(getattr(orbit, field) if field != 'diam_max'
+                          else orbit.neo.diam_max)
+        results = [neo for neo in best
+                   if all(filt.predicate(neo) for filt in filters)]
+        pick = max if reverse else min
+        value = (lambda neo: pick(best[neo]))
+    return sorted(results, key=value, reverse=reverse)[:query.number]
+
+
+def result_keys(results):
+    """ Comparable form of NEO or OrbitPath results, in order. """
+    return [(result.name, getattr(result, 'orbit_date', None),
+             getattr(result, 'miss', None)) for result in results]
+
+
+class TestSortedSearch(unittest.TestCase):
+    """
+    The first number results of a sorted query, selected with a bounded
+    heap or ordered by a range index or the columnar store, are those of
+    a full sort of its results, results equal on the sort field keeping
+    the order of the date index.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        # Ties on diameters, on distances and on dates, and NEOs with
+        # several approaches in and out of the searched dates
+        write_rows(self.data_file, [
+            approach('(A)', '2020-01-01', 5000.0, 0.1, 0.3),
+            approach('(B)', '2020-01-01', 3000.0, 0.2, 0.5, hazard=True),
+            approach('(C)', '2020-01-01', 5000.0, 0.1, 0.3),
+            approach('(D)', '2020-01-02', 3000.0, 0.2, 0.5),
+            approach('(A)', '2020-01-02', 1000.0, 0.1, 0.3),
+            approach('(E)', '2020-01-02', 9000.0, 0.4, 0.9, hazard=True),
+            approach('(B)', '2020-01-03', 9000.0, 0.2, 0.5, hazard=True),
+            approach('(F)', '2020-01-03', 1000.0, 0.05, 0.1),
+            approach('(C)', '2020-01-04', 500.0, 0.1, 0.3),
+            approach('(E)', '2019-12-31', 100.0, 0.4, 0.9, hazard=True),
+        ])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def queries(self):
+        for return_object in Query.ReturnObjects:
+            for sort in Query.sort_options():
+                for number in (1, 3, 100):
+                    for filters in (None, ['is_hazardous:=:False'],
+                                    ['distance:>=:3000']):
+                        yield Query(start_date='2020-01-01',
+                                    end_date='2020-01-03', number=number,
+                                    return_object=return_object, sort=sort,
+                                    filter=filters).build_query()
+
+    def assertSortedResults(self, db):
+        db.load_data()
+        reference = NEODatabase(filename=self.data_file)
+        reference.load_data()
+        for query in self.queries():
+            self.assertEqual(
+                result_keys(NEOSearcher(db).get_objects(query)),
+                result_keys(expected_results(reference, query)), query)
+
+    def test_sort_options(self):
+        self.assertEqual(Query(date='2020-01-01', number=1,
+                               return_object='NEO',
+                               sort='diameter-desc').sort,
+                         Query.Sort(field='diam_max', reverse=True))
+        self.assertEqual(Query(date='2020-01-01', number=1,
+                               return_object='NEO', sort='distance').sort,
+                         Query.Sort(field='miss', reverse=False))
+
+    def test_heap_selection_matches_full_sort(self):
+        self.assertSortedResults(NEODatabase(filename=self.data_file))
+
+    def test_range_index_order_matches_full_sort(self):
+        self.assertSortedResults(NEODatabase(filename=self.data_file,
+                                             range_indexes=True))
+
+    @unittest.skipIf(np is None, 'The columnar backend requires numpy')
+    def test_columnar_order_matches_full_sort(self):
+        self.assertSortedResults(NEODatabase(filename=self.data_file,
+                                             columnar=True))
+
+    def test_cli_descending_sort(self):
+        output = subprocess.run(
+            [sys.executable, 'main.py', 'ndjson', '-f', self.data_file,
+             '-s', '2020-01-01', '-e', '2020-01-03', '-n', '3',
+             '--sort', 'diameter-desc', '-o', '-'],
+            cwd=PROJECT_ROOT, stdout=subprocess.PIPE, check=True,
+            universal_newlines=True).stdout
+        neos = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([(neo['name'], neo['diameter_max_km'])
+                          for neo in neos],
+                         [('(E)', 0.9), ('(B)', 0.5), ('(D)', 0.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from database import NEODatabase
+from search import Query, NEOSearcher
+from tests.fixtures import approach, write_rows
+import writer
+from writer import NEOWriter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Recorder(io.StringIO):
+    """ Output noting the number of results pulled at each write. """
+
+    def __init__(self, pulled):
+        super().__init__()
+        self.pulled = pulled
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(self.pulled[0])
+        return super().write(text)
+
+
+class TestStreamingWriter(unittest.TestCase):
+    """
+    NEOWriter streams results in batches of BatchSize rows, pulling them
+    from the search as it writes, to a path, a file object or stdout.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        data_file = os.path.join(self.directory.name, 'neo_data.csv')
+        write_rows(data_file, [
+            approach(f'({i})', f'2020-01-0{1 + i % 3}', 1000.0 * (i + 1),
+                     hazard=i % 2 == 0)
+            for i in range(7)])
+        self.db = NEODatabase(filename=data_file)
+        self.db.load_data()
+
+        self.batch_size = NEOWriter.BatchSize
+        NEOWriter.BatchSize = 3
+
+    def tearDown(self):
+        NEOWriter.BatchSize = self.batch_size
+        self.directory.cleanup()
+
+    def results(self, return_object='Path', date=None):
+        query = Query(number=10, return_object=return_object,
+                      **({'date': date} if date else
+                         {'start_date': '2020-01-01',
+                          'end_date': '2020-01-03'})).build_query()
+        return NEOSearcher(self.db).get_objects(query)
+
+    def stream(self, results, pulled):
+        """ Generator of results, counting the results pulled. """
+        for result in results:
+            pulled[0] += 1
+            yield result
+
+    def test_results_are_written_in_batches(self):
+        orbits = self.results()
+        pulled = [0]
+        out = Recorder(pulled)
+        self.assertTrue(NEOWriter().write('display',
+                                          self.stream(orbits, pulled),
+                                          out=out))
+        # A batch of 3 is written before the next results are pulled
+        self.assertEqual(out.writes, [3, 6, 7])
+        self.assertEqual(out.getvalue().splitlines(), [
+            f'Name: {orbit.name}, Miss ditance (km): {orbit.miss}, '
+            f'Date: {orbit.orbit_date:%Y-%m-%d}' for orbit in orbits])
+
+    def test_csv_batches_keep_every_row(self):
+        orbits = self.results()
+        for size in (1, 3, 7, 8):
+            NEOWriter.BatchSize = size
+            out = io.StringIO()
+            NEOWriter().write('csv_file', iter(orbits), out=out)
+            rows = list(csv.reader(io.StringIO(out.getvalue()),
+                                   delimiter=';'))
+            self.assertEqual(rows[0], ['Name', 'Miss distance (km)',
+                                       'Orbit date'])
+            self.assertEqual(
+                rows[1:], [[orbit.name, str(orbit.miss),
+                            f'{orbit.orbit_date:%Y-%m-%d}']
+                           for orbit in orbits], size)
+
+    def test_empty_results(self):
+        for format, expected in (('display', 'No objects found\n'),
+                                 ('csv_file', 'ID;Name;Orbits;Orbit dates\r\n'),
+                                 ('ndjson', '')):
+            out = io.StringIO()
+            self.assertTrue(NEOWriter().write(format, iter([]), out=out))
+            self.assertEqual(out.getvalue(), expected, format)
+
+    def test_stdout(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            NEOWriter().write('ndjson', self.results('NEO', '2020-01-01'),
+                              out='-')
+        self.assertEqual([line.split('"name":')[1].split(',')[0]
+                          for line in stdout.getvalue().splitlines()],
+                         ['"(0)"', '"(3)"', '"(6)"'])
+
+    def test_file_object_is_left_open(self):
+        out = io.StringIO()
+        NEOWriter().write('csv_file', self.results('NEO'), out=out)
+        NEOWriter().write('csv_file', self.results('NEO'), out=out)
+        self.assertFalse(out.closed)
+        self.assertEqual(len(out.getvalue().splitlines()), 2 * (1 + 7))
+
+    def test_path(self):
+        path = os.path.join(self.directory.name, 'orbits.csv')
+        NEOWriter().write('csv_file', self.results(), out=path)
+        with open(path, newline='') as csvfile:
+            self.assertEqual(len(list(csv.reader(csvfile))), 1 + 7)
+
+
+
+class TestRoundTrip(unittest.TestCase):
+    """
+    The ndjson and columnar outputs read back as the results of the query
+    written, NEOs with all of their orbits.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        data_file = os.path.join(cls.directory.name, 'neo_data.csv')
+        write_rows(data_file, [
+            approach('(A)', '2020-01-01', 1000.5, 0.1, 0.3, neo_id='1'),
+            approach('(B)', '2020-01-01', 2000.25, 0.2, 0.5, hazard=True,
+                     neo_id='2'),
+            approach('(A)', '2020-01-02', 3000.0, 0.1, 0.3, neo_id='1'),
+            approach('(C)', '2020-01-03', 1500.75, 0.3, 0.6, neo_id='3'),
+            approach('(B)', '2020-02-01', 2500.0, 0.2, 0.5, hazard=True,
+                     neo_id='2'),
+        ])
+        db = NEODatabase(filename=data_file)
+        db.load_data()
+        searcher = NEOSearcher(db)
+        cls.results = {
+            return_object: searcher.get_objects(Query(
+                start_date='2020-01-01', end_date='2020-01-03', number=10,
+                return_object=return_object).build_query())
+            for return_object in ('NEO', 'Path')}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def write(self, format, return_object):
+        path = os.path.join(self.directory.name,
+                            f'{return_object}.{format}')
+        self.assertTrue(NEOWriter().write(
+            format, iter(self.results[return_object]), out=path))
+        return path
+
+    def expected_neos(self):
+        return [(neo.neo_id, neo.name, neo.diam_min, neo.diam_max, neo.hazard,
+                 [(orbit.orbit_date.date(), orbit.miss)
+                  for orbit in neo.orbits])
+                for neo in self.results['NEO']]
+
+    def expected_orbits(self):
+        return [(orbit.name, orbit.orbit_date.date(), orbit.miss)
+                for orbit in self.results['Path']]
+
+    def test_ndjson(self):
+        with open(self.write('ndjson', 'NEO')) as ndjson:
+            neos = [json.loads(line) for line in ndjson]
+        self.assertEqual(
+            [(neo['id'], neo['name'], neo['diameter_min_km'],
+              neo['diameter_max_km'], neo['is_hazardous'],
+              [(datetime.date.fromisoformat(orbit['date']),
+                orbit['miss_distance_km']) for orbit in neo['orbits']])
+             for neo in neos],
+            self.expected_neos())
+        # All of the orbits, not only those in the dates searched
+        self.assertEqual(len(neos[1]['orbits']), 2)
+
+        with open(self.write('ndjson', 'Path')) as ndjson:
+            orbits = [json.loads(line) for line in ndjson]
+        self.assertEqual(
+            [(orbit['name'], datetime.date.fromisoformat(orbit['date']),
+              orbit['miss_distance_km']) for orbit in orbits],
+            self.expected_orbits())
+
+    @unittest.skipIf(writer.pa is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        table = writer.pq.read_table(self.write('columnar_file', 'NEO'))
+        self.assertEqual(
+            [(neo['id'], neo['name'], neo['diam_min'], neo['diam_max'],
+              neo['hazard'], list(zip(neo['orbit_date'], neo['miss'])))
+             for neo in table.to_pylist()],
+            self.expected_neos())
+
+        table = writer.pq.read_table(self.write('columnar_file', 'Path'))
+        self.assertEqual(
+            [(orbit['name'], orbit['orbit_date'], orbit['miss'])
+             for orbit in table.to_pylist()],
+            self.expected_orbits())
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_npz_without_pyarrow(self):
+        with mock.patch.object(writer, 'pa', None):
+            neo_path = self.write('columnar_file', 'NEO')
+            orbit_path = self.write('columnar_file', 'Path')
+
+        with np.load(neo_path) as columns:
+            self.assertEqual(columns['orbit_date'].dtype,
+                             np.dtype('datetime64[D]'))
+            offsets = columns['orbit_offsets']
+            self.assertEqual(offsets[0], 0)
+            self.assertEqual(offsets[-1], len(columns['miss']))
+            dates = columns['orbit_date'].astype(object)
+            self.assertEqual(
+                [(str(columns['id'][i]), str(columns['name'][i]),
+                  columns['diam_min'][i], columns['diam_max'][i],
+                  bool(columns['hazard'][i]),
+                  list(zip(dates[start:end],
+                           columns['miss'][start:end].tolist())))
+                 for i, (start, end) in enumerate(zip(offsets[:-1],
+                                                      offsets[1:]))],
+                self.expected_neos())
+
+        with np.load(orbit_path) as columns:
+            self.assertEqual(
+                list(zip(columns['name'].tolist(),
+                         columns['orbit_date'].astype(object),
+                         columns['miss'].tolist())),
+                self.expected_orbits())
+
+
+if __name__ == '__main__':
+    unittest.main()
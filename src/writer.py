@@ -1,6 +1,25 @@
+from aggregate import Aggregate
+from exceptions import UnsupportedFeature
 from models import NearEarthObject, OrbitPath
+from array import array
+from contextlib import contextmanager
 from enum import Enum
+from functools import lru_cache
+from itertools import chain, islice
 import csv
+import json
+import sys
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class OutputFormat(Enum):
@@ -10,6 +29,8 @@ class OutputFormat(Enum):
     """
     display = 'display'
     csv_file = 'csv_file'
+    ndjson = 'ndjson'
+    columnar_file = 'columnar_file'
 
     @staticmethod
     def list():
@@ -23,8 +44,15 @@ class NEOWriter(object):
     """
     Python object use to write the results from supported output
     formatting options.
+
+    Results are streamed: they can be any iterable, including the
+    generators of the NEOSearcher, and are written in batches of
+    BatchSize rows so the full result set is never held in memory.
     """
 
+    # Number of rows formatted and written at once.
+    BatchSize = 1024
+
     def __init__(self):
         pass
 
@@ -34,82 +62,293 @@ class NEOWriter(object):
         selected calls the appropriate instance write function
 
         :param format: str representing the OutputFormat
-        :param data: collection of NearEarthObject or OrbitPath results
+        :param data: iterable of NearEarthObject or OrbitPath results
         :param kwargs: Additional attributes used for
-                       formatting output e.g. filename
+                       formatting output e.g. filename, or out as the
+                       path or file object to write to ('-' for stdout)
         :return: bool representing if write successful or not
         """
-        # Boolean variable to see if the data contains NEOs or OrbitPaths
-        neo_p = type(data[0]) == NearEarthObject
+        # Peek at the first result to know whether the data contains
+        # NEOs or OrbitPaths, without needing the whole data.
+        data = iter(data)
+        first = next(data, None)
+        if first is not None:
+            data = chain([first], data)
+        neo_p = first is None or isinstance(first, NearEarthObject)
 
         if OutputFormat(format) == OutputFormat.display:
             if neo_p:  # If it is NEOs
-                return NEOWriter._write_neo_display(data)
+                return NEOWriter._write_neo_display(data, **kwargs)
             else:  # If it is Orbit Paths
-                return NEOWriter._write_orbit_display(data)
+                return NEOWriter._write_orbit_display(data, **kwargs)
         elif OutputFormat(format) == OutputFormat.csv_file:
             if neo_p:  # If it is NEOs
                 return NEOWriter._write_neo_csv(data, **kwargs)
             else:  # If it is Orbit Paths
                 return NEOWriter._write_orbit_csv(data, **kwargs)
+        elif OutputFormat(format) == OutputFormat.ndjson:
+            if neo_p:  # If it is NEOs
+                return NEOWriter._write_neo_ndjson(data, **kwargs)
+            else:  # If it is Orbit Paths
+                return NEOWriter._write_orbit_ndjson(data, **kwargs)
+        elif OutputFormat(format) == OutputFormat.columnar_file:
+            if neo_p:  # If it is NEOs
+                return NEOWriter._write_neo_columnar(data, **kwargs)
+            else:  # If it is Orbit Paths
+                return NEOWriter._write_orbit_columnar(data, **kwargs)
+
+    def write_aggregate(self, rows, group_by, **kwargs):
+        """
+        Writes the rows of an aggregate query as a csv table, with a
+        column per group then per Aggregate.Metrics.
+
+        :param rows: list of dicts, see NEOSearcher.aggregate
+        :param group_by: list of the Aggregate.Groups options of the rows
+        :param kwargs: out as the path or file object to write to, stdout
+                       by default
+        :return: bool representing if write successful or not
+        """
+        header = list(group_by) + Aggregate.Metrics
+        return NEOWriter._write_csv(
+            header, ([row[column] for column in header] for row in rows),
+            sys.stdout, **kwargs)
 
     @staticmethod
-    def _write_neo_display(data):
-        if not data:
-            print('No objects found')
-        for neo in data:
-            id_name = f'ID: {neo.neo_id}, Name: {neo.name}, '
-            orbits = f'Orbits: {neo.orbits}, '
-            dates = f'Orbit dates: {NEOWriter._dates_to_str(neo.orbit_dates)}'
-            print(id_name + orbits + dates)
+    @contextmanager
+    def _open(default, binary=False, **kwargs):
+        """
+        Opens the output to write to: the out kwarg if given, as a path,
+        a file object or '-' for stdout, otherwise the default path.
+        File objects are left open.
+        """
+        out = kwargs.get('out') or default
+        if out == '-':
+            out = sys.stdout.buffer if binary else sys.stdout
+        if hasattr(out, 'write'):
+            yield out
+        elif binary:
+            with open(out, 'wb') as outfile:
+                yield outfile
+        else:
+            with open(out, 'w', newline='') as outfile:
+                yield outfile
+
+    @staticmethod
+    def _batches(rows):
+        """ Split an iterable of rows in lists of BatchSize rows. """
+        rows = iter(rows)
+        batch = list(islice(rows, NEOWriter.BatchSize))
+        while batch:
+            yield batch
+            batch = list(islice(rows, NEOWriter.BatchSize))
+
+    @staticmethod
+    def _write_lines(lines, **kwargs):
+        with NEOWriter._open(sys.stdout, **kwargs) as out:
+            empty = True
+            for batch in NEOWriter._batches(lines):
+                empty = False
+                out.write('\n'.join(batch) + '\n')
+            if empty:
+                out.write('No objects found\n')
         return True
 
+    @staticmethod
+    def _write_neo_display(data, **kwargs):
+        return NEOWriter._write_lines(
+            (f'ID: {neo.neo_id}, Name: {neo.name}, '
+             f'Orbits: {neo.orbits}, '
+             f'Orbit dates: {NEOWriter._dates_to_str(neo.orbit_dates)}'
+             for neo in data), **kwargs)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _date_to_str(date):
+        return date.strftime('%Y-%m-%d')
+
     @staticmethod
     def _dates_to_str(dates):
-        return list(map(lambda d: d.strftime('%Y-%m-%d'), dates))
+        return [NEOWriter._date_to_str(date) for date in dates]
 
     @staticmethod
-    def _write_orbit_display(data):
-        if not data:
-            print('No objects found')
-        for orbit in data:
-            name = f'Name: {orbit.name}, '
-            miss = f'Miss ditance (km): {round(orbit.miss, 2)}, '
-            date = f'Date: {NEOWriter._dates_to_str([orbit.orbit_date])[0]}'
-            print(name + miss + date)
+    def _write_orbit_display(data, **kwargs):
+        return NEOWriter._write_lines(
+            (f'Name: {orbit.name}, '
+             f'Miss ditance (km): {round(orbit.miss, 2)}, '
+             f'Date: {NEOWriter._date_to_str(orbit.orbit_date)}'
+             for orbit in data), **kwargs)
+
+    @staticmethod
+    def _write_csv(header, rows, default, **kwargs):
+        with NEOWriter._open(default, **kwargs) as out:
+            writer = csv.writer(out, delimiter=';')
+            # Writing headers
+            writer.writerow(header)
+            for batch in NEOWriter._batches(rows):
+                writer.writerows(batch)
         return True
 
     @staticmethod
     def _write_neo_csv(data, **kwargs):
-        if 'filename' in kwargs.keys():
-            filename = kwargs['filename']
-        else:
-            filename = 'neo.csv'
-        out = 'out/' + filename
+        filename = kwargs.get('filename', 'neo.csv')
+        return NEOWriter._write_csv(
+            ['ID', 'Name', 'Orbits', 'Orbit dates'],
+            ([neo.neo_id, neo.name, neo.orbits,
+              NEOWriter._dates_to_str(neo.orbit_dates)] for neo in data),
+            'out/' + filename, **kwargs)
 
-        with open(out, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';')
-            # Writing headers
-            writer.writerow(['ID', 'Name', 'Orbits', 'Orbit dates'])
-            for neo in data:
-                writer.writerow([neo.neo_id, neo.name, neo.orbits,
-                                 NEOWriter._dates_to_str(neo.orbit_dates)])
+    @staticmethod
+    def _write_orbit_csv(data, **kwargs):
+        filename = kwargs.get('filename', 'orbit.csv')
+        return NEOWriter._write_csv(
+            ['Name', 'Miss distance (km)', 'Orbit date'],
+            ([orbit.name, round(orbit.miss, 2),
+              NEOWriter._date_to_str(orbit.orbit_date)] for orbit in data),
+            'out/' + filename, **kwargs)
+
+    @staticmethod
+    def _write_neo_ndjson(data, **kwargs):
+        filename = kwargs.get('filename', 'neo.ndjson')
+        return NEOWriter._write_ndjson(
+            ({'id': neo.neo_id,
+              'name': neo.name,
+              'diameter_min_km': neo.diam_min,
+              'diameter_max_km': neo.diam_max,
+              'is_hazardous': neo.hazard,
+              'orbits': [{'date': NEOWriter._date_to_str(orbit.orbit_date),
+                          'miss_distance_km': orbit.miss}
+                         for orbit in neo.orbits]}
+             for neo in data),
+            'out/' + filename, **kwargs)
+
+    @staticmethod
+    def _write_orbit_ndjson(data, **kwargs):
+        filename = kwargs.get('filename', 'orbit.ndjson')
+        return NEOWriter._write_ndjson(
+            ({'name': orbit.name,
+              'date': NEOWriter._date_to_str(orbit.orbit_date),
+              'miss_distance_km': orbit.miss}
+             for orbit in data),
+            'out/' + filename, **kwargs)
+
+    @staticmethod
+    def _write_ndjson(records, default, **kwargs):
+        """ Writes one JSON document per line. """
+        dumps = json.JSONEncoder(separators=(',', ':')).encode
+        with NEOWriter._open(default, **kwargs) as out:
+            for batch in NEOWriter._batches(records):
+                out.write('\n'.join(map(dumps, batch)) + '\n')
         return True
 
     @staticmethod
-    def _write_orbit_csv(data, **kwargs):
-        if 'filename' in kwargs.keys():
-            filename = kwargs['filename']
-        else:
-            filename = 'orbit.csv'
-        out = 'out/' + filename
+    def _write_neo_columnar(data, **kwargs):
+        """
+        Writes NEOs as a table with one row per NEO, its orbits being
+        list columns. Parquet is used when pyarrow is installed,
+        otherwise a NumPy .npz archive holding the lists Arrow style,
+        as flat orbit columns split by orbit_offsets.
+        """
+        if pa is not None:
+            schema = pa.schema([('id', pa.string()),
+                                ('name', pa.string()),
+                                ('diam_min', pa.float64()),
+                                ('diam_max', pa.float64()),
+                                ('hazard', pa.bool_()),
+                                ('orbit_date', pa.list_(pa.date32())),
+                                ('miss', pa.list_(pa.float64()))])
+            return NEOWriter._write_parquet(
+                schema,
+                ([neo.neo_id, neo.name, neo.diam_min, neo.diam_max,
+                  neo.hazard,
+                  [orbit.orbit_date for orbit in neo.orbits],
+                  [orbit.miss for orbit in neo.orbits]] for neo in data),
+                'out/' + kwargs.get('filename', 'neo.parquet'), **kwargs)
 
-        with open(out, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';')
-            # Writing headers
-            writer.writerow(['Name', 'Miss distance (km)', 'Orbit date'])
-            for orbit in data:
-                writer.writerow([orbit.name, round(orbit.miss, 2),
-                                 NEOWriter._dates_to_str(
-                                     [orbit.orbit_date])[0]])
+        NEOWriter._check_numpy()
+        ids, names = [], []
+        diam_min, diam_max = array('d'), array('d')
+        hazard = array('b')
+        orbit_offsets = array('q', [0])
+        orbit_date, miss = array('q'), array('d')
+        for neo in data:
+            ids.append(neo.neo_id)
+            names.append(neo.name)
+            diam_min.append(neo.diam_min)
+            diam_max.append(neo.diam_max)
+            hazard.append(neo.hazard)
+            for orbit in neo.orbits:
+                orbit_date.append(orbit.orbit_date.toordinal())
+                miss.append(orbit.miss)
+            orbit_offsets.append(len(miss))
+        columns = {
+            'id': np.array(ids, dtype=str),
+            'name': np.array(names, dtype=str),
+            'diam_min': np.frombuffer(diam_min, dtype=np.float64),
+            'diam_max': np.frombuffer(diam_max, dtype=np.float64),
+            'hazard': np.frombuffer(hazard, dtype=np.int8).astype(bool),
+            'orbit_offsets': np.frombuffer(orbit_offsets, dtype=np.int64),
+            'orbit_date': NEOWriter._ordinals_to_datetime64(orbit_date),
+            'miss': np.frombuffer(miss, dtype=np.float64)}
+        return NEOWriter._write_npz(
+            columns, 'out/' + kwargs.get('filename', 'neo.npz'), **kwargs)
+
+    @staticmethod
+    def _write_orbit_columnar(data, **kwargs):
+        """
+        Writes orbits as a table with one row per orbit, as Parquet when
+        pyarrow is installed, otherwise as a NumPy .npz archive.
+        """
+        if pa is not None:
+            schema = pa.schema([('name', pa.string()),
+                                ('orbit_date', pa.date32()),
+                                ('miss', pa.float64())])
+            return NEOWriter._write_parquet(
+                schema,
+                ([orbit.name, orbit.orbit_date, orbit.miss]
+                 for orbit in data),
+                'out/' + kwargs.get('filename', 'orbit.parquet'), **kwargs)
+
+        NEOWriter._check_numpy()
+        names, orbit_date, miss = [], array('q'), array('d')
+        for orbit in data:
+            names.append(orbit.name)
+            orbit_date.append(orbit.orbit_date.toordinal())
+            miss.append(orbit.miss)
+        columns = {
+            'name': np.array(names, dtype=str),
+            'orbit_date': NEOWriter._ordinals_to_datetime64(orbit_date),
+            'miss': np.frombuffer(miss, dtype=np.float64)}
+        return NEOWriter._write_npz(
+            columns, 'out/' + kwargs.get('filename', 'orbit.npz'), **kwargs)
+
+    @staticmethod
+    def _write_parquet(schema, rows, default, **kwargs):
+        """ Writes rows to Parquet, one row group per batch. """
+        with NEOWriter._open(default, binary=True, **kwargs) as out:
+            with pq.ParquetWriter(out, schema) as writer:
+                for batch in NEOWriter._batches(rows):
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(column, type=field.type)
+                         for column, field in zip(zip(*batch), schema)],
+                        schema=schema))
+        return True
+
+    @staticmethod
+    def _check_numpy():
+        if np is None:
+            raise UnsupportedFeature(
+                'The columnar_file output requires pyarrow or numpy')
+
+    @staticmethod
+    def _ordinals_to_datetime64(ordinals):
+        """ Converts an array of date ordinals to datetime64[D]. """
+        epoch = 719163  # date(1970, 1, 1).toordinal()
+        days = np.frombuffer(ordinals, dtype=np.int64) - epoch
+        return days.astype('datetime64[D]')
+
+    @staticmethod
+    def _write_npz(columns, default, **kwargs):
+        """ Writes a dict of columns to a NumPy .npz archive. """
+        with NEOWriter._open(default, binary=True, **kwargs) as out:
+            np.savez(out, **columns)
         return True